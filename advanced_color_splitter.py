@@ -6,12 +6,19 @@ Splits STL by 8 anatomical regions with precise color mapping
 
 import sys
 import os
+import argparse
 import json
 import configparser
-import trimesh
 import numpy as np
 from pathlib import Path
 
+from region_rules import load_rule_set
+from stl_io import write_stl
+from mesh_cache import load_mesh, cached_labels, store_labels
+from mesh_bounds import compute_bounds
+from mesh_partition import extract_regions
+from parallel_classify import classify_faces
+
 def load_color_config(config_path):
     """Load the 8-region color configuration"""
     config = configparser.ConfigParser()
@@ -27,105 +34,94 @@ def load_color_config(config_path):
     
     return color_map
 
-def classify_triangle_advanced(vertices, bounds):
-    """Classify triangle using the advanced 8-region system"""
-    # Calculate triangle center
-    cx = (vertices[0][0] + vertices[1][0] + vertices[2][0]) / 3.0
-    cy = (vertices[0][1] + vertices[1][1] + vertices[2][1]) / 3.0
-    cz = (vertices[0][2] + vertices[1][2] + vertices[2][2]) / 3.0
-    
-    # Calculate relative positions
-    z_range = bounds['z_max'] - bounds['z_min']
-    x_range = bounds['x_max'] - bounds['x_min']
-    y_range = bounds['y_max'] - bounds['y_min']
-    
-    z_pct = (cz - bounds['z_min']) / z_range if z_range > 0 else 0
-    x_pct = (cx - bounds['x_min']) / x_range if x_range > 0 else 0
-    y_pct = (cy - bounds['y_min']) / y_range if y_range > 0 else 0
-    
-    # Advanced 8-region classification
-    
-    # Helmet/Head: top 15%
-    if z_pct > 0.85:
-        return 'armor_primary'  # helmet
-    
-    # Optics/Eyes: upper front area
-    if z_pct > 0.75 and y_pct > 0.6:
-        return 'optics'  # eyes, sensors
-    
-    # Arms/Shoulders: upper sides
-    if z_pct > 0.60 and (x_pct < 0.2 or x_pct > 0.8):
-        return 'armor_highlight'  # arms, thighs, side panels
-    
-    # Chest/Torso: upper center
-    if 0.45 < z_pct < 0.75 and 0.25 < x_pct < 0.75:
-        return 'armor_primary'  # chest
-    
-    # Frame/Structure: middle sections
-    if 0.30 < z_pct < 0.60:
-        if 0.15 < x_pct < 0.85:
-            return 'frame'  # ribs, inner limbs, spine
-    
-    # Joints: transition areas
-    if 0.25 < z_pct < 0.45:
-        return 'joint_shadow'  # elbows, knees, recesses
-    
-    # Metal details: edges and small features
-    edge_threshold = 0.1
-    if (x_pct < edge_threshold or x_pct > (1-edge_threshold) or
-        z_pct < edge_threshold or z_pct > (1-edge_threshold)):
-        return 'metal_light'  # edges, wear highlights
-    
-    # Lower extremities
-    if z_pct < 0.25:
-        return 'armor_highlight'  # legs
-    
-    # Default: accent details
-    return 'accent'  # soles, gloves, trim
+def region_metadata(input_file, total_triangles, regions, region_counts, color_map):
+    """Metadata JSON content: one entry per non-empty region, in label order"""
+    base_name = Path(input_file).stem
+    metadata = {
+        "original_file": input_file,
+        "total_triangles": total_triangles,
+        "regions": []
+    }
+    for region in regions:
+        if region_counts[region] == 0:
+            continue
+        color_info = color_map[region]
+        metadata["regions"].append({
+            "region": region,
+            "filename": f"{base_name}_{region}.stl",
+            "triangle_count": region_counts[region],
+            "hex": color_info['hex'],
+            "label": color_info['label'],
+            "use": color_info['use']
+        })
+    return metadata
+
+def parts_exist(input_file, output_dir, regions, labels):
+    """True if every non-empty region already has its STL in output_dir"""
+    base_name = Path(input_file).stem
+    counts = np.bincount(labels, minlength=len(regions))
+    return all(os.path.exists(os.path.join(output_dir, f"{base_name}_{region}.stl"))
+               for region, count in zip(regions, counts) if count)
 
-def split_by_advanced_anatomy(input_file, output_dir, config_path):
-    """Main splitting function using advanced 8-region system"""
+def classify_mesh(input_file, rule_set, regions, workers=1):
+    """Load (cached) mesh and classify it; labels are cached per mesh + rule set"""
+    print(f"Loading: {input_file}")
+    mesh = load_mesh(input_file)
+    print(f"Loaded mesh with {len(mesh.faces):,} triangles\n")
+    
+    # Get bounds
+    bounds = compute_bounds(mesh.vertices)
+    
+    print("Model Bounds:")
+    print(bounds.describe() + "\n")
+    
+    labels = cached_labels(input_file, rule_set, regions)
+    if labels is not None:
+        print("Using cached triangle labels (rules unchanged)")
+    else:
+        # Classify all triangles
+        print("Classifying triangles by advanced anatomy...")
+        labels = classify_faces(mesh.vertices, mesh.faces, bounds, rule_set, regions, workers)
+        store_labels(input_file, rule_set, regions, labels)
+    mesh.labels = labels
+    
+    return mesh, labels
+
+def split_by_advanced_anatomy(input_file, output_dir, config_path, workers=1, recolor=False,
+                              color_map=None):
+    """Main splitting function using advanced 8-region system
+    
+    With ``recolor`` and labels cached for this model and rule set, only
+    the metadata JSON is rewritten: the geometry isn't loaded and the
+    region STLs from the previous run are kept. Batch callers can pass an
+    already loaded ``color_map`` instead of re-reading ``config_path``.
+    """
     print(f"\n{'='*60}")
     print(f"ADVANCED ANATOMICAL COLOR SPLITTER")
     print(f"{'='*60}\n")
     
     # Load color configuration
-    color_map = load_color_config(config_path)
+    if color_map is None:
+        color_map = load_color_config(config_path)
     print(f"Loaded {len(color_map)} color regions from config\n")
     
-    # Load STL
-    print(f"Loading: {input_file}")
-    mesh = trimesh.load_mesh(input_file)
-    print(f"Loaded mesh with {len(mesh.faces):,} triangles\n")
-    
-    # Get bounds
-    bounds = {
-        'x_min': mesh.bounds[0][0], 'x_max': mesh.bounds[1][0],
-        'y_min': mesh.bounds[0][1], 'y_max': mesh.bounds[1][1],
-        'z_min': mesh.bounds[0][2], 'z_max': mesh.bounds[1][2],
-    }
+    regions = list(color_map.keys())
+    rule_set = load_rule_set('advanced')
     
-    print("Model Bounds:")
-    print(f"  X: {bounds['x_min']:.2f} to {bounds['x_max']:.2f}")
-    print(f"  Y: {bounds['y_min']:.2f} to {bounds['y_max']:.2f}")
-    print(f"  Z: {bounds['z_min']:.2f} to {bounds['z_max']:.2f}\n")
-    
-    # Classify all triangles
-    print("Classifying triangles by advanced anatomy...")
-    triangle_regions = []
-    
-    for i, face in enumerate(mesh.faces):
-        vertices = mesh.vertices[face]
-        region = classify_triangle_advanced(vertices, bounds)
-        triangle_regions.append(region)
-        
-        if (i+1) % 50000 == 0:
-            print(f"  Progress: {i+1:,}/{len(mesh.faces):,}")
+    mesh = None
+    labels = cached_labels(input_file, rule_set, regions) if recolor else None
+    if recolor and labels is None:
+        print("⚠️  No cached labels for this model and rule set, running a full split\n")
+    elif recolor and not parts_exist(input_file, output_dir, regions, labels):
+        print(f"⚠️  Part files missing in {output_dir}, running a full split\n")
+        labels = None
+    if labels is None:
+        mesh, labels = classify_mesh(input_file, rule_set, regions, workers)
     
     # Count triangles per region
-    region_counts = {}
-    for region in triangle_regions:
-        region_counts[region] = region_counts.get(region, 0) + 1
+    counts = np.bincount(labels, minlength=len(regions))
+    region_counts = {region: int(counts[idx]) for idx, region in enumerate(regions)}
+    total_triangles = len(labels)
     
     print(f"\n{'='*60}")
     print("ADVANCED PART BREAKDOWN:")
@@ -133,58 +129,39 @@ def split_by_advanced_anatomy(input_file, output_dir, config_path):
     
     for region in color_map.keys():
         count = region_counts.get(region, 0)
-        pct = (count / len(mesh.faces)) * 100
+        pct = (count / total_triangles) * 100
         color_info = color_map[region]
         print(f"  {region:15s}: {count:8,} triangles ({pct:5.1f}%) → {color_info['label']:15s} {color_info['hex']} - {color_info['use']}")
     
     # Create output directory
     os.makedirs(output_dir, exist_ok=True)
     base_name = Path(input_file).stem
-    
-    # Save each region as separate STL
-    print(f"\n{'='*60}")
-    print("SAVING ANATOMICAL PARTS:")
-    print(f"{'='*60}\n")
+    metadata = region_metadata(input_file, total_triangles, regions, region_counts, color_map)
     
     output_files = []
-    metadata = {
-        "original_file": input_file,
-        "total_triangles": len(mesh.faces),
-        "regions": []
-    }
-    
-    for region in color_map.keys():
-        if region_counts.get(region, 0) == 0:
-            continue
-            
-        # Create mask for this region
-        face_mask = np.array([triangle_regions[i] == region for i in range(len(mesh.faces))])
+    if mesh is not None:
+        # Save each region as separate STL
+        print(f"\n{'='*60}")
+        print("SAVING ANATOMICAL PARTS:")
+        print(f"{'='*60}\n")
         
-        if not face_mask.any():
-            continue
+        # Partition all faces by region once, then reindex each region's vertices
+        for region_idx, _, region_vertices, region_faces in extract_regions(
+                mesh.vertices, mesh.faces, mesh.labels, len(regions)):
+            region = regions[region_idx]
             
-        # Extract faces for this region
-        region_faces = mesh.faces[face_mask]
-        region_mesh = mesh.copy()
-        region_mesh.update_faces(face_mask)
-        
-        # Save STL
-        color_info = color_map[region]
-        output_file = os.path.join(output_dir, f"{base_name}_{region}.stl")
-        region_mesh.export(output_file)
-        
-        print(f"✅ {region:15s}: {output_file}")
-        print(f"    └─ Color: {color_info['label']} {color_info['hex']} - {color_info['use']}")
-        
-        output_files.append(output_file)
-        metadata["regions"].append({
-            "region": region,
-            "filename": f"{base_name}_{region}.stl",
-            "triangle_count": region_counts[region],
-            "hex": color_info['hex'],
-            "label": color_info['label'],
-            "use": color_info['use']
-        })
+            # Save STL
+            color_info = color_map[region]
+            output_file = os.path.join(output_dir, f"{base_name}_{region}.stl")
+            write_stl(output_file, (region_vertices, region_faces), header=f'Anatomical Part: {region}')
+            
+            print(f"✅ {region:15s}: {output_file}")
+            print(f"    └─ Color: {color_info['label']} {color_info['hex']} - {color_info['use']}")
+            
+            output_files.append(output_file)
+    else:
+        output_files = [os.path.join(output_dir, entry["filename"]) for entry in metadata["regions"]]
+        print(f"\n🎨 Recolor only: kept {len(output_files)} existing part files")
     
     # Save metadata
     metadata_file = os.path.join(output_dir, f"{base_name}_advanced_color_map.json")
@@ -200,13 +177,19 @@ def split_by_advanced_anatomy(input_file, output_dir, config_path):
     return output_files, metadata
 
 def main():
-    if len(sys.argv) < 2:
-        print("Usage: python advanced_color_splitter.py <input.stl> [output_dir] [config_file]")
-        sys.exit(1)
-    
-    input_file = sys.argv[1]
-    output_dir = sys.argv[2] if len(sys.argv) > 2 else "ANATOMICAL_PARTS"
-    config_file = sys.argv[3] if len(sys.argv) > 3 else "color_map_config.txt"
+    parser = argparse.ArgumentParser(description="Split STL by 8 anatomical regions with precise color mapping")
+    parser.add_argument("input_file", metavar="input.stl")
+    parser.add_argument("output_dir", nargs="?", default="ANATOMICAL_PARTS")
+    parser.add_argument("config_file", nargs="?", default="color_map_config.txt")
+    parser.add_argument("--workers", type=int, default=1, metavar="N",
+                        help="classify on N processes (0 = all available cores)")
+    parser.add_argument("--recolor", action="store_true",
+                        help="palette-only change: rewrite the metadata from cached labels, keep the part STLs")
+    args = parser.parse_args()
+    
+    input_file = args.input_file
+    output_dir = args.output_dir
+    config_file = args.config_file
     
     if not os.path.exists(input_file):
         print(f"Error: File not found: {input_file}")
@@ -217,7 +200,7 @@ def main():
         sys.exit(1)
     
     try:
-        split_by_advanced_anatomy(input_file, output_dir, config_file)
+        split_by_advanced_anatomy(input_file, output_dir, config_file, args.workers, args.recolor)
     except Exception as e:
         print(f"\n❌ Error: {e}")
         import traceback
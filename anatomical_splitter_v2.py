@@ -7,9 +7,17 @@ Splits STL by body part regions using direct byte copying (no corruption!)
 import sys
 import os
 import json
-import struct
+import argparse
+import numpy as np
 from pathlib import Path
 
+from stl_io import read_stl, read_stl_header, triangle_vertices, triangle_centers
+from split_stl_direct import split_stl_by_labels
+from memory_size import parse_memory_size
+from stream_split import stream_split, chunk_triangles_for
+from mesh_bounds import compute_bounds
+from region_rules import load_rule_set, classify_centers
+
 # Color definitions
 COLORS = {
     'burnt_umber': {'hex': '#7B4E2D', 'name': 'Brown'},
@@ -29,55 +37,12 @@ ANATOMICAL_COLORS = {
     'accent': 'amber'
 }
 
-def classify_triangle_anatomical(vertices, bounds):
-    """Classify triangle by anatomical region using vertex coordinates"""
-    # Calculate triangle center
-    cx = (vertices[0][0] + vertices[1][0] + vertices[2][0]) / 3.0
-    cy = (vertices[0][1] + vertices[1][1] + vertices[2][1]) / 3.0
-    cz = (vertices[0][2] + vertices[1][2] + vertices[2][2]) / 3.0
-    
-    # Calculate relative positions
-    z_range = bounds['z_max'] - bounds['z_min']
-    x_range = bounds['x_max'] - bounds['x_min']
-    y_range = bounds['y_max'] - bounds['y_min']
-    
-    z_pct = (cz - bounds['z_min']) / z_range if z_range > 0 else 0
-    x_pct = (cx - bounds['x_min']) / x_range if x_range > 0 else 0
-    y_pct = (cy - bounds['y_min']) / y_range if y_range > 0 else 0
-    
-    # Helmet: top 20%
-    if z_pct > 0.80:
-        if y_pct > 0.5:
-            return 'hands_skull'  # Skull/face
-        else:
-            return 'helmet'
-    
-    # Hands: extreme top sides
-    if z_pct > 0.75 and (x_pct < 0.15 or x_pct > 0.85):
-        return 'hands_skull'
-    
-    # Chest/Body: middle 30-70% height, center mass
-    if 0.30 < z_pct < 0.70 and 0.25 < x_pct < 0.75:
-        return 'chest_body'
-    
-    # Limbs (arms/legs): sides and lower portions
-    if x_pct < 0.25 or x_pct > 0.75:
-        return 'limbs'
-    
-    if z_pct < 0.30:
-        return 'limbs'
-    
-    # Detail/trim: edges
-    edge_threshold = 0.05
-    if (x_pct < edge_threshold or x_pct > (1-edge_threshold) or
-        z_pct < edge_threshold or z_pct > (1-edge_threshold)):
-        return 'detail'
-    
-    # Default: accent
-    return 'accent'
-
-def analyze_and_split(input_file, output_dir):
-    """Analyze STL and split by anatomy using direct byte copying"""
+def analyze_and_split(input_file, output_dir, max_memory=None, trim_percent=None):
+    """Analyze STL and split by anatomy using direct byte copying
+    
+    With ``max_memory`` (bytes) the file is processed out-of-core in chunks.
+    ``trim_percent`` switches to outlier-robust bounds.
+    """
     
     print(f"\n{'='*60}")
     print(f"ANATOMICAL COLOR SPLITTER V2")
@@ -85,122 +50,102 @@ def analyze_and_split(input_file, output_dir):
     
     print(f"Loading: {input_file}")
     
-    # First pass: get bounds and classify triangles
-    with open(input_file, 'rb') as f:
-        f.read(80)  # Skip header
-        total_triangles = struct.unpack('<I', f.read(4))[0]
-        print(f"Total triangles: {total_triangles:,}\n")
-        
-        # Read sample to get bounds
-        print("Analyzing bounds...")
-        all_x, all_y, all_z = [], [], []
-        
-        for i in range(min(10000, total_triangles)):
-            f.read(12)  # normal
-            v1 = struct.unpack('<fff', f.read(12))
-            v2 = struct.unpack('<fff', f.read(12))
-            v3 = struct.unpack('<fff', f.read(12))
-            f.read(2)  # attribute
-            
-            for v in [v1, v2, v3]:
-                all_x.append(v[0])
-                all_y.append(v[1])
-                all_z.append(v[2])
-        
-        bounds = {
-            'x_min': min(all_x), 'x_max': max(all_x),
-            'y_min': min(all_y), 'y_max': max(all_y),
-            'z_min': min(all_z), 'z_max': max(all_z),
-        }
-        
-        print(f"  X: {bounds['x_min']:.2f} to {bounds['x_max']:.2f}")
-        print(f"  Y: {bounds['y_min']:.2f} to {bounds['y_max']:.2f}")
-        print(f"  Z: {bounds['z_min']:.2f} to {bounds['z_max']:.2f}\n")
+    if max_memory is not None:
+        return split_streaming(input_file, output_dir, max_memory, trim_percent)
     
-    # Second pass: classify all triangles
-    print("Classifying triangles by anatomy...")
-    triangle_regions = []
+    # Memory-map the input once; every step below reads from the same mapping
+    tris = read_stl(input_file)
+    total_triangles = len(tris)
+    print(f"Total triangles: {total_triangles:,}\n")
     
-    with open(input_file, 'rb') as f:
-        f.read(80)
-        f.read(4)
-        
-        for i in range(total_triangles):
-            f.read(12)  # normal
-            v1 = struct.unpack('<fff', f.read(12))
-            v2 = struct.unpack('<fff', f.read(12))
-            v3 = struct.unpack('<fff', f.read(12))
-            f.read(2)  # attribute
-            
-            region = classify_triangle_anatomical([v1, v2, v3], bounds)
-            triangle_regions.append(region)
-            
-            if (i+1) % 100000 == 0:
-                print(f"  Progress: {i+1:,}/{total_triangles:,}")
+    # Get bounds over every vertex
+    print("Analyzing bounds...")
+    bounds = compute_bounds(triangle_vertices(tris), trim_percent)
+    print(bounds.describe() + "\n")
+    
+    # Classify all triangles
+    print("Classifying triangles by anatomy...")
+    regions = list(ANATOMICAL_COLORS.keys())
+    labels = classify_centers(triangle_centers(tris), bounds,
+                              load_rule_set('anatomical'), regions)
     
     print("\nClassification complete!\n")
     
     # Count triangles per region
-    region_counts = {}
-    for region in triangle_regions:
-        region_counts[region] = region_counts.get(region, 0) + 1
+    counts = np.bincount(labels, minlength=len(regions))
+    region_counts = {region: int(counts[idx]) for idx, region in enumerate(regions)}
+    print_breakdown(region_counts, total_triangles)
+    
+    # Copy triangles to separate files
+    print(f"\n{'='*60}")
+    print("SAVING PARTS:")
+    print(f"{'='*60}\n")
+    
+    output_files, headers = region_outputs(input_file, output_dir, regions, region_counts)
+    
+    # Copy raw 50-byte records into every region file in one pass
+    split_stl_by_labels(input_file, labels, output_files, headers)
+    
+    return save_metadata(input_file, output_dir, regions, region_counts, output_files)
+
+def split_streaming(input_file, output_dir, max_memory, trim_percent=None):
+    """Out-of-core variant: exact bounds pass, then chunked classify + append"""
+    _, total_triangles = read_stl_header(input_file)
+    print(f"Total triangles: {total_triangles:,}")
+    print(f"Streaming in chunks of {chunk_triangles_for(max_memory):,} triangles "
+          f"(max memory {max_memory / 1024**2:,.0f} MB)\n")
+    
+    regions = list(ANATOMICAL_COLORS.keys())
+    all_counts = {region: 1 for region in regions}
+    output_files, headers = region_outputs(input_file, output_dir, regions, all_counts)
     
+    bounds, counts = stream_split(input_file, output_files, load_rule_set('anatomical'),
+                                  regions, max_memory, headers, trim_percent=trim_percent)
+    
+    print("\n" + bounds.describe() + "\n")
+    
+    region_counts = {region: int(counts[idx]) for idx, region in enumerate(regions)}
+    print_breakdown(region_counts, total_triangles)
+    
+    print(f"\n{'='*60}")
+    print("SAVED PARTS:")
+    print(f"{'='*60}\n")
+    
+    output_files = {idx: path for idx, path in output_files.items() if counts[idx] > 0}
+    return save_metadata(input_file, output_dir, regions, region_counts, output_files)
+
+def print_breakdown(region_counts, total_triangles):
+    """Print triangle count and color per region"""
     print(f"{'='*60}")
     print("PART BREAKDOWN:")
     print(f"{'='*60}")
     
     for region in ANATOMICAL_COLORS.keys():
         count = region_counts.get(region, 0)
-        pct = (count / total_triangles) * 100
+        pct = (count / total_triangles) * 100 if total_triangles else 0.0
         color_key = ANATOMICAL_COLORS[region]
         color_info = COLORS[color_key]
         print(f"  {region:15s}: {count:8,} triangles ({pct:5.1f}%) → {color_info['name']:12s} {color_info['hex']}")
-    
-    # Third pass: copy triangles to separate files
-    print(f"\n{'='*60}")
-    print("SAVING PARTS:")
-    print(f"{'='*60}\n")
-    
+
+def region_outputs(input_file, output_dir, regions, region_counts):
+    """Output path and STL header per non-empty region label"""
     os.makedirs(output_dir, exist_ok=True)
     base_name = Path(input_file).stem
     
-    # Open output files
     output_files = {}
-    for region in ANATOMICAL_COLORS.keys():
-        if region_counts.get(region, 0) > 0:
-            filepath = os.path.join(output_dir, f"{base_name}_{region}.stl")
-            output_files[region] = open(filepath, 'wb')
-            
-            # Write header
-            header = f'Anatomical Part: {region}'.encode('ascii')
-            header = header + b' ' * (80 - len(header))
-            output_files[region].write(header[:80])
-            
-            # Write triangle count
-            output_files[region].write(struct.pack('<I', region_counts[region]))
-    
-    # Copy triangles
-    with open(input_file, 'rb') as f:
-        f.read(80)
-        f.read(4)
-        
-        for i in range(total_triangles):
-            # Read triangle (50 bytes)
-            triangle_data = f.read(50)
-            
-            # Write to appropriate file
-            region = triangle_regions[i]
-            if region in output_files:
-                output_files[region].write(triangle_data)
-            
-            if (i+1) % 100000 == 0:
-                print(f"  Progress: {i+1:,}/{total_triangles:,}")
-    
-    # Close all files
+    headers = {}
+    for idx, region in enumerate(regions):
+        if region_counts[region] > 0:
+            output_files[idx] = os.path.join(output_dir, f"{base_name}_{region}.stl")
+            headers[idx] = f'Anatomical Part: {region}'
+    return output_files, headers
+
+def save_metadata(input_file, output_dir, regions, region_counts, output_files):
+    """Report saved parts and write the color map JSON"""
+    base_name = Path(input_file).stem
     metadata = {"parts": []}
-    for region, fp in output_files.items():
-        fp.close()
-        filepath = os.path.join(output_dir, f"{base_name}_{region}.stl")
+    for idx, filepath in output_files.items():
+        region = regions[idx]
         color_key = ANATOMICAL_COLORS[region]
         color_info = COLORS[color_key]
         
@@ -230,19 +175,25 @@ def analyze_and_split(input_file, output_dir):
     return metadata
 
 def main():
-    if len(sys.argv) < 2:
-        print("Usage: python anatomical_splitter_v2.py <input.stl> [output_dir]")
-        sys.exit(1)
-    
-    input_file = sys.argv[1]
-    output_dir = sys.argv[2] if len(sys.argv) > 2 else "anatomical_parts_v2"
+    parser = argparse.ArgumentParser(description="Split STL by anatomy using direct byte copying")
+    parser.add_argument("input_file", metavar="input.stl")
+    parser.add_argument("output_dir", nargs="?", default="anatomical_parts_v2")
+    parser.add_argument("--max-memory", metavar="SIZE",
+                        help="process out-of-core in chunks within this budget (e.g. 512M)")
+    parser.add_argument("--trim-percent", type=float, metavar="PCT",
+                        help="ignore this percent of outlying vertices per axis end when computing bounds")
+    args = parser.parse_args()
+    
+    input_file = args.input_file
+    output_dir = args.output_dir
     
     if not os.path.exists(input_file):
         print(f"Error: File not found: {input_file}")
         sys.exit(1)
     
     try:
-        analyze_and_split(input_file, output_dir)
+        max_memory = parse_memory_size(args.max_memory) if args.max_memory else None
+        analyze_and_split(input_file, output_dir, max_memory, args.trim_percent)
     except Exception as e:
         print(f"\n❌ Error: {e}")
         import traceback
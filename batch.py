@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+"""
+Batch Runner
+Processes a whole directory (or glob) of models in one interpreter, loading
+configs once and optionally running several models concurrently
+"""
+
+import io
+import os
+import sys
+import glob
+import time
+import argparse
+import contextlib
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_CONFIG = os.path.join(REPO_DIR, 'color_map_config.txt')
+
+TOOLS = {
+    # tool: default output directory
+    'advanced': 'ANATOMICAL_PARTS',
+    'triangle': 'ANATOMICAL_REGIONS',
+    'parts': 'split_parts',
+    'pipeline': None,  # pipeline_dag's own ~/AI_PIPELINE/RUNS/<model>
+    'slice': None,     # slicer.OUTPUT_DIR
+}
+
+BatchResult = namedtuple('BatchResult', ['input_file', 'ok', 'seconds', 'error', 'log'])
+
+# Per-process batch settings, set once by _setup()
+_batch = {}
+
+
+def find_models(inputs):
+    """Expand files, directories and glob patterns into a sorted list of STL paths"""
+    found = set()
+    for item in inputs:
+        if os.path.isdir(item):
+            paths = glob.glob(os.path.join(item, '*'))
+        else:
+            paths = glob.glob(item)
+            if not paths:
+                print(f"⚠️  No models match: {item}")
+        found.update(p for p in paths if p.lower().endswith('.stl') and os.path.isfile(p))
+    return sorted(found)
+
+
+def _setup(tool, output_dir, config_path):
+    """Load everything that is shared between models once per process"""
+    _batch.clear()
+    _batch.update(tool=tool, output_dir=output_dir, config_path=config_path)
+
+    if tool == 'advanced':
+        from advanced_color_splitter import load_color_config
+        _batch['color_map'] = load_color_config(config_path)
+    elif tool == 'triangle':
+        from triangle_anatomical_splitter import load_color_config
+        _batch['color_map'] = load_color_config(config_path)
+    elif tool == 'pipeline':
+        import trimesh  # noqa: F401  (repair/check use it; import before the first model)
+
+
+def _process(input_file):
+    """Run the configured tool on one model"""
+    tool = _batch['tool']
+    output_dir = _batch['output_dir']
+
+    if tool == 'advanced':
+        from advanced_color_splitter import split_by_advanced_anatomy
+        split_by_advanced_anatomy(input_file, output_dir, _batch['config_path'],
+                                  color_map=_batch['color_map'])
+    elif tool == 'triangle':
+        from mesh_cache import load_mesh
+        from triangle_anatomical_splitter import analyze_triangle_anatomy, save_anatomical_regions
+        mesh = load_mesh(input_file)
+        labels = analyze_triangle_anatomy(mesh, _batch['color_map'], input_file=input_file)
+        save_anatomical_regions(mesh, labels, _batch['color_map'], input_file, output_dir)
+    elif tool == 'parts':
+        from split_stl_parts import split_stl
+        split_stl(input_file, output_dir)
+    elif tool == 'pipeline':
+        from pipeline_dag import build_pipeline
+        run_dir = os.path.join(output_dir, os.path.splitext(os.path.basename(input_file))[0]) \
+            if output_dir else None
+        build_pipeline(input_file, run_dir, config_path=_batch['config_path']).run()
+    elif tool == 'slice':
+        import slicer
+        print(f"G-code: {slicer.slice_file(input_file, output_dir or slicer.OUTPUT_DIR)}")
+
+
+def _run_one(input_file, verbose=False):
+    """Process one model, capturing its console output unless ``verbose``"""
+    log = io.StringIO()
+    start = time.perf_counter()
+    try:
+        if verbose:
+            _process(input_file)
+        else:
+            with contextlib.redirect_stdout(log):
+                _process(input_file)
+        return BatchResult(input_file, True, time.perf_counter() - start, None, log.getvalue())
+    except Exception as e:
+        return BatchResult(input_file, False, time.perf_counter() - start,
+                           f"{type(e).__name__}: {e}", log.getvalue())
+
+
+def run_batch(inputs, tool='advanced', output_dir=None, config_path=DEFAULT_CONFIG,
+              jobs=1, verbose=False, on_result=None):
+    """Process many models with one tool; returns a BatchResult per model
+
+    ``inputs`` may mix files, directories and glob patterns. With ``jobs``
+    > 1 models are spread over a process pool whose workers each load the
+    config once and keep their imports warm for every model they handle.
+    ``on_result`` is called with each BatchResult as it completes.
+    """
+    if tool not in TOOLS:
+        raise ValueError(f"Unknown tool '{tool}' (use {', '.join(TOOLS)})")
+    models = find_models(inputs)
+    output_dir = output_dir or TOOLS[tool]
+    on_result = on_result or (lambda result: None)
+    results = []
+
+    if jobs <= 1 or len(models) <= 1:
+        _setup(tool, output_dir, config_path)
+        for model in models:
+            result = _run_one(model, verbose)
+            on_result(result)
+            results.append(result)
+        return results
+
+    with ProcessPoolExecutor(max_workers=min(jobs, len(models)), initializer=_setup,
+                             initargs=(tool, output_dir, config_path)) as pool:
+        futures = [pool.submit(_run_one, model, verbose) for model in models]
+        for future in futures:
+            result = future.result()
+            on_result(result)
+            results.append(result)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Process many models in one interpreter")
+    parser.add_argument("inputs", nargs="+", metavar="INPUT",
+                        help="STL files, directories or glob patterns (quote globs)")
+    parser.add_argument("--tool", default="advanced", choices=list(TOOLS),
+                        help="what to run on each model (default: advanced)")
+    parser.add_argument("-o", "--output-dir", help="output directory (default: the tool's usual one)")
+    parser.add_argument("--config", default=DEFAULT_CONFIG, help="color map config")
+    parser.add_argument("-j", "--jobs", type=int, default=1, metavar="N",
+                        help="process N models concurrently (0 = all available cores)")
+    parser.add_argument("-v", "--verbose", action="store_true", help="show each tool's full output")
+    args = parser.parse_args()
+
+    jobs = args.jobs
+    if jobs <= 0:
+        from parallel_classify import default_workers
+        jobs = default_workers()
+
+    models = find_models(args.inputs)
+    if not models:
+        print("Error: No STL files found")
+        sys.exit(1)
+
+    print(f"\n{'='*60}")
+    print(f"BATCH: {len(models)} models → {args.tool} ({jobs} job{'s' if jobs != 1 else ''})")
+    print(f"{'='*60}\n")
+
+    def report(result):
+        name = os.path.basename(result.input_file)
+        if result.ok:
+            print(f"✅ {name:40s} {result.seconds:7.2f}s")
+        else:
+            print(f"❌ {name:40s} {result.seconds:7.2f}s  {result.error}")
+            if result.log and not args.verbose:
+                print("    " + result.log.rstrip().replace("\n", "\n    "))
+
+    start = time.perf_counter()
+    results = run_batch(models, args.tool, args.output_dir, args.config, jobs, args.verbose, report)
+    elapsed = time.perf_counter() - start
+
+    failed = [r for r in results if not r.ok]
+    print(f"\n{'='*60}")
+    print(f"{len(results) - len(failed)}/{len(results)} models done in {elapsed:.2f}s "
+          f"({elapsed / len(results):.3f}s per model)")
+    print(f"{'='*60}\n")
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
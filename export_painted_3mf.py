@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Painted 3MF Export
+One multi-material 3MF object with per-triangle region colors, ready for Bambu Studio/OrcaSlicer
+"""
+
+import os
+import sys
+import time
+import argparse
+from pathlib import Path
+
+import numpy as np
+
+from advanced_color_splitter import load_color_config, classify_mesh
+from mesh_cache import load_mesh
+from region_rules import load_rule_set
+from threemf_writer import DEFAULT_COMPRESSLEVEL, paint_code, write_3mf
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_CONFIG = os.path.join(REPO_DIR, 'color_map_config.txt')
+
+
+def region_table(regions, labels, color_map):
+    """Metadata entry per region: extruder, paint code, color and triangle count"""
+    counts = np.bincount(labels, minlength=len(regions))
+    return [{
+        "region": region,
+        "extruder": idx + 1,
+        "paint_color": paint_code(idx + 1),
+        "hex": color_map[region]['hex'],
+        "label": color_map[region]['label'],
+        "use": color_map[region]['use'],
+        "triangle_count": int(counts[idx]),
+    } for idx, region in enumerate(regions)]
+
+
+def export_painted_3mf(input_file, output_file, config_path, labels_file=None, rule_set_name='advanced',
+                       workers=1, compresslevel=DEFAULT_COMPRESSLEVEL, paint=True):
+    """Write ``input_file`` as one 3MF object painted by region
+
+    Labels come from ``labels_file`` (a .npy of per-triangle indices into
+    the config's sections, e.g. from ``pipeline.py classify --save``) or
+    are classified with ``rule_set_name``. Region i is material i and
+    extruder i + 1.
+    """
+    print(f"\n{'='*60}")
+    print(f"PAINTED 3MF EXPORT")
+    print(f"{'='*60}\n")
+
+    color_map = load_color_config(config_path)
+    regions = list(color_map)
+    print(f"Loaded {len(regions)} color regions from config\n")
+
+    if labels_file:
+        print(f"Loading: {input_file}")
+        mesh = load_mesh(input_file)
+        labels = np.load(labels_file, mmap_mode='r')
+        print(f"Labels: {labels_file}")
+    else:
+        mesh, labels = classify_mesh(input_file, load_rule_set(rule_set_name), regions, workers)
+    if len(labels) != len(mesh.faces):
+        raise ValueError(f"{len(labels):,} labels for {len(mesh.faces):,} triangles")
+
+    table = region_table(regions, labels, color_map)
+    for entry in table:
+        print(f"  E{entry['extruder']:<2d} {entry['region']:15s}: {entry['triangle_count']:9,} triangles "
+              f"→ {entry['label']:15s} {entry['hex']}")
+
+    start = time.perf_counter()
+    write_3mf(output_file, [(Path(input_file).name, mesh.vertices, mesh.faces, labels)],
+              compresslevel=compresslevel, paint=paint,
+              materials=[(region, color_map[region]['hex']) for region in regions],
+              metadata={'metadata/regions.json': {"source_file": os.path.basename(input_file),
+                                                  "total_triangles": len(labels),
+                                                  "regions": table}})
+
+    print(f"\n✅ 3MF file created: {output_file} ({time.perf_counter() - start:.2f}s)")
+    print(f"📦 One object, {len(labels):,} painted triangles, {len(regions)} materials")
+    return output_file
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export one multi-material 3MF painted by region")
+    parser.add_argument("input_file", metavar="input.stl")
+    parser.add_argument("output_file", nargs="?", metavar="output.3mf",
+                        help="default: <input>_painted.3mf")
+    parser.add_argument("--config", default=DEFAULT_CONFIG, help="region colors (default: %(default)s)")
+    parser.add_argument("--labels", metavar="LABELS.npy", help="per-triangle region labels (default: classify)")
+    parser.add_argument("--rule-set", default="advanced", help="rule set used to classify (default: advanced)")
+    parser.add_argument("--workers", type=int, default=1, metavar="N",
+                        help="classify on N processes (0 = all available cores)")
+    parser.add_argument("--compress-level", type=int, default=DEFAULT_COMPRESSLEVEL, choices=range(10),
+                        metavar="0-9", help="deflate level, 0 = store uncompressed (default: 6)")
+    parser.add_argument("--no-paint", action="store_true",
+                        help="materials only, without the slicer paint_color attribute")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.input_file):
+        print(f"Error: File not found: {args.input_file}")
+        sys.exit(1)
+
+    output_file = args.output_file or f"{Path(args.input_file).stem}_painted.3mf"
+    try:
+        export_painted_3mf(args.input_file, output_file, args.config, args.labels, args.rule_set,
+                           args.workers, args.compress_level, not args.no_paint)
+    except Exception as e:
+        print(f"❌ Error: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -10,19 +10,21 @@ import sys
 import zipfile
 from pathlib import Path
 
-def create_3mf_with_colors(stl_file, assignment_file, output_file):
-    """Create 3MF file with color assignments embedded"""
+from threemf_writer import DEFAULT_COMPRESSLEVEL, zip_options
+
+def create_3mf_with_colors(stl_file, assignment_file, output_file, compresslevel=DEFAULT_COMPRESSLEVEL):
+    """Create 3MF file with color assignments embedded
+
+    The STL is copied into the archive in blocks rather than read whole;
+    compresslevel 0 stores it uncompressed (fastest for large models).
+    """
     
     # Load color assignments
     with open(assignment_file, 'r') as f:
         assignments = json.load(f)
     
-    # Read STL file
-    with open(stl_file, 'rb') as f:
-        stl_data = f.read()
-    
     # Create 3MF structure
-    with zipfile.ZipFile(output_file, 'w', zipfile.ZIP_DEFLATED) as z:
+    with zipfile.ZipFile(output_file, 'w', **zip_options(compresslevel)) as z:
         
         # Content Types
         content_types = '''<?xml version="1.0" encoding="UTF-8"?>
@@ -57,7 +59,7 @@ def create_3mf_with_colors(stl_file, assignment_file, output_file):
         z.writestr('metadata/color_assignment.json', json.dumps(assignments, indent=2))
         
         # Embed original STL for reference
-        z.writestr(f'3D/{model_name}.stl', stl_data)
+        z.write(stl_file, f'3D/{model_name}.stl')
         
         # Create painting instructions
         instructions = {
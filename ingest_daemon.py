@@ -0,0 +1,541 @@
+#!/usr/bin/env python3
+"""
+Ingest Daemon
+Watches a drop folder (inotify on Linux, polling elsewhere), waits for each
+STL to finish writing and hands it to a pool of workers running a batch tool
+"""
+
+import os
+import sys
+import time
+import queue
+import fcntl
+import select
+import signal
+import struct
+import shutil
+import tempfile
+import argparse
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import batch
+from stl_io import HEADER_SIZE, COUNT_SIZE, RECORD_SIZE
+
+WATCH_DIR = os.path.expanduser('~/AI_PIPELINE/LOCKED_SPLIT_STAGE')
+LOCK_NAME = '.ingest.lock'
+
+# inotify(7) event bits
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_Q_OVERFLOW = 0x00004000
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = os.O_CLOEXEC
+EVENT_HEADER = struct.Struct('iIII')  # wd, mask, cookie, len
+
+# Watcher events
+ACTIVITY = 'activity'  # created or grew; may still be written
+WRITTEN = 'written'    # closed after writing, or renamed into place
+RESCAN = 'rescan'      # events were lost; look at the whole directory
+
+
+def _is_model(name):
+    return name.lower().endswith('.stl') and not name.startswith('.')
+
+
+def _signature(path):
+    """(size, mtime_ns) or None if the file is gone"""
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return st.st_size, st.st_mtime_ns
+
+
+def _stl_complete(path, size):
+    """False while a binary STL is shorter than its header's triangle count says"""
+    if size < HEADER_SIZE + COUNT_SIZE:
+        return False
+    try:
+        with open(path, 'rb') as f:
+            header = f.read(HEADER_SIZE + COUNT_SIZE)
+    except OSError:
+        return False
+    count = struct.unpack_from('<I', header, HEADER_SIZE)[0]
+    # ASCII STLs have no count to check; settling is all we can go on
+    return size >= HEADER_SIZE + COUNT_SIZE + count * RECORD_SIZE or header.lstrip().startswith(b'solid')
+
+
+def _scan(directory):
+    with os.scandir(directory) as entries:
+        return [entry.path for entry in entries if _is_model(entry.name) and entry.is_file()]
+
+
+class InotifyWatcher:
+    """Linux inotify on one directory through ctypes (no extra packages)"""
+
+    closes = True  # WRITTEN events are reliable, not just ACTIVITY
+
+    def __init__(self, directory):
+        import ctypes
+        import ctypes.util
+        libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        if not hasattr(libc, 'inotify_init1'):
+            raise OSError("inotify is not available")
+        self.directory = directory
+        self.fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        mask = IN_CREATE | IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO
+        if libc.inotify_add_watch(self.fd, os.fsencode(directory), mask) < 0:
+            errno = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(errno, f"inotify_add_watch failed for {directory}")
+
+    def poll(self, timeout):
+        """List of (event, path) seen within ``timeout`` seconds"""
+        if not select.select([self.fd], [], [], timeout)[0]:
+            return []
+        events = []
+        while True:
+            try:
+                data = os.read(self.fd, 65536)
+            except BlockingIOError:
+                return events
+            offset = 0
+            while offset < len(data):
+                _, mask, _, length = EVENT_HEADER.unpack_from(data, offset)
+                name = data[offset + EVENT_HEADER.size:offset + EVENT_HEADER.size + length]
+                offset += EVENT_HEADER.size + length
+                name = os.fsdecode(name.rstrip(b'\0'))
+                if mask & IN_Q_OVERFLOW:
+                    events.append((RESCAN, None))
+                elif _is_model(name):
+                    kind = WRITTEN if mask & (IN_CLOSE_WRITE | IN_MOVED_TO) else ACTIVITY
+                    events.append((kind, os.path.join(self.directory, name)))
+
+    def close(self):
+        os.close(self.fd)
+
+
+class PollingWatcher:
+    """Portable fallback: rescan the directory every ``interval`` seconds"""
+
+    closes = False
+
+    def __init__(self, directory, interval=0.5):
+        self.directory = directory
+        self.interval = interval
+        self.known = {}
+
+    def poll(self, timeout):
+        time.sleep(min(timeout, self.interval))
+        events = []
+        current = {}
+        for path in _scan(self.directory):
+            current[path] = _signature(path)
+            if current[path] != self.known.get(path):
+                events.append((ACTIVITY, path))
+        self.known = current
+        return events
+
+    def close(self):
+        pass
+
+
+def make_watcher(directory, poll=False, interval=0.5):
+    """inotify where available, else polling"""
+    if not poll and sys.platform.startswith('linux'):
+        try:
+            return InotifyWatcher(directory)
+        except OSError as e:
+            print(f"⚠️  inotify unavailable ({e}), polling every {interval}s")
+    return PollingWatcher(directory, interval)
+
+
+def _worker_setup(*args):
+    """Pool initializer: Ctrl-C is for the daemon, which shuts the workers down itself"""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    batch._setup(*args)
+
+
+class Item:
+    """One file on its way through the daemon, with timestamps for the stats"""
+
+    __slots__ = ('path', 'signature', 'detected', 'changed', 'closed',
+                 'ready', 'dispatched', 'done', 'result')
+
+    def __init__(self, path, now):
+        self.path = path
+        self.signature = None
+        self.detected = now
+        self.changed = now
+        self.closed = False
+        self.ready = self.dispatched = self.done = None
+        self.result = None
+
+
+class Settler:
+    """Holds files until they have stopped changing
+
+    A file is ready once its size and mtime have been unchanged for
+    ``settle`` seconds, a binary STL is as long as its header says and,
+    when the watcher reports closes, it has been closed after writing (or
+    renamed into place) at least once.
+    """
+
+    def __init__(self, settle, require_close):
+        self.settle = settle
+        self.require_close = require_close
+        self.pending = {}
+
+    def touch(self, path, now, closed=False):
+        item = self.pending.get(path)
+        if item is None:
+            item = self.pending[path] = Item(path, now)
+        item.changed = now
+        item.closed = item.closed or closed or not self.require_close
+
+    def ready(self, now):
+        """Items that have settled, removed from pending (vanished files are dropped)"""
+        done = []
+        for path, item in list(self.pending.items()):
+            signature = _signature(path)
+            if signature is None:
+                del self.pending[path]
+            elif signature != item.signature:
+                item.signature = signature
+                item.changed = now
+            elif item.closed and now - item.changed >= self.settle and _stl_complete(path, signature[0]):
+                del self.pending[path]
+                item.ready = now
+                done.append(item)
+        return done
+
+
+class IngestStats:
+    """Latency and throughput of the files handled so far"""
+
+    def __init__(self):
+        self.items = []
+        self.lock = threading.Lock()
+
+    def add(self, item):
+        with self.lock:
+            self.items.append(item)
+
+    def summary(self):
+        with self.lock:
+            items = list(self.items)
+        if not items:
+            return None
+
+        def percentiles(values):
+            values = sorted(values)
+            pick = lambda q: values[min(len(values) - 1, int(q * len(values)))]
+            return {'p50': pick(0.5), 'p95': pick(0.95), 'max': values[-1]}
+
+        span = max(i.done for i in items) - min(i.detected for i in items)
+        return {
+            'files': len(items),
+            'failed': sum(not i.result.ok for i in items),
+            'throughput': len(items) / span if span > 0 else float('inf'),
+            'settle': percentiles([i.ready - i.detected for i in items]),
+            'queued': percentiles([i.dispatched - i.ready for i in items]),
+            'run': percentiles([i.result.seconds for i in items]),
+            'total': percentiles([i.done - i.detected for i in items]),
+        }
+
+
+def print_summary(summary):
+    if summary is None:
+        print("No files processed")
+        return
+    print(f"\n{'='*60}")
+    print(f"{summary['files'] - summary['failed']}/{summary['files']} files, "
+          f"{summary['throughput']:.1f} files/s")
+    for stage in ('settle', 'queued', 'run', 'total'):
+        p = summary[stage]
+        print(f"  {stage:7s} p50 {p['p50'] * 1000:8.1f} ms   p95 {p['p95'] * 1000:8.1f} ms   "
+              f"max {p['max'] * 1000:8.1f} ms")
+    print(f"{'='*60}\n")
+
+
+class IngestDaemon:
+    """Watcher → settler → bounded queue → dispatcher → process pool
+
+    At most ``workers`` files run at once and at most ``queue_size`` more
+    wait; when both are full the watcher stops taking settled files until
+    a slot frees up (events keep buffering in the kernel meanwhile, and an
+    overflow triggers a full rescan). Inputs are renamed to .processed or
+    .failed afterwards unless ``keep`` is set.
+    """
+
+    def __init__(self, watch_dir, tool='slice', output_dir=None, config_path=batch.DEFAULT_CONFIG,
+                 workers=2, queue_size=64, settle=1.0, poll=False, poll_interval=0.5, keep=False,
+                 verbose=False, quiet=False, on_done=None):
+        if tool not in batch.TOOLS:
+            raise ValueError(f"Unknown tool '{tool}' (use {', '.join(batch.TOOLS)})")
+        self.watch_dir = watch_dir
+        self.tool = tool
+        self.output_dir = output_dir or batch.TOOLS[tool]
+        self.config_path = config_path
+        self.workers = workers
+        self.settle = settle
+        self.poll = poll
+        self.poll_interval = poll_interval
+        self.keep = keep
+        self.verbose = verbose
+        self.quiet = quiet
+        self.on_done = on_done or (lambda item: None)
+
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.slots = threading.Semaphore(workers)
+        self.stop = threading.Event()
+        self.active = set()          # paths queued or running
+        self.finished = {}           # path -> signature handled (keep mode)
+        self.active_lock = threading.Lock()
+        self.print_lock = threading.Lock()
+        self.stats = IngestStats()
+
+    def _log(self, message, always=False):
+        if self.quiet and not always:
+            return
+        with self.print_lock:
+            print(f"[{time.strftime('%Y-%m-%d %H:%M:%S')}] {message}", flush=True)
+
+    def _wanted(self, path):
+        with self.active_lock:
+            return path not in self.active and self.finished.get(path) != _signature(path)
+
+    def _enqueue(self, item):
+        with self.active_lock:
+            self.active.add(item.path)
+        while not self.stop.is_set():
+            try:
+                self.queue.put(item, timeout=0.2)
+                return
+            except queue.Full:
+                continue
+
+    def _finish(self, item, future):
+        item.done = time.monotonic()
+        self.slots.release()
+        try:
+            item.result = future.result()
+        except Exception as e:  # the worker process itself died
+            item.result = batch.BatchResult(item.path, False, item.done - item.dispatched,
+                                            f"{type(e).__name__}: {e}", '')
+        result = item.result
+        name = os.path.basename(item.path)
+        if result.ok:
+            self._log(f"✓ {name}  run {result.seconds:.2f}s, total {item.done - item.detected:.2f}s")
+        else:
+            self._log(f"✗ {name}  {result.error}", always=True)
+            if result.log and not self.verbose:
+                self._log("    " + result.log.rstrip().replace("\n", "\n    "), always=True)
+
+        if self.keep:
+            with self.active_lock:
+                self.finished[item.path] = item.signature
+        else:
+            suffix = '.processed' if result.ok else '.failed'
+            try:
+                os.replace(item.path, item.path + suffix)
+            except OSError as e:
+                self._log(f"⚠️  Could not mark {name}: {e}")
+        with self.active_lock:
+            self.active.discard(item.path)
+        self.stats.add(item)
+        self.on_done(item)
+
+    def _new_pool(self):
+        return ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context('spawn'),
+                                   initializer=_worker_setup,
+                                   initargs=(self.tool, self.output_dir, self.config_path))
+
+    def _dispatch(self):
+        """Feed queued files to the pool, never more than ``workers`` at once"""
+        pool = self._new_pool()
+        try:
+            while True:
+                item = self.queue.get()
+                if item is None:
+                    return
+                self.slots.acquire()
+                item.dispatched = time.monotonic()
+                self._log(f"→ {os.path.basename(item.path)}")
+                try:
+                    future = pool.submit(batch._run_one, item.path, self.verbose)
+                except BrokenProcessPool:
+                    # A worker died (e.g. segfault); the pool is unusable, start a new one
+                    self._log("⚠️  Worker pool broke, restarting it", always=True)
+                    pool.shutdown(wait=False)
+                    pool = self._new_pool()
+                    future = pool.submit(batch._run_one, item.path, self.verbose)
+                future.add_done_callback(lambda f, item=item: self._finish(item, f))
+        finally:
+            pool.shutdown(wait=True)
+
+    def run(self, once=False):
+        """Watch until stopped (Ctrl-C or ``stop``); with ``once`` only drain existing files"""
+        os.makedirs(self.watch_dir, exist_ok=True)
+        lock = open(os.path.join(self.watch_dir, LOCK_NAME), 'w')
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            lock.close()
+            raise RuntimeError(f"Another ingest daemon is watching {self.watch_dir}")
+
+        watcher = None if once else make_watcher(self.watch_dir, self.poll, self.poll_interval)
+        settler = Settler(self.settle, watcher is not None and watcher.closes)
+        tick = max(0.01, min(self.settle / 4, 0.25))
+        dispatcher = threading.Thread(target=self._dispatch, daemon=True)
+        dispatcher.start()
+
+        self._log(f"Watching {self.watch_dir} → {self.tool} "
+                  f"({self.workers} worker{'s' if self.workers != 1 else ''}, "
+                  f"{type(watcher).__name__ if watcher else 'single pass'})", always=True)
+        try:
+            # Files already present count as written; they still have to settle
+            for path in _scan(self.watch_dir):
+                settler.touch(path, time.monotonic(), closed=True)
+            while not self.stop.is_set():
+                events = watcher.poll(tick) if watcher else time.sleep(tick) or []
+                now = time.monotonic()
+                for kind, path in events:
+                    if kind == RESCAN:
+                        # Closes may have been among the lost events, so don't wait
+                        # for one; settling and _stl_complete still guard the file
+                        for found in _scan(self.watch_dir):
+                            settler.touch(found, now, closed=True)
+                    elif self._wanted(path):
+                        settler.touch(path, now, closed=kind == WRITTEN)
+                for item in settler.ready(time.monotonic()):
+                    if self._wanted(item.path):
+                        self._enqueue(item)
+                if once and not settler.pending:
+                    break
+        except KeyboardInterrupt:
+            self._log("Stopping...", always=True)
+            self.stop.set()
+            while True:  # drop whatever hasn't started yet
+                try:
+                    self.queue.get_nowait()
+                except queue.Empty:
+                    break
+        finally:
+            self.queue.put(None)
+            dispatcher.join()
+            if watcher:
+                watcher.close()
+            lock.close()
+        return self.stats.summary()
+
+
+def _write_slowly(path, data, pause):
+    """Write ``data`` in two halves with a pause, like an upload in progress"""
+    half = len(data) // 2
+    with open(path, 'wb') as f:
+        f.write(data[:half])
+        f.flush()
+        time.sleep(pause)
+        f.write(data[half:])
+
+
+def run_bench(count, tool='parts', workers=2, settle=0.2, poll=False, pause=0.05):
+    """Drop ``count`` small STLs into a scratch folder at once and time the daemon
+
+    Every file is written in two halves with a pause in between, so a file
+    picked up before it is complete shows up as a failed split.
+    """
+    import numpy as np
+    from stl_io import write_stl
+
+    scratch = tempfile.mkdtemp(prefix='ingest-bench-')
+    watch_dir = os.path.join(scratch, 'drop')
+    os.makedirs(watch_dir)
+    template = os.path.join(scratch, 'template.stl')
+    cube = np.array([[0, 0, 0], [10, 0, 0], [10, 10, 0], [0, 10, 0],
+                     [0, 0, 10], [10, 0, 10], [10, 10, 10], [0, 10, 10]], dtype=np.float32)
+    faces = np.array([[0, 2, 1], [0, 3, 2], [4, 5, 6], [4, 6, 7], [0, 1, 5], [0, 5, 4],
+                      [1, 2, 6], [1, 6, 5], [2, 3, 7], [2, 7, 6], [3, 0, 4], [3, 4, 7]])
+    write_stl(template, (np.vstack([cube, cube + 20]), np.vstack([faces, faces + 8])))
+    with open(template, 'rb') as f:
+        data = f.read()
+
+    daemon = IngestDaemon(watch_dir, tool, os.path.join(scratch, 'out'), workers=workers,
+                          settle=settle, poll=poll, quiet=True,
+                          on_done=lambda item: daemon.stop.set() if len(daemon.stats.items) >= count else None)
+
+    def drop():
+        time.sleep(1.0)  # let the watcher and the worker pool start
+        writers = [threading.Thread(target=_write_slowly,
+                                    args=(os.path.join(watch_dir, f"bench_{i:04d}.stl"), data, pause))
+                   for i in range(count)]
+        for writer in writers:
+            writer.start()
+        for writer in writers:
+            writer.join()
+
+    print(f"\n{'='*60}")
+    print(f"INGEST BENCHMARK: {count} files → {tool} ({workers} workers, settle {settle}s)")
+    print(f"{'='*60}\n")
+    threading.Thread(target=drop, daemon=True).start()
+    try:
+        return daemon.run()
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Watch a folder and process STLs as they arrive")
+    parser.add_argument("watch_dir", nargs="?", default=WATCH_DIR, help=f"default: {WATCH_DIR}")
+    parser.add_argument("--tool", choices=list(batch.TOOLS),
+                        help="what to run on each file (default: slice, parts for --bench)")
+    parser.add_argument("-o", "--output-dir", help="output directory (default: the tool's usual one)")
+    parser.add_argument("--config", default=batch.DEFAULT_CONFIG, help="color map config")
+    parser.add_argument("-j", "--workers", type=int, default=2, metavar="N",
+                        help="files processed at once (0 = all available cores, default: 2)")
+    parser.add_argument("--queue-size", type=int, default=64, metavar="N",
+                        help="settled files allowed to wait for a worker (default: 64)")
+    parser.add_argument("--settle", type=float, metavar="SECONDS",
+                        help="size/mtime must be unchanged this long before a file is taken "
+                             "(default: 1.0, 0.2 for --bench)")
+    parser.add_argument("--poll", action="store_true", help="poll the folder instead of using inotify")
+    parser.add_argument("--poll-interval", type=float, default=0.5, metavar="SECONDS")
+    parser.add_argument("--keep", action="store_true", help="leave inputs in place instead of renaming them")
+    parser.add_argument("--once", action="store_true", help="process the files already there, then exit")
+    parser.add_argument("-v", "--verbose", action="store_true", help="show each tool's full output")
+    parser.add_argument("--bench", type=int, metavar="N",
+                        help="drop N synthetic STLs into a scratch folder and report latency/throughput")
+    args = parser.parse_args()
+
+    workers = args.workers
+    if workers <= 0:
+        from parallel_classify import default_workers
+        workers = default_workers()
+
+    try:
+        if args.bench:
+            summary = run_bench(args.bench, args.tool or 'parts', workers,
+                                0.2 if args.settle is None else args.settle, args.poll)
+        else:
+            daemon = IngestDaemon(args.watch_dir, args.tool or 'slice', args.output_dir, args.config,
+                                  workers, args.queue_size, 1.0 if args.settle is None else args.settle,
+                                  args.poll, args.poll_interval, args.keep, args.verbose)
+            summary = daemon.run(once=args.once)
+        print_summary(summary)
+        sys.exit(1 if summary and summary['failed'] else 0)
+    except Exception as e:
+        print(f"\n❌ Error: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
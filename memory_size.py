@@ -0,0 +1,18 @@
+#!/usr/bin/env python3
+"""
+Memory Sizes
+Parses human-readable byte sizes ('512M', '2G') for memory budgets, cache limits and RSS caps
+"""
+
+import re
+
+_SIZE_UNITS = {'': 1, 'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3, 'T': 1024 ** 4}
+
+
+def parse_memory_size(text):
+    """Parse sizes such as '512M', '2G', '800k' or '1048576' into bytes"""
+    match = re.fullmatch(r'\s*(\d+(?:\.\d+)?)\s*([KMGT]?)i?B?\s*', str(text), re.IGNORECASE)
+    if not match:
+        raise ValueError(f"Invalid memory size: {text!r} (use e.g. 512M or 2G)")
+    value, unit = match.groups()
+    return int(float(value) * _SIZE_UNITS[unit.upper()])
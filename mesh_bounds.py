@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+Model Bounds
+Exact and outlier-robust bounding boxes used to normalize triangle positions
+"""
+
+from collections import namedtuple
+
+import numpy as np
+
+from stl_io import iter_stl_chunks, triangle_vertices
+
+# Bins per axis in the streaming quantile sketch; robust bounds are accurate
+# to about (model extent / SKETCH_BINS)
+SKETCH_BINS = 4096
+
+
+class Bounds(namedtuple('Bounds', ['lo', 'hi'])):
+    """Axis-aligned bounds: ``lo`` and ``hi`` are float64 (x, y, z) arrays"""
+
+    __slots__ = ()
+
+    @property
+    def span(self):
+        return self.hi - self.lo
+
+    def normalize(self, points):
+        """Relative (0-1) position of (N, 3) points, as float64
+
+        Axes with zero extent map to 0. Points outside robust bounds fall
+        outside 0-1, which the region rules treat like any other value.
+        """
+        span = self.span
+        safe = np.where(span > 0, span, 1.0)
+        pct = (np.asarray(points, dtype=np.float64) - self.lo) / safe
+        pct[:, span <= 0] = 0.0
+        return pct
+
+    def describe(self, indent='  ', digits=2):
+        """Printable X/Y/Z ranges, one line per axis"""
+        return "\n".join(f"{indent}{axis}: {self.lo[i]:.{digits}f} to {self.hi[i]:.{digits}f}"
+                         for i, axis in enumerate('XYZ'))
+
+
+class QuantileSketch:
+    """Streaming per-axis histogram that widens its bins as new data arrives
+
+    Keeps SKETCH_BINS counts per axis. When a chunk falls outside the
+    covered range, adjacent bins are merged pairwise (doubling the bin
+    width) until it fits, so memory stays constant for any input size.
+    """
+
+    def __init__(self, bins=SKETCH_BINS):
+        self.bins = bins
+        self.counts = None
+        self.origin = None
+        self.width = None
+        self.total = 0
+
+    def add(self, points):
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 3)
+        if len(points) == 0:
+            return
+        lo, hi = points.min(axis=0), points.max(axis=0)
+
+        if self.counts is None:
+            self.counts = np.zeros((3, self.bins), dtype=np.int64)
+            self.origin = lo.copy()
+            self.width = np.maximum((hi - lo) / self.bins, np.finfo(np.float32).eps)
+            # Nudge the top edge inside so the max lands in the last bin
+            self.width *= 1 + 1e-9
+
+        for axis in range(3):
+            self._grow(axis, lo[axis], hi[axis])
+            idx = ((points[:, axis] - self.origin[axis]) / self.width[axis]).astype(np.int64)
+            np.clip(idx, 0, self.bins - 1, out=idx)
+            self.counts[axis] += np.bincount(idx, minlength=self.bins)
+
+        self.total += len(points)
+
+    def _grow(self, axis, lo, hi):
+        half = self.bins // 2
+        while lo < self.origin[axis] or hi >= self.origin[axis] + self.bins * self.width[axis]:
+            merged = self.counts[axis].reshape(half, 2).sum(axis=1)
+            self.counts[axis] = 0
+            self.width[axis] *= 2
+            if lo < self.origin[axis]:
+                self.counts[axis, half:] = merged
+                self.origin[axis] -= half * self.width[axis]
+            else:
+                self.counts[axis, :half] = merged
+
+    def quantile(self, q):
+        """Approximate q-quantile (0-1) per axis, as a float64 (x, y, z) array"""
+        result = np.empty(3)
+        target = q * self.total
+        for axis in range(3):
+            cum = np.cumsum(self.counts[axis])
+            b = min(int(np.searchsorted(cum, target)), self.bins - 1)
+            before = cum[b - 1] if b > 0 else 0
+            inside = self.counts[axis, b]
+            frac = (target - before) / inside if inside else 0.0
+            result[axis] = self.origin[axis] + (b + min(max(frac, 0.0), 1.0)) * self.width[axis]
+        return result
+
+
+def _check_trim(trim_percent):
+    if trim_percent is not None and not 0 <= trim_percent < 50:
+        raise ValueError(f"trim_percent must be in [0, 50), got {trim_percent}")
+
+
+def _finish(lo, hi, sketch, trim_percent):
+    if not np.all(np.isfinite(lo)):
+        # Empty model: collapse to the origin rather than infinities
+        lo = hi = np.zeros(3)
+    if sketch is None or sketch.total == 0:
+        return Bounds(lo, hi)
+
+    q = trim_percent / 100.0
+    robust_lo = np.maximum(sketch.quantile(q), lo)
+    robust_hi = np.minimum(sketch.quantile(1 - q), hi)
+    return Bounds(robust_lo, np.maximum(robust_hi, robust_lo))
+
+
+def compute_bounds(points, trim_percent=None):
+    """Bounds of in-memory points ((N, 3) or an (N, 3, 3) corner array)
+
+    Exact min/max by default. With ``trim_percent`` (e.g. 0.5) the bounds
+    ignore that percentage of vertices at each end of every axis, so stray
+    support stubs or floating debris don't squash the normalized range.
+    Raises ValueError unless 0 <= ``trim_percent`` < 50.
+    """
+    _check_trim(trim_percent)
+    points = np.asarray(points).reshape(-1, 3)
+    if len(points) == 0:
+        return _finish(np.full(3, np.inf), np.full(3, -np.inf), None, None)
+
+    lo = points.min(axis=0).astype(np.float64)
+    hi = points.max(axis=0).astype(np.float64)
+    if not trim_percent:
+        return Bounds(lo, hi)
+
+    q = trim_percent / 100.0
+    robust = np.quantile(points, [q, 1 - q], axis=0)
+    return Bounds(robust[0].astype(np.float64), robust[1].astype(np.float64))
+
+
+def stream_bounds(input_file, chunk_triangles, trim_percent=None):
+    """Bounds of every vertex of a binary STL in one chunked pass
+
+    Exact min/max always; with ``trim_percent`` the robust bounds come from
+    a constant-memory QuantileSketch fed during the same pass.
+    """
+    _check_trim(trim_percent)
+    lo = np.full(3, np.inf)
+    hi = np.full(3, -np.inf)
+    sketch = QuantileSketch() if trim_percent else None
+
+    for _, tris in iter_stl_chunks(input_file, chunk_triangles):
+        verts = triangle_vertices(tris).reshape(-1, 3)
+        lo = np.minimum(lo, verts.min(axis=0))
+        hi = np.maximum(hi, verts.max(axis=0))
+        if sketch is not None:
+            sketch.add(verts)
+
+    return _finish(lo, hi, sketch, trim_percent)
@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+"""
+Parsed Mesh Cache
+Content-addressed on-disk cache of welded meshes, memory-mapped back on a hit
+
+On by default under ~/AI_PIPELINE/CACHE/meshes. Set MESH_CACHE_DIR=off (or
+pass ``pipeline.py --no-cache``) to parse every file afresh and write nothing;
+MESH_CACHE_DIR=<path> moves it and MESH_CACHE_SIZE=<size> caps it (default 4G).
+"""
+
+import os
+import time
+import shutil
+import hashlib
+import json
+import tempfile
+
+import numpy as np
+
+from mesh_core import Mesh
+from mesh_weld import DEFAULT_TOLERANCE, weld_stl, weld_triangles
+from stl_io import read_stl, read_stl_mapped, triangle_vertices
+from memory_size import parse_memory_size
+
+# Override with MESH_CACHE_DIR; set it to "off" to disable caching entirely
+CACHE_DIR = os.environ.get('MESH_CACHE_DIR') or os.path.expanduser('~/AI_PIPELINE/CACHE/meshes')
+
+# Total size kept on disk before least-recently-used entries are evicted
+MAX_CACHE_BYTES = parse_memory_size(os.environ.get('MESH_CACHE_SIZE', '4G'))
+
+HASH_BLOCK_SIZE = 1 << 20
+
+# Mesh arrays stored per entry, one .npy file each
+ENTRY_ARRAYS = ('vertices', 'faces', 'source_corner')
+
+# (realpath, size, mtime_ns) -> content hash, so one process hashes a file once
+_hash_memo = {}
+
+
+def hash_file(filepath):
+    """blake2b digest of a file's content, read in fixed-size blocks"""
+    digest = hashlib.blake2b(digest_size=20)
+    buffer = bytearray(HASH_BLOCK_SIZE)
+    view = memoryview(buffer)
+    with open(filepath, 'rb') as f:
+        while True:
+            n = f.readinto(buffer)
+            if not n:
+                break
+            digest.update(view[:n])
+    return digest.hexdigest()
+
+
+def hash_buffer(data):
+    """hash_file() digest of bytes already in memory (or memory-mapped)"""
+    digest = hashlib.blake2b(digest_size=20)
+    view = memoryview(data).cast('B')
+    for start in range(0, len(view), HASH_BLOCK_SIZE):
+        digest.update(view[start:start + HASH_BLOCK_SIZE])
+    return digest.hexdigest()
+
+
+def _memo_key(filepath):
+    st = os.stat(filepath)
+    return (os.path.realpath(filepath), st.st_size, st.st_mtime_ns)
+
+
+def content_hash(filepath):
+    """hash_file() memoized for this process while the file is unchanged"""
+    memo_key = _memo_key(filepath)
+    if memo_key not in _hash_memo:
+        _hash_memo[memo_key] = hash_file(filepath)
+    return _hash_memo[memo_key]
+
+
+def rules_hash(rule_set, regions):
+    """Digest of a rule set and its region order (which fixes the label ids)"""
+    payload = json.dumps({'rules': rule_set, 'regions': list(regions)}, sort_keys=True)
+    return hashlib.blake2b(payload.encode(), digest_size=12).hexdigest()
+
+
+def cache_key(content_hash, tolerance=DEFAULT_TOLERANCE):
+    """Entry name for a file hash welded at ``tolerance``"""
+    return f"{content_hash}-w{tolerance:g}"
+
+
+def _entry_size(path):
+    return sum(entry.stat().st_size for entry in os.scandir(path) if entry.is_file())
+
+
+def _read_entry(path):
+    """Map a cache entry back as a Mesh (copy-on-write, never touches the file)"""
+    arrays = {field: np.load(os.path.join(path, f"{field}.npy"), mmap_mode='c')
+              for field in ENTRY_ARRAYS}
+    return Mesh(**arrays)
+
+
+def _write_entry(path, mesh):
+    """Write an entry under a temporary name and rename it into place"""
+    staging = tempfile.mkdtemp(prefix='.tmp-', dir=os.path.dirname(path))
+    try:
+        for field in ENTRY_ARRAYS:
+            np.save(os.path.join(staging, f"{field}.npy"), getattr(mesh, field))
+        os.rename(staging, path)
+    except OSError:
+        # Another process cached the same mesh first; keep theirs
+        shutil.rmtree(staging, ignore_errors=True)
+        if not os.path.isdir(path):
+            raise
+
+
+def evict(cache_dir=CACHE_DIR, max_bytes=MAX_CACHE_BYTES, keep=()):
+    """Delete least-recently-used entries until the cache fits in ``max_bytes``
+
+    Returns the number of bytes freed. Entries named in ``keep`` survive.
+    """
+    entries = []
+    for entry in os.scandir(cache_dir):
+        if entry.is_dir() and not entry.name.startswith('.'):
+            entries.append((entry.stat().st_mtime, _entry_size(entry.path), entry))
+    total = sum(size for _, size, _ in entries)
+
+    freed = 0
+    for _, size, entry in sorted(entries, key=lambda e: e[0]):
+        if total - freed <= max_bytes:
+            break
+        if entry.name in keep:
+            continue
+        shutil.rmtree(entry.path, ignore_errors=True)
+        freed += size
+    return freed
+
+
+def load_mesh(filepath, tolerance=DEFAULT_TOLERANCE, cache_dir=CACHE_DIR):
+    """Welded mesh for an STL, parsed at most once per distinct file content
+
+    The key is the hash of the file bytes (not its name or mtime), so copies
+    and renames hit the same entry and edited files never serve stale data.
+    Pass ``cache_dir=None`` (or set MESH_CACHE_DIR=off) to always re-parse.
+    """
+    if not cache_dir or cache_dir == 'off':
+        return weld_stl(filepath, tolerance)
+
+    os.makedirs(cache_dir, exist_ok=True)
+    memo_key = _memo_key(filepath)
+    tris = None
+    if memo_key not in _hash_memo:
+        # Hash the mapped file; on a miss the weld reads the same pages, so the file is read once
+        data, tris = read_stl_mapped(filepath)
+        _hash_memo[memo_key] = hash_buffer(data)
+    key = cache_key(_hash_memo[memo_key], tolerance)
+    path = os.path.join(cache_dir, key)
+
+    if os.path.isdir(path):
+        try:
+            mesh = _read_entry(path)
+            now = time.time()
+            os.utime(path, (now, now))  # mark as recently used
+            return mesh
+        except (OSError, ValueError):
+            # Damaged entry (e.g. interrupted eviction): rebuild it
+            shutil.rmtree(path, ignore_errors=True)
+
+    if tris is None:
+        tris = read_stl(filepath)
+    mesh = weld_triangles(triangle_vertices(tris), tolerance)
+    try:
+        _write_entry(path, mesh)
+        evict(cache_dir, keep={key})
+    except OSError as e:
+        print(f"⚠️  Mesh cache write skipped: {e}")
+    return mesh
+
+
+def _labels_path(filepath, rule_set, regions, tolerance, cache_dir):
+    key = cache_key(content_hash(filepath), tolerance)
+    return os.path.join(cache_dir, key, f"labels-{rules_hash(rule_set, regions)}.npy")
+
+
+def cached_labels(filepath, rule_set, regions, tolerance=DEFAULT_TOLERANCE, cache_dir=CACHE_DIR):
+    """Per-face uint8 region labels stored for this mesh content and rule set, or None
+
+    Labels live inside the mesh's cache entry, so they are evicted with it.
+    Palette changes (hex, label, use) don't affect the key; editing the
+    rules or the region list does.
+    """
+    if not cache_dir or cache_dir == 'off':
+        return None
+    path = _labels_path(filepath, rule_set, regions, tolerance, cache_dir)
+    try:
+        return np.load(path, mmap_mode='r')
+    except (OSError, ValueError):
+        return None
+
+
+def store_labels(filepath, rule_set, regions, labels, tolerance=DEFAULT_TOLERANCE, cache_dir=CACHE_DIR):
+    """Persist labels for cached_labels(); failures only print a warning
+
+    Skipped unless the mesh itself is cached: a directory holding only
+    labels would look like a damaged entry to load_mesh, which deletes it.
+    """
+    if not cache_dir or cache_dir == 'off':
+        return
+    path = _labels_path(filepath, rule_set, regions, tolerance, cache_dir)
+    entry = os.path.dirname(path)
+    if not all(os.path.exists(os.path.join(entry, f"{field}.npy")) for field in ENTRY_ARRAYS):
+        return
+    try:
+        fd, staging = tempfile.mkstemp(prefix='.tmp-', suffix='.npy', dir=os.path.dirname(path))
+        with os.fdopen(fd, 'wb') as f:
+            np.save(f, np.asarray(labels, dtype=np.uint8))
+        os.replace(staging, path)
+    except OSError as e:
+        print(f"⚠️  Label cache write skipped: {e}")
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Mesh Core
+Compact array-backed indexed mesh shared by the loaders, splitters and exporters
+"""
+
+import numpy as np
+
+from stl_io import compute_normals
+from mesh_partition import extract_submesh
+
+
+def face_centroids(vertices, faces):
+    """float64 (N, 3) centroid of every face"""
+    return np.asarray(vertices)[faces].mean(axis=1, dtype=np.float64)
+
+
+class Mesh:
+    """Indexed triangle mesh: three flat arrays plus lazily derived per-face data
+
+    vertices:      (V, 3) float32 positions
+    faces:         (N, 3) int32 vertex ids
+    labels:        (N,) uint8 region label per face, or None until classified
+    source_corner: (V,) int64 first STL corner (triangle * 3 + corner) of each
+                   vertex when the mesh came from welding an STL, else None
+
+    ``centroids``, ``normals`` and ``areas`` are computed on first use and
+    kept; assigning new ``vertices`` or ``faces`` drops them.
+    """
+
+    __slots__ = ('_vertices', '_faces', 'labels', 'source_corner',
+                 '_centroids', '_normals', '_areas')
+
+    def __init__(self, vertices, faces, labels=None, source_corner=None):
+        self._vertices = np.asarray(vertices, dtype=np.float32).reshape(-1, 3)
+        self._faces = np.asarray(faces, dtype=np.int32).reshape(-1, 3)
+        self.labels = None if labels is None else np.asarray(labels, dtype=np.uint8)
+        self.source_corner = source_corner
+        self._clear()
+
+    def _clear(self):
+        self._centroids = None
+        self._normals = None
+        self._areas = None
+
+    @property
+    def vertices(self):
+        return self._vertices
+
+    @vertices.setter
+    def vertices(self, value):
+        self._vertices = np.asarray(value, dtype=np.float32).reshape(-1, 3)
+        self._clear()
+
+    @property
+    def faces(self):
+        return self._faces
+
+    @faces.setter
+    def faces(self, value):
+        self._faces = np.asarray(value, dtype=np.int32).reshape(-1, 3)
+        self._clear()
+
+    def __len__(self):
+        return len(self._faces)
+
+    def __repr__(self):
+        return f"Mesh({len(self._vertices):,} vertices, {len(self._faces):,} faces)"
+
+    @property
+    def triangles(self):
+        """(N, 3, 3) float32 corner array (a new array on every access)"""
+        return self._vertices[self._faces]
+
+    @property
+    def centroids(self):
+        """float64 (N, 3) face centroids"""
+        if self._centroids is None:
+            self._centroids = face_centroids(self._vertices, self._faces)
+        return self._centroids
+
+    @property
+    def normals(self):
+        """float32 (N, 3) unit face normals (zero for degenerate faces)"""
+        if self._normals is None:
+            self._normals = compute_normals(self.triangles)
+        return self._normals
+
+    @property
+    def areas(self):
+        """float64 (N,) face areas"""
+        if self._areas is None:
+            corners = self.triangles.astype(np.float64)
+            cross = np.cross(corners[:, 1] - corners[:, 0], corners[:, 2] - corners[:, 0])
+            self._areas = 0.5 * np.linalg.norm(cross, axis=1)
+        return self._areas
+
+    def submesh(self, face_index):
+        """Mesh of ``faces[face_index]`` with only the vertices it uses (labels kept)"""
+        vertices, faces = extract_submesh(self._vertices, self._faces, face_index)
+        labels = None if self.labels is None else self.labels[face_index]
+        return Mesh(vertices, faces, labels)
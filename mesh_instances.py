@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+"""
+Instance Detection
+Finds components that are the same shape under a rigid motion via a pose-normalized shape hash
+"""
+
+import numpy as np
+
+from mesh_partition import extract_submesh
+
+# Vertices of two instances must land within this distance (mm) of each other
+DEFAULT_TOLERANCE = 1e-3
+
+# Principal moments closer than this (relative to the largest) count as equal
+DEGENERATE_RATIO = 1e-4
+
+# Bounds on the frames tried per part when symmetry leaves axes free
+MAX_TIES = 64
+MAX_FRAMES = 128
+
+# Oblique direction vertices are ordered along when matching two parts, and
+# the most neighbours along it a vertex is compared against
+SORT_DIRECTION = np.array([1.0, 3 ** 0.5, 5 ** 0.5]) / 3.0
+MAX_WINDOW = 64
+SAMPLE_FACES = 32
+
+# Face keys pack three vertex ids into an int64
+MAX_PART_VERTICES = 2 ** 21 - 1
+
+
+def component_moments(vertices, faces, labels, count):
+    """Surface area, area centroid and covariance of every component in one pass
+
+    Returns (areas (K,), centroids (K, 3), covariances (K, 3, 3)), treating
+    each component as a uniform-density surface.
+    """
+    tri = np.asarray(vertices, dtype=np.float64)[faces]
+    area = 0.5 * np.linalg.norm(np.cross(tri[:, 1] - tri[:, 0], tri[:, 2] - tri[:, 0]), axis=1)
+    corner_sum = tri.sum(axis=1)
+
+    total = np.bincount(labels, weights=area, minlength=count)
+    safe = np.where(total > 0, total, 1.0)
+    centroids = np.stack([np.bincount(labels, weights=area * corner_sum[:, i], minlength=count)
+                          for i in range(3)], axis=1) / (3 * safe[:, None])
+
+    # Exact second moment of a triangle: area/12 * (S S^T + sum of p p^T)
+    second = np.empty((count, 3, 3))
+    for i in range(3):
+        for j in range(i, 3):
+            moment = corner_sum[:, i] * corner_sum[:, j] + (tri[:, :, i] * tri[:, :, j]).sum(axis=1)
+            second[:, i, j] = second[:, j, i] = np.bincount(labels, weights=area * moment, minlength=count)
+    covariances = second / (12 * safe[:, None, None]) - centroids[:, :, None] * centroids[:, None, :]
+    return total, centroids, covariances
+
+
+def shape_keys(areas, covariances, face_counts, vertex_counts, quantum):
+    """(K, 6) integer key per component that is identical for congruent parts
+
+    Face and vertex counts, surface area and the principal RMS extents
+    (square roots of the covariance eigenvalues, all pose-invariant), each
+    quantized to ``quantum``. Components with zero area get a unique key.
+    """
+    eigenvalues = np.linalg.eigvalsh(covariances)
+    extents = np.sqrt(np.maximum(eigenvalues, 0))
+    keys = np.column_stack([face_counts, vertex_counts,
+                            np.round(np.sqrt(areas) / quantum),
+                            np.round(extents / quantum)]).astype(np.int64)
+    flat = areas <= 0
+    keys[flat, 0] = -1 - np.flatnonzero(flat)
+    return keys
+
+
+def _principal_axes(covariance):
+    """Axes (rows, largest moment first) and which neighbouring moments coincide"""
+    eigenvalues, eigenvectors = np.linalg.eigh(covariance)
+    w = eigenvalues[::-1]
+    close = np.abs(np.diff(w)) <= DEGENERATE_RATIO * max(w[0], 1e-12)
+    return eigenvectors[:, ::-1].T, close
+
+
+def vertex_areas(vertices, faces):
+    """Surface area around each vertex (a third of every incident face)"""
+    tri = vertices[faces]
+    area = 0.5 * np.linalg.norm(np.cross(tri[:, 1] - tri[:, 0], tri[:, 2] - tri[:, 0]), axis=1)
+    return np.bincount(faces.ravel(), weights=np.repeat(area / 3, 3), minlength=len(vertices))
+
+
+def _farthest(offsets, weights, tolerance):
+    """Unit directions to the points farthest from the origin
+
+    Equally far points are narrowed to those with the most surrounding
+    area (a pose-invariant tie-break, e.g. the poles of a UV sphere); any
+    points still tied are symmetric and each gives a candidate.
+    """
+    lengths = np.linalg.norm(offsets, axis=1)
+    if not len(lengths) or lengths.max() <= tolerance:
+        return []
+    ties = np.flatnonzero(lengths >= lengths.max() - tolerance)
+    ties = ties[weights[ties] >= weights[ties].max() * (1 - DEGENERATE_RATIO)][:MAX_TIES]
+    return list(offsets[ties] / lengths[ties, None])
+
+
+def _radial(offsets, axis):
+    return offsets - np.outer(offsets @ axis, axis)
+
+
+def candidate_frames(points, weights, center, covariance, tolerance=DEFAULT_TOLERANCE):
+    """Rotations (rows = axes) that put ``points`` in a canonical pose
+
+    Distinct principal axes of the surface are ambiguous only in sign,
+    giving four proper rotations. When moments coincide (spheres, bolts,
+    cubes) the plain vertex covariance is tried next, and whatever axes
+    are still free point at the farthest vertices (``weights`` = vertex
+    areas break ties), one frame per remaining tie.
+    Mirror images never share a frame, so mirrored parts stay separate.
+    """
+    offsets = np.asarray(points, dtype=np.float64) - center
+    options = [_principal_axes(covariance), _principal_axes(offsets.T @ offsets / max(len(offsets), 1))]
+
+    pairs = None
+    for axes, close in options:
+        if not close.any():
+            pairs = [(s0 * axes[0], s1 * axes[1]) for s0 in (1, -1) for s1 in (1, -1)]
+            break
+    if pairs is None:
+        for axes, close in options:
+            if not close.all():
+                unique = axes[2] if close[0] else axes[0]
+                pairs = [(axis, radial) for axis in (unique, -unique)
+                         for radial in _farthest(_radial(offsets, axis), weights, tolerance)]
+                break
+    if pairs is None:
+        pairs = [(first, second) for first in _farthest(offsets, weights, tolerance)
+                 for second in _farthest(_radial(offsets, first), weights, tolerance)]
+
+    return [np.array([a, b, np.cross(a, b)]) for a, b in pairs[:MAX_FRAMES]]
+
+
+def face_keys(faces, vertex_count):
+    """Sorted int64 key per face, independent of which corner a face starts at"""
+    start = np.argmin(faces, axis=1)
+    rolled = faces[np.arange(len(faces))[:, None], (start[:, None] + np.arange(3)) % 3].astype(np.int64)
+    return np.sort((rolled[:, 0] * vertex_count + rolled[:, 1]) * vertex_count + rolled[:, 2])
+
+
+class Part:
+    """One component's vertices and faces with what matching needs precomputed"""
+
+    __slots__ = ('vertices', 'faces', 'order', 'projected', 'face_keys')
+
+    def __init__(self, vertices, faces):
+        self.vertices = np.asarray(vertices, dtype=np.float64)
+        self.faces = np.asarray(faces, dtype=np.int64)
+        projected = self.vertices @ SORT_DIRECTION
+        self.order = np.argsort(projected)
+        self.projected = projected[self.order]
+        self.face_keys = face_keys(self.faces, len(self.vertices))
+
+    def match(self, points, tolerance):
+        """Index of the vertex within ``tolerance`` of each point, or None
+
+        Vertices are ordered along one fixed oblique direction and each
+        point is only compared with those whose projection is within
+        ``tolerance`` of its own, so noise that would flip a rounding-based
+        sort doesn't break the match.
+        """
+        key = points @ SORT_DIRECTION
+        lo = np.searchsorted(self.projected, key - tolerance, side='left')
+        width = np.searchsorted(self.projected, key + tolerance, side='right') - lo
+        if not len(points) or width.min() == 0 or width.max() > MAX_WINDOW:
+            return None
+
+        best = np.full(len(points), np.inf)
+        match = np.zeros(len(points), dtype=np.int64)
+        for step in range(int(width.max())):
+            candidate = self.order[np.minimum(lo + step, len(self.order) - 1)]
+            distance = np.linalg.norm(points - self.vertices[candidate], axis=1)
+            better = (step < width) & (distance < best)
+            best[better] = distance[better]
+            match[better] = candidate[better]
+        if best.max() > tolerance or len(np.unique(match)) != len(match):
+            return None
+        return match
+
+
+def same_shape(rep, member, matrix, tolerance):
+    """True if ``matrix`` (3x4) maps Part ``rep`` exactly onto Part ``member``"""
+    if len(rep.vertices) != len(member.vertices) or len(rep.faces) != len(member.faces):
+        return False
+    moved = rep.vertices @ matrix[:, :3].T + matrix[:, 3]
+
+    # Most wrong frames are rejected on a handful of faces
+    sample = rep.faces[:SAMPLE_FACES]
+    ids = np.unique(sample)
+    matched = member.match(moved[ids], tolerance)
+    if matched is None:
+        return False
+    partial = np.zeros(len(moved), dtype=np.int64)
+    partial[ids] = matched
+    keys = face_keys(partial[sample], len(moved))
+    found = member.face_keys[np.minimum(np.searchsorted(member.face_keys, keys), len(member.face_keys) - 1)]
+    if not np.array_equal(found, keys):
+        return False
+
+    mapping = member.match(moved, tolerance)
+    if mapping is None:
+        return False
+
+    # Same vertices; the faces must also connect them the same way round
+    return np.array_equal(face_keys(mapping[rep.faces], len(mapping)), member.face_keys)
+
+
+def find_instances(vertices, faces, components, tolerance=DEFAULT_TOLERANCE):
+    """Group components that are rigid copies of each other
+
+    ``components`` is a list of face index arrays. Returns (instance_of,
+    transforms): ``instance_of[k]`` is the first component with the same
+    shape as component k (k itself for originals) and ``transforms[k]`` is
+    the 3x4 matrix [R | t] with component k = R @ original + t.
+    """
+    count = len(components)
+    faces = np.asarray(faces)
+    instance_of = np.arange(count)
+    transforms = np.tile(np.eye(3, 4), (count, 1, 1))
+    if count < 2:
+        return instance_of, transforms
+
+    lengths = np.array([len(c) for c in components])
+    labels = np.empty(len(faces), dtype=np.int64)
+    labels[np.concatenate(components)] = np.repeat(np.arange(count), lengths)
+    vertex_labels = np.full(len(vertices), -1, dtype=np.int64)
+    vertex_labels[faces.ravel()] = np.repeat(labels, 3)
+    vertex_counts = np.bincount(vertex_labels[vertex_labels >= 0], minlength=count)
+
+    areas, centroids, covariances = component_moments(vertices, faces, labels, count)
+    keys = shape_keys(areas, covariances, lengths, vertex_counts, 10 * tolerance)
+    _, group = np.unique(keys, axis=0, return_inverse=True)
+    group = group.ravel()
+
+    def part(k):
+        return Part(*extract_submesh(vertices, faces, components[k]))
+
+    # Components sharing a key are checked against each original of that key
+    order = np.argsort(group, kind='stable')
+    starts = np.flatnonzero(np.r_[True, np.diff(group[order]) != 0, True])
+    for lo, hi in zip(starts[:-1], starts[1:]):
+        if hi - lo < 2 or vertex_counts[order[lo]] > MAX_PART_VERTICES:
+            continue
+        originals = []  # (component, part, frame)
+        for k in order[lo:hi]:
+            mesh = part(k)
+            frames = candidate_frames(mesh.vertices, vertex_areas(mesh.vertices, mesh.faces),
+                                      centroids[k], covariances[k], tolerance)
+            for original, original_mesh, original_frame in originals:
+                for frame in frames:
+                    rotation = frame.T @ original_frame
+                    matrix = np.column_stack([rotation, centroids[k] - rotation @ centroids[original]])
+                    if same_shape(original_mesh, mesh, matrix, tolerance):
+                        instance_of[k] = original
+                        transforms[k] = matrix
+                        break
+                if instance_of[k] != k:
+                    break
+            if instance_of[k] == k and frames:
+                originals.append((k, mesh, frames[0]))
+
+    return instance_of, transforms
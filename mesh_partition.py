@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+Label Partitioning
+Groups faces by label in one pass and extracts reindexed region sub-meshes
+"""
+
+import numpy as np
+
+
+def partition_labels(labels, label_count=None):
+    """Stable counting-sort partition of a per-face label array
+
+    Returns (order, offsets) in CSR layout: the faces carrying label ``k``
+    are ``order[offsets[k]:offsets[k + 1]]``, in ascending face order.
+    """
+    labels = np.asarray(labels)
+    if label_count is None:
+        label_count = int(labels.max()) + 1 if len(labels) else 0
+
+    counts = np.bincount(labels, minlength=label_count)
+    offsets = np.zeros(label_count + 1, dtype=np.int64)
+    np.cumsum(counts, out=offsets[1:])
+
+    # Stable sort on small integer keys is a radix sort in NumPy: O(N)
+    order = np.argsort(labels, kind='stable')
+    return order, offsets
+
+
+def label_faces(order, offsets, label):
+    """Face indices carrying ``label`` (a view into ``order``)"""
+    return order[offsets[label]:offsets[label + 1]]
+
+
+def split_partition(order, offsets):
+    """List of face index arrays, one per label"""
+    return [order[offsets[k]:offsets[k + 1]] for k in range(len(offsets) - 1)]
+
+
+def extract_submesh(vertices, faces, face_index):
+    """Sub-mesh made of ``faces[face_index]`` with only the vertices it uses
+
+    Returns (sub_vertices, sub_faces) with faces renumbered from 0.
+    """
+    region_faces = faces[face_index]
+    used, inverse = np.unique(region_faces, return_inverse=True)
+    sub_faces = inverse.reshape(-1, 3).astype(faces.dtype, copy=False)
+    return vertices[used], sub_faces
+
+
+def extract_regions(vertices, faces, labels, label_count=None):
+    """Yield (label, face_index, sub_vertices, sub_faces) for every non-empty label"""
+    order, offsets = partition_labels(labels, label_count)
+    for label in range(len(offsets) - 1):
+        face_index = label_faces(order, offsets, label)
+        if len(face_index) == 0:
+            continue
+        sub_vertices, sub_faces = extract_submesh(vertices, faces, face_index)
+        yield label, face_index, sub_vertices, sub_faces
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Vertex Welding
+Turns raw STL triangle soup into a compact indexed mesh in one NumPy pass
+"""
+
+import numpy as np
+
+from stl_io import read_stl, triangle_vertices
+from mesh_core import Mesh
+
+# Coordinates closer than this (in mm) on every axis collapse into one vertex
+DEFAULT_TOLERANCE = 1e-4
+
+
+def quantize(points, tolerance=DEFAULT_TOLERANCE):
+    """Snap (M, 3) points to an integer grid with ``tolerance`` spacing"""
+    if tolerance <= 0:
+        raise ValueError(f"Weld tolerance must be positive, got {tolerance}")
+    grid = np.round(np.asarray(points, dtype=np.float64) / tolerance)
+    return grid.astype(np.int64)
+
+
+def weld_triangles(tri_vertices, tolerance=DEFAULT_TOLERANCE):
+    """Weld an (N, 3, 3) corner array into a mesh_core.Mesh
+
+    Faces keep STL triangle order and vertices are numbered by first
+    appearance. ``source_corner`` holds the first STL corner
+    (triangle * 3 + corner) of each vertex; faces.ravel() is the inverse
+    map, so vertices[faces] rebuilds the original corner array.
+    """
+    corners = np.asarray(tri_vertices).reshape(-1, 3)
+    if len(corners) == 0:
+        return Mesh(np.zeros((0, 3), dtype=np.float32),
+                    np.zeros((0, 3), dtype=np.int32),
+                    source_corner=np.zeros(0, dtype=np.int64))
+
+    # One 24-byte key per corner so np.unique can sort rows as opaque bytes
+    keys = np.ascontiguousarray(quantize(corners, tolerance))
+    keys = keys.view(np.dtype((np.void, keys.dtype.itemsize * 3))).ravel()
+    _, source_corner, inverse = np.unique(keys, return_index=True, return_inverse=True)
+
+    # Renumber vertices in order of first appearance so output is stable
+    order = np.argsort(source_corner, kind='stable')
+    rank = np.empty(len(order), dtype=np.int32)
+    rank[order] = np.arange(len(order), dtype=np.int32)
+    source_corner = source_corner[order]
+
+    vertices = np.ascontiguousarray(corners[source_corner], dtype=np.float32)
+    faces = rank[inverse.ravel()].reshape(-1, 3)
+    return Mesh(vertices, faces, source_corner=source_corner)
+
+
+def weld_stl(filepath, tolerance=DEFAULT_TOLERANCE):
+    """Read a binary STL and weld it"""
+    return weld_triangles(triangle_vertices(read_stl(filepath)), tolerance)
+
+
+def to_trimesh(welded):
+    """Wrap a Mesh as a trimesh.Trimesh without re-merging vertices"""
+    import trimesh
+    return trimesh.Trimesh(vertices=welded.vertices, faces=welded.faces, process=False)
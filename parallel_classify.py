@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Parallel Region Classification
+Splits rule-based triangle classification across a process pool using shared memory
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from region_rules import compile_rule_set, classify_centers, classify_normalized
+from mesh_bounds import Bounds
+from mesh_core import face_centroids
+
+# Faces handed to a worker per task; several tasks per worker keep the pool
+# balanced when some face ranges are cheaper than others
+MIN_TASK_FACES = 65536
+TASKS_PER_WORKER = 4
+
+# Per-process state set up by _attach()
+_worker = {}
+
+
+def default_workers():
+    """Usable CPU count for this process"""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def _share(array):
+    """Copy an array into a new shared memory block; returns (block, spec)"""
+    array = np.ascontiguousarray(array)
+    block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+    np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)[...] = array
+    return block, (block.name, array.shape, array.dtype.str)
+
+
+def _view(spec):
+    """Attach to a shared block by spec; returns (block, ndarray view)"""
+    name, shape, dtype = spec
+    block = shared_memory.SharedMemory(name=name)
+    return block, np.ndarray(shape, dtype=dtype, buffer=block.buf)
+
+
+def _attach(vertices_spec, faces_spec, labels_spec, lo, hi, rule_set, regions):
+    """Pool initializer: map the shared arrays and compile the rules once"""
+    blocks = []
+    for key, spec in (('vertices', vertices_spec), ('faces', faces_spec), ('labels', labels_spec)):
+        block, _worker[key] = _view(spec)
+        blocks.append(block)
+    _worker['blocks'] = blocks  # keep the mappings alive for the worker's lifetime
+    _worker['bounds'] = Bounds(np.asarray(lo), np.asarray(hi))
+    _worker['compiled'] = compile_rule_set(rule_set, regions)
+
+
+def _classify_range(start, stop):
+    """Worker task: label faces[start:stop] straight into the shared label array"""
+    vertices = _worker['vertices']
+    faces = _worker['faces'][start:stop]
+    pct = _worker['bounds'].normalize(face_centroids(vertices, faces))
+    _worker['labels'][start:stop] = classify_normalized(pct, _worker['compiled'])
+    return stop - start
+
+
+def classify_faces(vertices, faces, bounds, rule_set, regions, workers=1):
+    """Label every face of an indexed mesh with a rule set (uint8 array)
+
+    With ``workers`` > 1 the vertex, face and label arrays are placed in
+    shared memory once and face ranges are classified by a process pool;
+    only range bounds travel between processes, never mesh data.
+    """
+    faces = np.asarray(faces)
+    if workers is None or workers <= 0:
+        workers = default_workers()
+    if workers == 1 or len(faces) < 2 * MIN_TASK_FACES:
+        return classify_centers(face_centroids(vertices, faces), bounds, rule_set, regions)
+
+    task = max(MIN_TASK_FACES, -(-len(faces) // (workers * TASKS_PER_WORKER)))
+    ranges = [(start, min(start + task, len(faces))) for start in range(0, len(faces), task)]
+
+    blocks = []
+    try:
+        vertices_block, vertices_spec = _share(vertices)
+        blocks.append(vertices_block)
+        faces_block, faces_spec = _share(faces)
+        blocks.append(faces_block)
+        labels_block, labels_spec = _share(np.zeros(len(faces), dtype=np.uint8))
+        blocks.append(labels_block)
+
+        initargs = (vertices_spec, faces_spec, labels_spec,
+                    bounds.lo, bounds.hi, rule_set, list(regions))
+        with ProcessPoolExecutor(max_workers=min(workers, len(ranges)),
+                                 initializer=_attach, initargs=initargs) as pool:
+            futures = [pool.submit(_classify_range, start, stop) for start, stop in ranges]
+            for future in futures:
+                future.result()
+
+        labels = np.ndarray(len(faces), dtype=np.uint8, buffer=labels_block.buf).copy()
+        return labels
+    finally:
+        for block in blocks:
+            block.close()
+            block.unlink()
@@ -0,0 +1,336 @@
+#!/usr/bin/env python3
+"""
+3D Printer Pipeline CLI
+One entry point for every stage; each subcommand imports only what it needs,
+so config-only commands start without loading NumPy or trimesh
+"""
+
+import os
+import sys
+import argparse
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_CONFIG = os.path.join(REPO_DIR, 'color_map_config.txt')
+DEFAULT_PAINTGROUPS = os.path.join(REPO_DIR, 'bambu_paintgroups.txt')
+# batch.TOOLS, spelled out so building the parser doesn't import batch (and concurrent.futures)
+WATCH_TOOLS = ('advanced', 'triangle', 'parts', 'pipeline', 'slice')
+
+
+def _stem(path):
+    return os.path.splitext(os.path.basename(path))[0]
+
+
+def cmd_colors(args):
+    """Print the color groups of a color map config"""
+    import configparser
+    config = configparser.ConfigParser()
+    config.read(args.config)
+    print("Groups:", len(config.sections()))
+    for section in config.sections():
+        print(f"- {section}: {config[section].get('label')} -> {config[section].get('hex')}")
+
+
+def cmd_check(args):
+    from mesh_cache import load_mesh
+    from preflight_mesh_check import check_mesh, print_report
+    for path in args.inputs:
+        print(f"\nAnalyzing {os.path.basename(path)}")
+        print_report(check_mesh(load_mesh(path)))
+
+
+def cmd_repair(args):
+    from mesh_cache import load_mesh
+    from preflight_repair import repair_mesh
+    from stl_io import write_stl
+    print(f"\nRepairing {os.path.basename(args.input)}")
+    mesh = repair_mesh(load_mesh(args.input))
+    output = args.output or os.path.join(os.path.dirname(args.input) or '.',
+                                         f"{_stem(args.input)}_repaired_preserve.stl")
+    write_stl(output, mesh)
+    print("  Saved:", output)
+
+
+def cmd_split(args):
+    max_memory = None
+    if args.max_memory:
+        from memory_size import parse_memory_size
+        max_memory = parse_memory_size(args.max_memory)
+
+    if args.mode == 'components':
+        from split_stl_parts import split_stl
+        split_stl(args.input, args.output_dir or 'split_parts', args.dedup)
+    elif args.mode == 'advanced':
+        from advanced_color_splitter import split_by_advanced_anatomy
+        split_by_advanced_anatomy(args.input, args.output_dir or 'ANATOMICAL_PARTS', args.config,
+                                  args.workers, args.recolor)
+    elif args.mode == 'triangle':
+        from mesh_cache import load_mesh
+        from triangle_anatomical_splitter import (load_color_config, analyze_triangle_anatomy,
+                                                  save_anatomical_regions, recolor_regions)
+        output_dir = args.output_dir or 'ANATOMICAL_REGIONS'
+        color_map = load_color_config(args.config)
+        if args.recolor and recolor_regions(args.input, output_dir, color_map) is not None:
+            return
+        mesh = load_mesh(args.input)
+        labels = analyze_triangle_anatomy(mesh, color_map, args.workers, args.input)
+        save_anatomical_regions(mesh, labels, color_map, args.input, output_dir)
+    elif args.mode == 'anatomical':
+        from color_split_anatomical import split_by_anatomy
+        split_by_anatomy(args.input, args.output_dir or 'anatomical_parts', max_memory, args.trim_percent)
+
+
+def cmd_classify(args):
+    import configparser
+    import numpy as np
+    from mesh_cache import load_mesh, cached_labels, store_labels
+    from mesh_bounds import compute_bounds
+    from region_rules import load_rule_set
+    from parallel_classify import classify_faces
+
+    config = configparser.ConfigParser()
+    config.read(args.config)
+    regions = config.sections()
+    rule_set = load_rule_set(args.rule_set)
+
+    # Cached labels were classified against exact bounds, so trimmed runs bypass the cache
+    labels = None if args.trim_percent else cached_labels(args.input, rule_set, regions)
+    if labels is None:
+        mesh = load_mesh(args.input)
+        bounds = compute_bounds(mesh.vertices, args.trim_percent)
+        labels = classify_faces(mesh.vertices, mesh.faces, bounds, rule_set, regions, args.workers)
+        if not args.trim_percent:
+            store_labels(args.input, rule_set, regions, labels)
+
+    counts = np.bincount(labels, minlength=len(regions))
+    for region, count in zip(regions, counts):
+        print(f"  {region:15s}: {count:9,} triangles ({count / max(len(labels), 1) * 100:5.1f}%)")
+    if args.save:
+        np.save(args.save, np.asarray(labels))
+        print(f"Labels: {args.save}")
+
+
+def cmd_assign(args):
+    from bambu_color_assign import create_color_assignment
+    create_color_assignment(args.input, args.paintgroups, args.output)
+
+
+def cmd_export(args):
+    import json
+    from mesh_cache import load_mesh
+    from threemf_writer import write_3mf
+    assign = {}
+    if args.assign:
+        with open(args.assign) as f:
+            assign = json.load(f)
+    mesh = load_mesh(args.input)
+    output = args.output or os.path.join(os.path.dirname(args.input) or '.', f"{_stem(args.input)}.3mf")
+    write_3mf(output, [(os.path.basename(args.input), mesh.vertices, mesh.faces)], assign,
+              args.compress_level)
+    print("Saved:", output)
+
+
+def cmd_paint(args):
+    from export_painted_3mf import export_painted_3mf
+    output = args.output or os.path.join(os.path.dirname(args.input) or '.', f"{_stem(args.input)}_painted.3mf")
+    export_painted_3mf(args.input, output, args.config, args.labels, args.rule_set, args.workers,
+                       args.compress_level, not args.no_paint)
+
+
+def cmd_slice(args):
+    import slicer
+    memory_limit = None
+    if args.memory:
+        from memory_size import parse_memory_size
+        memory_limit = parse_memory_size(args.memory)
+    results = slicer.slice_many(args.inputs, args.output_dir or slicer.OUTPUT_DIR,
+                                args.workers if args.workers > 0 else (os.cpu_count() or 1),
+                                args.slicer or slicer.SLICER_BIN, args.profiles or slicer.PROFILES_DIR,
+                                args.log_dir or slicer.LOG_DIR, memory_limit, args.cpu_time,
+                                args.cpus_per_job, slicer.print_result, **slicer.watchdog_options(args))
+    slicer.print_failures(results)
+    return 1 if any(not r.ok for r in results) else 0
+
+
+def cmd_upload(args):
+    import printer_upload
+    failed = 0
+    for path in args.inputs:
+        try:
+            result = printer_upload.upload_file(path, args.printer_ip or printer_upload.PRINTER_IP,
+                                                args.access_code or printer_upload.PRINTER_ACCESS_CODE,
+                                                args.resume)
+            print(f"✓ Uploaded successfully: {printer_upload.format_result(result)}")
+        except (RuntimeError, OSError) as e:
+            print(f"✗ {e}")
+            failed += 1
+    return 1 if failed else 0
+
+
+def cmd_print(args):
+    import time
+    import slicer
+    import slice_upload
+    workers = args.workers if args.workers != 0 else (os.cpu_count() or 1)
+    start = time.perf_counter()
+    results = slice_upload.slice_and_upload(
+        args.inputs, args.output_dir or slicer.OUTPUT_DIR, workers, args.upload_workers, args.queue_size,
+        args.printer_ip or slice_upload.printer_upload.PRINTER_IP,
+        args.access_code or slice_upload.printer_upload.PRINTER_ACCESS_CODE,
+        slicer=args.slicer or slicer.SLICER_BIN, profiles_dir=args.profiles or slicer.PROFILES_DIR,
+        **slicer.watchdog_options(args))
+    slice_upload.print_summary(results, time.perf_counter() - start)
+    return 0 if all(r['uploaded'] for r in results) else 1
+
+
+def cmd_watch(args):
+    from ingest_daemon import IngestDaemon, print_summary
+    workers = args.workers
+    if workers <= 0:
+        from parallel_classify import default_workers
+        workers = default_workers()
+    daemon = IngestDaemon(args.watch_dir, args.tool, args.output_dir, args.config, workers, args.queue_size,
+                          args.settle, args.poll, args.poll_interval, args.keep, args.verbose)
+    summary = daemon.run(once=args.once)
+    print_summary(summary)
+    return 1 if summary and summary['failed'] else 0
+
+
+def build_parser():
+    import slice_flags  # the watchdog flags, without slicer's subprocess and thread pool imports
+    parser = argparse.ArgumentParser(prog="pipeline", description="3D printer pipeline")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="don't read or write the parsed-mesh cache (same as MESH_CACHE_DIR=off)")
+    sub = parser.add_subparsers(dest="command", metavar="COMMAND", required=True)
+
+    p = sub.add_parser("colors", help="show the color groups of a config")
+    p.add_argument("--config", default=DEFAULT_CONFIG)
+    p.set_defaults(func=cmd_colors)
+
+    p = sub.add_parser("check", help="preflight mesh report")
+    p.add_argument("inputs", nargs="+", metavar="input.stl")
+    p.set_defaults(func=cmd_check)
+
+    p = sub.add_parser("repair", help="fix normals, fill holes, stitch")
+    p.add_argument("input", metavar="input.stl")
+    p.add_argument("-o", "--output", help="default: <input>_repaired_preserve.stl")
+    p.set_defaults(func=cmd_repair)
+
+    p = sub.add_parser("split", help="split a model into parts or regions")
+    p.add_argument("input", metavar="input.stl")
+    p.add_argument("output_dir", nargs="?")
+    p.add_argument("--mode", default="advanced", choices=["components", "advanced", "triangle", "anatomical"])
+    p.add_argument("--config", default=DEFAULT_CONFIG)
+    p.add_argument("--workers", type=int, default=1, metavar="N",
+                   help="classify on N processes (0 = all available cores)")
+    p.add_argument("--recolor", action="store_true", help="palette-only change (advanced, triangle)")
+    p.add_argument("--dedup", action="store_true", help="write identical parts once (components)")
+    p.add_argument("--max-memory", metavar="SIZE", help="out-of-core budget (anatomical)")
+    p.add_argument("--trim-percent", type=float, metavar="PCT", help="robust bounds (anatomical)")
+    p.set_defaults(func=cmd_split)
+
+    p = sub.add_parser("classify", help="region triangle counts without writing parts")
+    p.add_argument("input", metavar="input.stl")
+    p.add_argument("--rule-set", default="advanced")
+    p.add_argument("--config", default=DEFAULT_CONFIG)
+    p.add_argument("--workers", type=int, default=1, metavar="N")
+    p.add_argument("--trim-percent", type=float, metavar="PCT")
+    p.add_argument("--save", metavar="LABELS.npy", help="write the per-triangle labels")
+    p.set_defaults(func=cmd_classify)
+
+    p = sub.add_parser("assign", help="color assignment JSON from paint groups")
+    p.add_argument("input", metavar="input.stl")
+    p.add_argument("paintgroups", nargs="?", default=DEFAULT_PAINTGROUPS)
+    p.add_argument("-o", "--output", default="bambu_color_assignment.json")
+    p.set_defaults(func=cmd_assign)
+
+    p = sub.add_parser("export", help="3MF with the color assignment embedded")
+    p.add_argument("input", metavar="input.stl")
+    p.add_argument("-o", "--output", help="default: <input>.3mf")
+    p.add_argument("--assign", metavar="JSON", help="color assignment to embed")
+    p.add_argument("--compress-level", type=int, default=6, choices=range(10), metavar="0-9",
+                   help="deflate level, 0 = store uncompressed (default: 6)")
+    p.set_defaults(func=cmd_export)
+
+    p = sub.add_parser("paint", help="one multi-material 3MF painted by region")
+    p.add_argument("input", metavar="input.stl")
+    p.add_argument("-o", "--output", help="default: <input>_painted.3mf")
+    p.add_argument("--config", default=DEFAULT_CONFIG)
+    p.add_argument("--labels", metavar="LABELS.npy", help="per-triangle labels (default: classify)")
+    p.add_argument("--rule-set", default="advanced")
+    p.add_argument("--workers", type=int, default=1, metavar="N")
+    p.add_argument("--compress-level", type=int, default=6, choices=range(10), metavar="0-9")
+    p.add_argument("--no-paint", action="store_true", help="materials only, no slicer paint_color")
+    p.set_defaults(func=cmd_paint)
+
+    p = sub.add_parser("slice", help="slice models with the slicer CLI")
+    p.add_argument("inputs", nargs="+", metavar="input.stl")
+    p.add_argument("-o", "--output-dir")
+    p.add_argument("--slicer", help="slicer binary (default: $SLICER_BIN)")
+    p.add_argument("--profiles", help="profile directory (default: $SLICER_PROFILES)")
+    p.add_argument("-j", "--workers", type=int, default=1, metavar="N",
+                   help="slicer processes at once (0 = one per core)")
+    p.add_argument("--memory", metavar="SIZE", help="address-space limit per job, e.g. 4G")
+    p.add_argument("--cpu-time", type=int, metavar="SECONDS", help="CPU-time limit per job")
+    p.add_argument("--cpus-per-job", type=int, metavar="N", help="pin each job to N cores of its own")
+    p.add_argument("--log-dir", help="per-job logs (default: ~/AI_PIPELINE/logs)")
+    slice_flags.add_watchdog_arguments(p)
+    p.set_defaults(func=cmd_slice)
+
+    p = sub.add_parser("upload", help="send G-code to the printer over FTPS")
+    p.add_argument("inputs", nargs="+", metavar="file.gcode")
+    p.add_argument("--printer-ip", help="default: $PRINTER_IP")
+    p.add_argument("--access-code", help="default: $PRINTER_ACCESS_CODE")
+    p.add_argument("--resume", action="store_true",
+                   help="continue partial files already on the printer instead of starting over; "
+                        "a partial is only continued if its last 64 KiB match the local file")
+    p.set_defaults(func=cmd_upload)
+
+    p = sub.add_parser("print", help="slice models and upload each one while the next slices")
+    p.add_argument("inputs", nargs="+", metavar="input.stl")
+    p.add_argument("-o", "--output-dir")
+    p.add_argument("--slicer", help="slicer binary (default: $SLICER_BIN)")
+    p.add_argument("--profiles", help="profile directory (default: $SLICER_PROFILES)")
+    p.add_argument("-j", "--workers", type=int, default=1, metavar="N",
+                   help="slicer processes at once (0 = one per core)")
+    p.add_argument("--upload-workers", type=int, default=1, metavar="N", help="uploads at once")
+    p.add_argument("--queue-size", type=int, default=2, metavar="N",
+                   help="sliced files waiting to upload before slicing pauses (default: 2)")
+    p.add_argument("--printer-ip", help="default: $PRINTER_IP")
+    p.add_argument("--access-code", help="default: $PRINTER_ACCESS_CODE")
+    slice_flags.add_watchdog_arguments(p)
+    p.set_defaults(func=cmd_print)
+
+    p = sub.add_parser("watch", help="process STLs as they are dropped into a folder")
+    p.add_argument("watch_dir", nargs="?", default=os.path.expanduser('~/AI_PIPELINE/LOCKED_SPLIT_STAGE'))
+    p.add_argument("--tool", default="slice", choices=WATCH_TOOLS)
+    p.add_argument("-o", "--output-dir")
+    p.add_argument("--config", default=DEFAULT_CONFIG)
+    p.add_argument("-j", "--workers", type=int, default=2, metavar="N",
+                   help="files processed at once (0 = all available cores, default: 2)")
+    p.add_argument("--queue-size", type=int, default=64, metavar="N",
+                   help="settled files allowed to wait for a worker (default: 64)")
+    p.add_argument("--settle", type=float, default=1.0, metavar="SECONDS")
+    p.add_argument("--poll", action="store_true", help="poll instead of inotify")
+    p.add_argument("--poll-interval", type=float, default=0.5, metavar="SECONDS")
+    p.add_argument("--keep", action="store_true", help="don't rename inputs to .processed/.failed")
+    p.add_argument("--once", action="store_true", help="process existing files, then exit")
+    p.add_argument("-v", "--verbose", action="store_true", help="show each tool's full output")
+    p.set_defaults(func=cmd_watch)
+
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.no_cache:
+        os.environ['MESH_CACHE_DIR'] = 'off'  # before mesh_cache is imported; workers inherit it
+    try:
+        sys.exit(args.func(args) or 0)
+    except Exception as e:
+        print(f"\n❌ Error: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
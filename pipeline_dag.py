@@ -0,0 +1,306 @@
+#!/usr/bin/env python3
+"""
+Pipeline DAG Runner
+Runs check → repair → split → assign → export in one process, passing meshes
+and labels in memory and skipping stages whose inputs haven't changed
+"""
+
+import os
+import sys
+import json
+import time
+import hashlib
+import argparse
+import tempfile
+import configparser
+from pathlib import Path
+
+import numpy as np
+
+from mesh_cache import load_mesh, content_hash
+from mesh_weld import weld_triangles
+from mesh_bounds import compute_bounds
+from mesh_components import label_components
+from mesh_partition import extract_regions
+from region_rules import RULES_FILE, load_rule_set
+from parallel_classify import classify_faces
+from stl_io import write_stl
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+RUNS_DIR = os.path.expanduser('~/AI_PIPELINE/RUNS')
+STATE_FILE = '.pipeline_state.json'
+
+
+class Stage:
+    """One node of the pipeline
+
+    ``run(*inputs)`` receives the artifacts of the stages named in
+    ``inputs`` and returns this stage's artifact. A stage with an ``output``
+    is a checkpoint: ``save(artifact, output)`` persists it (or ``run``
+    writes it itself when ``save`` is None) and ``load(output)`` reads it
+    back when a later stage needs it but nothing upstream changed.
+
+    The fingerprint covers ``params``, the content of ``files`` and the
+    fingerprints of the inputs; bump ``version`` when the code changes.
+    """
+
+    def __init__(self, name, run, inputs=(), params=None, files=(),
+                 output=None, save=None, load=None, version=1):
+        self.name = name
+        self.run = run
+        self.inputs = tuple(inputs)
+        self.params = params or {}
+        self.files = tuple(files)
+        self.output = output
+        self.save = save
+        self.load = load
+        self.version = version
+
+
+class Pipeline:
+    """A DAG of stages with make-style up-to-date checks"""
+
+    def __init__(self, state_path):
+        self.state_path = state_path
+        self.stages = {}
+        self.artifacts = {}
+        self.status = {}
+        self.timings = {}
+        self.force = False
+        self._fingerprints = {}
+        try:
+            with open(state_path) as f:
+                self.state = json.load(f)
+        except (OSError, ValueError):
+            self.state = {}
+
+    def add(self, stage):
+        """Register a stage; its inputs must already be registered"""
+        for name in stage.inputs:
+            if name not in self.stages:
+                raise ValueError(f"Stage '{stage.name}' depends on unknown stage '{name}'")
+        self.stages[stage.name] = stage
+        return stage
+
+    def fingerprint(self, name):
+        if name not in self._fingerprints:
+            stage = self.stages[name]
+            payload = {
+                'stage': name,
+                'version': stage.version,
+                'params': stage.params,
+                'files': [content_hash(path) for path in stage.files],
+                'inputs': [self.fingerprint(i) for i in stage.inputs],
+            }
+            encoded = json.dumps(payload, sort_keys=True, default=str).encode()
+            self._fingerprints[name] = hashlib.blake2b(encoded, digest_size=16).hexdigest()
+        return self._fingerprints[name]
+
+    def up_to_date(self, name):
+        """True if the stage's checkpoint exists and was built from the same inputs"""
+        stage = self.stages[name]
+        return (not self.force and stage.output is not None
+                and os.path.exists(stage.output)
+                and self.state.get(name) == self.fingerprint(name))
+
+    def _save_state(self):
+        directory = os.path.dirname(self.state_path)
+        fd, staging = tempfile.mkstemp(prefix='.tmp-', dir=directory)
+        with os.fdopen(fd, 'w') as f:
+            json.dump(self.state, f, indent=2)
+        os.replace(staging, self.state_path)
+
+    def get(self, name):
+        """Artifact of a stage: from memory, from its checkpoint, or by running it"""
+        if name in self.artifacts:
+            return self.artifacts[name]
+
+        stage = self.stages[name]
+        if stage.load is not None and self.up_to_date(name):
+            start = time.perf_counter()
+            artifact = stage.load(stage.output)
+            self.status[name] = 'loaded'
+        else:
+            inputs = [self.get(i) for i in stage.inputs]
+            start = time.perf_counter()
+            artifact = stage.run(*inputs)
+            if stage.save is not None:
+                stage.save(artifact, stage.output)
+            if stage.output is not None:
+                self.state[name] = self.fingerprint(name)
+                self._save_state()
+            self.status[name] = 'ran'
+        self.timings[name] = self.timings.get(name, 0.0) + time.perf_counter() - start
+
+        self.artifacts[name] = artifact
+        return artifact
+
+    def run(self, targets=None, force=False):
+        """Bring ``targets`` (default: every checkpoint stage) up to date
+
+        Returns {stage: 'ran' | 'loaded' | 'up to date'} for the stages touched.
+        """
+        self.force = force
+        targets = targets or [name for name, s in self.stages.items() if s.output]
+        for name in self.stages:
+            if name not in targets:
+                continue
+            if self.up_to_date(name):
+                self.status.setdefault(name, 'up to date')
+                print(f"⏭️  {name:8s} up to date")
+                continue
+            print(f"\n▶️  {name}")
+            self.get(name)
+        return dict(self.status)
+
+
+# ---------------------------------------------------------------------------
+# Stages of the 3D printer pipeline
+# ---------------------------------------------------------------------------
+
+def _save_json(data, path):
+    with open(path, 'w') as f:
+        json.dump(data, f, indent=2)
+
+
+def _load_json(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def _repair(mesh):
+    from preflight_repair import repair_mesh
+    repaired = repair_mesh(mesh)
+    # Re-weld so the in-memory mesh matches what the checkpoint reloads to
+    return weld_triangles(np.asarray(repaired.triangles, dtype=np.float32))
+
+
+def _split(mesh, stem, mode, config_path):
+    """(labels, names) for the repaired mesh; names[label] is the part file stem"""
+    if mode == 'components':
+        from split_parts import load_palette, part_names
+        count, labels = label_components(mesh.faces, len(mesh.vertices))
+        return labels, part_names(stem, count, load_palette(config_path))
+
+    config = configparser.ConfigParser()
+    config.read(config_path)
+    regions = config.sections()
+    bounds = compute_bounds(mesh.vertices)
+    labels = classify_faces(mesh.vertices, mesh.faces, bounds, load_rule_set(mode), regions)
+    return labels, [f"{stem}_{region}" for region in regions]
+
+
+def _parts(mesh, split):
+    """(name, vertices, faces) for every non-empty part"""
+    labels, names = split
+    return [(names[label], vertices, faces)
+            for label, _, vertices, faces in extract_regions(mesh.vertices, mesh.faces, labels, len(names))]
+
+
+def _save_split(mesh):
+    def save(split, directory):
+        os.makedirs(directory, exist_ok=True)
+        for old in Path(directory).glob('*.stl'):  # parts from a previous split
+            old.unlink()
+        labels, names = split
+        for name, vertices, faces in _parts(mesh(), split):
+            write_stl(os.path.join(directory, f"{name}.stl"), (vertices, faces))
+            print(f"  Saved: {name}.stl")
+        np.save(os.path.join(directory, 'labels.npy'), np.asarray(labels))
+        _save_json(names, os.path.join(directory, 'names.json'))
+    return save
+
+
+def _load_split(directory):
+    return (np.load(os.path.join(directory, 'labels.npy'), mmap_mode='r'),
+            _load_json(os.path.join(directory, 'names.json')))
+
+
+def build_pipeline(input_file, run_dir=None, split_mode='components',
+                   config_path=None, paintgroups_path=None):
+    """The standard pipeline for one model; every stage after loading is a checkpoint"""
+    from preflight_mesh_check import check_mesh, print_report
+    from bambu_color_assign import create_color_assignment
+    from threemf_writer import write_3mf
+
+    stem = Path(input_file).stem
+    run_dir = run_dir or os.path.join(RUNS_DIR, stem)
+    config_path = config_path or os.path.join(REPO_DIR, 'color_map_config.txt')
+    paintgroups_path = paintgroups_path or os.path.join(REPO_DIR, 'bambu_paintgroups.txt')
+    os.makedirs(run_dir, exist_ok=True)
+
+    def output(name):
+        return os.path.join(run_dir, name)
+
+    def check(mesh):
+        report = check_mesh(mesh)
+        print_report(report)
+        return report
+
+    pipeline = Pipeline(output(STATE_FILE))
+    pipeline.add(Stage('model', lambda: load_mesh(input_file), files=[input_file]))
+    pipeline.add(Stage('check', check, inputs=['model'],
+                       output=output(f"{stem}_preflight.json"), save=_save_json, load=_load_json))
+    pipeline.add(Stage('repair', _repair, inputs=['model'],
+                       output=output(f"{stem}_repaired_preserve.stl"),
+                       save=lambda mesh, path: write_stl(path, mesh), load=load_mesh))
+    # Rule-set modes classify with region_rules.txt, so a rule edit reruns the split
+    split_files = [config_path] if split_mode == 'components' else [config_path, RULES_FILE]
+    pipeline.add(Stage('split', lambda mesh: _split(mesh, stem, split_mode, config_path),
+                       inputs=['repair'], params={'mode': split_mode}, files=split_files,
+                       output=output('parts'), save=_save_split(lambda: pipeline.get('repair')),
+                       load=_load_split))
+    pipeline.add(Stage('assign', lambda: create_color_assignment(f"{stem}.stl", paintgroups_path,
+                                                                 output('color_assignment.json')),
+                       files=[paintgroups_path], output=output('color_assignment.json'),
+                       load=_load_json))
+    pipeline.add(Stage('export', lambda mesh, split, assign: write_3mf(output(f"{stem}.3mf"),
+                                                                       _parts(mesh, split), assign),
+                       inputs=['repair', 'split', 'assign'], output=output(f"{stem}.3mf")))
+    return pipeline
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the model pipeline, skipping up-to-date stages")
+    parser.add_argument("input_file", metavar="input.stl")
+    parser.add_argument("stages", nargs="*", metavar="STAGE",
+                        help="stages to bring up to date: check, repair, split, assign, export (default: all)")
+    parser.add_argument("--run-dir", help=f"checkpoint directory (default: {RUNS_DIR}/<model>)")
+    parser.add_argument("--split", default="components", choices=["components", "advanced", "triangle"],
+                        help="split by connected components or by a region rule set")
+    parser.add_argument("--config", help="color map config (default: color_map_config.txt)")
+    parser.add_argument("--paintgroups", help="paint groups JSON (default: bambu_paintgroups.txt)")
+    parser.add_argument("--force", action="store_true", help="rerun stages even if up to date")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.input_file):
+        print(f"Error: File not found: {args.input_file}")
+        sys.exit(1)
+
+    try:
+        print(f"\n{'='*60}")
+        print("PIPELINE")
+        print(f"{'='*60}")
+        start = time.perf_counter()
+        pipeline = build_pipeline(args.input_file, args.run_dir, args.split,
+                                  args.config, args.paintgroups)
+        unknown = [s for s in args.stages if s not in pipeline.stages]
+        if unknown:
+            print(f"Error: Unknown stage(s): {', '.join(unknown)}")
+            sys.exit(1)
+        status = pipeline.run(args.stages, force=args.force)
+
+        print(f"\n{'='*60}")
+        for name, result in status.items():
+            timing = pipeline.timings.get(name)
+            print(f"  {name:8s}: {result:10s}" + (f" {timing:6.2f}s" if timing is not None else ""))
+        print(f"✅ Done in {time.perf_counter() - start:.2f}s")
+        print(f"{'='*60}\n")
+    except Exception as e:
+        print(f"\n❌ Error: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
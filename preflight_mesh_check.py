@@ -1,14 +1,31 @@
-import trimesh, os
+import os
+from mesh_weld import to_trimesh
+from mesh_cache import load_mesh
 
 INPUT_DIR = os.path.expanduser('~/AI_PIPELINE/INPUT')
 
-for file in os.listdir(INPUT_DIR):
-    if file.lower().endswith('.stl'):
-        path = os.path.join(INPUT_DIR, file)
-        mesh = trimesh.load_mesh(path)
-        print(f"\nAnalyzing {file}")
-        print("  Triangles:", len(mesh.faces))
-        print("  Vertices :", len(mesh.vertices))
-        print("  Watertight:", mesh.is_watertight)
-        print("  Bounds (mm):", mesh.extents.round(2).tolist())
-        print("  Volume (mm³):", round(mesh.volume, 2))
+def check_mesh(mesh):
+    """Printable preflight facts for a welded mesh"""
+    mesh = to_trimesh(mesh)
+    return {
+        "triangles": len(mesh.faces),
+        "vertices": len(mesh.vertices),
+        "watertight": bool(mesh.is_watertight),
+        "bounds_mm": mesh.extents.round(2).tolist(),
+        "volume_mm3": round(float(mesh.volume), 2),
+    }
+
+def print_report(report):
+    print("  Triangles:", report["triangles"])
+    print("  Vertices :", report["vertices"])
+    print("  Watertight:", report["watertight"])
+    print("  Bounds (mm):", report["bounds_mm"])
+    print("  Volume (mm³):", report["volume_mm3"])
+
+if __name__ == "__main__":
+    for file in os.listdir(INPUT_DIR):
+        if file.lower().endswith('.stl'):
+            path = os.path.join(INPUT_DIR, file)
+            mesh = load_mesh(path)
+            print(f"\nAnalyzing {file}")
+            print_report(check_mesh(mesh))
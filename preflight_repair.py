@@ -1,16 +1,13 @@
 import os, trimesh
+from mesh_weld import to_trimesh
+from mesh_cache import load_mesh
 
 INPUT_DIR  = os.path.expanduser('~/AI_PIPELINE/INPUT')
 OUTPUT_DIR = os.path.expanduser('~/AI_PIPELINE/REPAIRED')
-os.makedirs(OUTPUT_DIR, exist_ok=True)
 
-for name in os.listdir(INPUT_DIR):
-    if not name.lower().endswith('.stl'):
-        continue
-
-    path = os.path.join(INPUT_DIR, name)
-    print(f"\nRepairing {name}")
-    mesh = trimesh.load_mesh(path)
+def repair_mesh(mesh):
+    """Fix normals, fill holes and stitch open edges; returns a trimesh.Trimesh"""
+    mesh = to_trimesh(mesh)
 
     # --- Basic cleanup ---
     trimesh.repair.fix_normals(mesh)
@@ -39,8 +36,21 @@ for name in os.listdir(INPUT_DIR):
 
     # --- Final report ---
     print("  Watertight:", mesh.is_watertight)
-    out_path = os.path.join(
-        OUTPUT_DIR, f"{os.path.splitext(name)[0]}_repaired_preserve.stl"
-    )
-    mesh.export(out_path)
-    print("  Saved:", out_path)
+    return mesh
+
+if __name__ == "__main__":
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+
+    for name in os.listdir(INPUT_DIR):
+        if not name.lower().endswith('.stl'):
+            continue
+
+        path = os.path.join(INPUT_DIR, name)
+        print(f"\nRepairing {name}")
+        mesh = repair_mesh(load_mesh(path))
+
+        out_path = os.path.join(
+            OUTPUT_DIR, f"{os.path.splitext(name)[0]}_repaired_preserve.stl"
+        )
+        mesh.export(out_path)
+        print("  Saved:", out_path)
@@ -0,0 +1,303 @@
+#!/usr/bin/env python3
+"""
+Printer Upload
+Sends G-code to a Bambu printer's FTPS server over pooled implicit-TLS connections, resuming
+interrupted transfers where they stopped and checking the remote size afterwards
+"""
+
+import os
+import sys
+import ssl
+import time
+import atexit
+import ftplib
+import socket
+import argparse
+import threading
+from collections import namedtuple
+
+# Never hardcode these; export them or pass them on the command line
+PRINTER_IP = os.environ.get('PRINTER_IP', '')
+PRINTER_ACCESS_CODE = os.environ.get('PRINTER_ACCESS_CODE', '')
+PRINTER_USER = 'bblp'
+FTPS_PORT = 990
+
+# Large writes keep TLS record and syscall overhead down on 50-100 MB G-code
+BLOCK_SIZE = 1 << 20
+CONNECT_TIMEOUT = 30
+# Per socket operation, so a stalled transfer fails but a slow one never does
+IO_TIMEOUT = 60
+DEFAULT_RETRIES = 3
+RETRY_DELAY = 2.0
+# Bytes before the resume point compared with the local file before continuing a partial upload
+RESUME_CHECK_BYTES = 1 << 16
+
+UploadResult = namedtuple('UploadResult', ['remote', 'size', 'sent', 'resumed_from', 'seconds', 'attempts'])
+
+
+class ImplicitFTPS(ftplib.FTP_TLS):
+    """FTP_TLS for servers that speak TLS from the first byte (port 990)
+
+    The data connection reuses the control connection's TLS session,
+    which the printer's server insists on and which also saves a full
+    handshake per transfer.
+    """
+
+    def connect(self, host='', port=0, timeout=-999, source_address=None):
+        if host:
+            self.host = host
+        if port:
+            self.port = port
+        if timeout != -999:
+            self.timeout = timeout
+        if source_address is not None:
+            self.source_address = source_address
+        sock = socket.create_connection((self.host, self.port), self.timeout, source_address=self.source_address)
+        self.af = sock.family
+        self.sock = self.context.wrap_socket(sock, server_hostname=self.host)
+        self.file = self.sock.makefile('r', encoding=self.encoding)
+        self.welcome = self.getresp()
+        return self.welcome
+
+    def ntransfercmd(self, cmd, rest=None):
+        conn, size = ftplib.FTP.ntransfercmd(self, cmd, rest)
+        if self._prot_p:
+            conn = self.context.wrap_socket(conn, server_hostname=self.host, session=self.sock.session)
+        return conn, size
+
+
+def printer_context(verify=False):
+    """TLS context for the printer; it serves a self-signed certificate (curl -k)"""
+    context = ssl.create_default_context()
+    if not verify:
+        context.check_hostname = False
+        context.verify_mode = ssl.CERT_NONE
+    return context
+
+
+def remote_size(ftp, remote):
+    """Size of ``remote`` on the server, or None if it isn't there"""
+    try:
+        return ftp.size(remote)
+    except ftplib.error_perm:
+        return None
+
+
+def same_prefix(ftp, remote, local_file, offset, window=RESUME_CHECK_BYTES):
+    """True if the last ``window`` bytes of a remote partial of size ``offset`` match the local file
+
+    Reads back only that tail (REST + RETR), so resuming a big upload
+    costs at most ``window`` bytes of download.
+    """
+    start = max(0, offset - window)
+    with open(local_file, 'rb') as f:
+        f.seek(start)
+        expected = f.read(offset - start)
+    received = bytearray()
+    ftp.retrbinary(f'RETR {remote}', received.extend, rest=start or None)
+    return bytes(received) == expected
+
+
+def _close(ftp):
+    try:
+        ftp.quit()
+    except ftplib.all_errors:
+        ftp.close()
+
+
+class UploadManager:
+    """Uploads files to printers, keeping one open FTPS session per printer between files
+
+    Connections are pooled per (printer, access code) and checked with
+    NOOP before reuse, so a batch pays for one TLS handshake and login
+    instead of one per file. ``upload`` is thread-safe; concurrent
+    uploads to one printer each get their own connection.
+    """
+
+    def __init__(self, user=PRINTER_USER, port=FTPS_PORT, blocksize=BLOCK_SIZE, retries=DEFAULT_RETRIES,
+                 connect_timeout=CONNECT_TIMEOUT, timeout=IO_TIMEOUT, verify=False):
+        self.user = user
+        self.port = port
+        self.blocksize = blocksize
+        self.retries = retries
+        self.connect_timeout = connect_timeout
+        self.timeout = timeout
+        self.context = printer_context(verify)
+        self.connections = 0
+        self._idle = {}
+        self._lock = threading.Lock()
+
+    def _connect(self, host, access_code):
+        ftp = ImplicitFTPS(context=self.context, timeout=self.connect_timeout)
+        try:
+            ftp.connect(host, self.port)
+            ftp.timeout = self.timeout  # data connections opened from now on
+            ftp.sock.settimeout(self.timeout)
+            ftp.login(self.user, access_code)
+            ftp.prot_p()
+            ftp.voidcmd('TYPE I')
+        except BaseException:
+            ftp.close()
+            raise
+        with self._lock:
+            self.connections += 1
+        return ftp
+
+    def _acquire(self, host, access_code):
+        key = (host, access_code)
+        while True:
+            with self._lock:
+                idle = self._idle.get(key)
+                ftp = idle.pop() if idle else None
+            if ftp is None:
+                return self._connect(host, access_code)
+            try:
+                ftp.voidcmd('NOOP')
+                return ftp
+            except ftplib.all_errors:
+                ftp.close()  # the printer dropped it while idle
+
+    def _release(self, host, access_code, ftp):
+        with self._lock:
+            self._idle.setdefault((host, access_code), []).append(ftp)
+
+    def close(self):
+        """Log out of every idle connection"""
+        with self._lock:
+            idle = [ftp for pool in self._idle.values() for ftp in pool]
+            self._idle.clear()
+        for ftp in idle:
+            _close(ftp)
+
+    def upload(self, local_file, host, access_code, remote=None, resume=False, progress=None):
+        """Upload ``local_file`` as ``remote`` (default: its name in the SD card root)
+
+        A transfer that breaks off is retried up to ``retries`` times on a
+        fresh connection, sending only what the server doesn't have yet
+        (REST); with ``resume`` that already applies to the first attempt,
+        for picking up an upload an earlier run didn't finish, provided
+        the bytes just before the resume point match the local file (a
+        same-named leftover that doesn't is overwritten from the start).
+        The remote size is checked at the end. ``progress(sent)`` is called per block.
+        Raises RuntimeError once the attempts run out, straight away on a
+        permanent (5xx) error such as a wrong access code.
+        """
+        remote = remote or os.path.basename(local_file)
+        size = os.path.getsize(local_file)
+        sent = 0
+        resumed_from = 0
+        start = time.perf_counter()
+
+        def count(block):
+            nonlocal sent
+            sent += len(block)
+            if progress:
+                progress(sent)
+
+        error = None
+        for attempt in range(1, self.retries + 2):
+            if attempt > 1:
+                time.sleep(RETRY_DELAY)
+            ftp = None
+            try:
+                ftp = self._acquire(host, access_code)
+                offset = remote_size(ftp, remote) if resume or attempt > 1 else 0
+                if not offset or offset > size:
+                    offset = 0
+                elif attempt == 1 and not same_prefix(ftp, remote, local_file, offset):
+                    offset = 0  # somebody else's file, or an older version of this one
+                resumed_from = offset
+                if offset < size:
+                    with open(local_file, 'rb') as f:
+                        f.seek(offset)
+                        ftp.storbinary(f'STOR {remote}', f, self.blocksize, count, rest=offset or None)
+
+                stored = remote_size(ftp, remote)
+                self._release(host, access_code, ftp)
+                if stored == size:
+                    return UploadResult(remote, size, sent, resumed_from, time.perf_counter() - start, attempt)
+                error = f"remote size {stored} after upload, expected {size}"
+            except ftplib.error_perm as e:
+                if ftp is not None:
+                    ftp.close()
+                raise RuntimeError(f"Upload failed for {remote}: {e}") from e
+            except ftplib.all_errors as e:
+                if ftp is not None:
+                    ftp.close()  # state unknown after a broken transfer
+                error = str(e) or type(e).__name__
+        raise RuntimeError(f"Upload failed for {remote} after {self.retries + 1} attempts: {error}")
+
+
+_default_manager = None
+_default_lock = threading.Lock()
+
+
+def default_manager():
+    """Process-wide UploadManager, so repeated upload_file calls share connections"""
+    global _default_manager
+    with _default_lock:
+        if _default_manager is None:
+            _default_manager = UploadManager()
+            atexit.register(_default_manager.close)
+        return _default_manager
+
+
+def upload_file(gcode_file, printer_ip=PRINTER_IP, access_code=PRINTER_ACCESS_CODE, resume=False, manager=None):
+    """Upload one file to the printer's SD card root; returns its UploadResult
+
+    Raises RuntimeError if the printer isn't configured or the upload fails.
+    """
+    if not printer_ip or not access_code:
+        raise RuntimeError("Printer not configured (set PRINTER_IP and PRINTER_ACCESS_CODE)")
+    return (manager or default_manager()).upload(gcode_file, printer_ip, access_code, resume=resume)
+
+
+def format_result(result):
+    """One line: name, size, time, throughput and how much was resent"""
+    rate = result.sent / result.seconds / 1e6 if result.seconds > 0 else 0.0
+    line = f"{result.remote} ({result.size / 1e6:.1f} MB in {result.seconds:.1f}s, {rate:.2f} MB/s"
+    if result.resumed_from:
+        line += f", resumed at {result.resumed_from / 1e6:.1f} MB"
+    if result.attempts > 1:
+        line += f", {result.attempts} attempts, {result.sent / 1e6:.1f} MB sent"
+    return line + ")"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Upload G-code to a Bambu printer over FTPS")
+    parser.add_argument("inputs", nargs="+", metavar="file.gcode")
+    parser.add_argument("--printer-ip", default=PRINTER_IP, help="default: $PRINTER_IP")
+    parser.add_argument("--access-code", default=PRINTER_ACCESS_CODE, help="default: $PRINTER_ACCESS_CODE")
+    parser.add_argument("--port", type=int, default=FTPS_PORT, help=f"default: {FTPS_PORT}")
+    parser.add_argument("--retries", type=int, default=DEFAULT_RETRIES, metavar="N",
+                        help=f"reconnect and resume this many times (default: {DEFAULT_RETRIES})")
+    parser.add_argument("--resume", action="store_true",
+                        help="continue partial files already on the printer instead of starting over; "
+                             f"a partial is only continued if its last {RESUME_CHECK_BYTES // 1024} KiB "
+                             "match the local file")
+    args = parser.parse_args()
+
+    manager = UploadManager(port=args.port, retries=args.retries)
+    failed = 0
+    start = time.perf_counter()
+    total = 0
+    try:
+        for gcode_file in args.inputs:
+            try:
+                result = upload_file(gcode_file, args.printer_ip, args.access_code, args.resume, manager)
+                total += result.sent
+                print(f"✓ Uploaded successfully: {format_result(result)}")
+            except (RuntimeError, OSError) as e:
+                print(f"✗ {e}")
+                failed += 1
+    finally:
+        manager.close()
+
+    if len(args.inputs) > 1:
+        elapsed = time.perf_counter() - start
+        print(f"\n{len(args.inputs) - failed}/{len(args.inputs)} uploaded, {total / 1e6:.1f} MB in {elapsed:.1f}s "
+              f"({total / elapsed / 1e6:.2f} MB/s, {manager.connections} connection(s))")
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Region Rule Engine
+Declarative anatomical region rules compiled into vectorized NumPy masks
+"""
+
+import os
+import json
+import numpy as np
+
+RULES_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'region_rules.txt')
+
+AXES = {'x': 0, 'y': 1, 'z': 2}
+COMPARATORS = {
+    'gt': np.greater,
+    'ge': np.greater_equal,
+    'lt': np.less,
+    'le': np.less_equal,
+}
+
+
+# (path, mtime_ns) -> parsed rules file, so batch runs parse it once
+_rules_memo = {}
+
+
+def load_rule_sets(rules_path=None):
+    """Load all rule sets from the JSON rules file
+
+    The parsed file is reused until it changes on disk; treat the returned
+    dicts as read-only (copy.deepcopy them before editing).
+    """
+    rules_path = rules_path or RULES_FILE
+    memo_key = (os.path.abspath(rules_path), os.stat(rules_path).st_mtime_ns)
+    if memo_key not in _rules_memo:
+        with open(rules_path, 'r') as f:
+            _rules_memo[memo_key] = json.load(f)
+    return _rules_memo[memo_key]
+
+
+def load_rule_set(name, rules_path=None):
+    """Load a single named rule set"""
+    rule_sets = load_rule_sets(rules_path)
+    if name not in rule_sets:
+        raise KeyError(f"Unknown rule set '{name}' (available: {', '.join(rule_sets)})")
+    return rule_sets[name]
+
+
+def _compile_condition(cond):
+    """Turn one condition dict into a list of mask functions (AND-ed together)"""
+    tests = []
+
+    for key, value in cond.items():
+        if key in AXES:
+            axis = AXES[key]
+            for op, threshold in value.items():
+                if op not in COMPARATORS:
+                    raise ValueError(f"Unknown comparator '{op}' (use {', '.join(COMPARATORS)})")
+                tests.append(lambda cols, a=axis, f=COMPARATORS[op], t=float(threshold): f(cols[a], t))
+
+        elif key == 'any':
+            branches = [_compile_condition(c) for c in value]
+            tests.append(lambda cols, b=branches: np.logical_or.reduce([_evaluate(t, cols) for t in b]))
+
+        elif key == 'edge':
+            axes = [AXES[a] for a in value['axes']]
+            within = float(value['within'])
+
+            def edge_test(cols, axes=axes, within=within):
+                return np.logical_or.reduce([(cols[a] < within) | (cols[a] > 1 - within)
+                                             for a in axes])
+
+            tests.append(edge_test)
+
+        elif key not in ('region', 'use'):
+            raise ValueError(f"Unknown rule key '{key}'")
+
+    return tests
+
+
+def _evaluate(tests, cols):
+    """AND together compiled tests; an empty condition matches everything"""
+    mask = np.ones(cols.shape[1], dtype=bool)
+    for test in tests:
+        mask &= test(cols)
+    return mask
+
+
+def compile_rule_set(rule_set, regions):
+    """Compile a rule set against an ordered region list
+
+    Returns (default_label, [(label, tests), ...]) where labels are indices
+    into ``regions``. A region missing from ``regions`` takes the index the
+    rule set's optional ``fallback`` map gives it; without one it is a
+    ValueError.
+    """
+    regions = list(regions)
+    if len(regions) > 256:
+        raise ValueError("At most 256 regions fit in a uint8 label array")
+    fallback = rule_set.get('fallback', {})
+
+    def label_of(region):
+        if region in regions:
+            return regions.index(region)
+        if region not in fallback:
+            raise ValueError(f"Rule region '{region}' is not one of: {', '.join(regions)}")
+        if not 0 <= fallback[region] < len(regions):
+            raise ValueError(f"Fallback index {fallback[region]} for region '{region}' is outside "
+                             f"the {len(regions)} configured regions")
+        return fallback[region]
+
+    compiled = [(label_of(rule['region']), _compile_condition(rule))
+                for rule in rule_set['rules']]
+    return label_of(rule_set['default']), compiled
+
+
+def classify_normalized(pct, compiled):
+    """Label every row of a normalized (N, 3) array; first matching rule wins"""
+    default_label, rules = compiled
+    cols = np.ascontiguousarray(np.asarray(pct).T)  # one contiguous row per axis
+    labels = np.full(cols.shape[1], default_label, dtype=np.uint8)
+    unassigned = np.ones(cols.shape[1], dtype=bool)
+
+    for label, tests in rules:
+        if not unassigned.any():
+            break
+        hit = _evaluate(tests, cols) & unassigned
+        labels[hit] = label
+        unassigned &= ~hit
+
+    return labels
+
+
+def classify_centers(centers, bounds, rule_set, regions):
+    """Label triangle centers with a rule set (uint8 indices into ``regions``)
+
+    ``bounds`` is a mesh_bounds.Bounds used to normalize the centers.
+    """
+    compiled = compile_rule_set(rule_set, regions)
+    return classify_normalized(bounds.normalize(centers), compiled)
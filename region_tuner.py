@@ -0,0 +1,280 @@
+#!/usr/bin/env python3
+"""
+Region Threshold Tuner
+Interactive what-if tuning of region rule thresholds on a sorted centroid index
+"""
+
+import os
+import sys
+import cmd
+import copy
+import json
+import time
+import argparse
+from collections import namedtuple
+
+import numpy as np
+
+from region_rules import AXES, load_rule_set, compile_rule_set, classify_normalized
+from mesh_cache import load_mesh
+from mesh_bounds import compute_bounds
+
+# One tunable comparator in a rule set: ``holder[op]`` is its current value
+Threshold = namedtuple('Threshold', ['rule', 'where', 'axis', 'op', 'holder'])
+
+
+def rule_set_regions(rule_set):
+    """Regions named by a rule set (default first, then in rule order)"""
+    regions = [rule_set['default']]
+    for rule in rule_set['rules']:
+        if rule['region'] not in regions:
+            regions.append(rule['region'])
+    return regions
+
+
+def find_thresholds(rule_set):
+    """Every axis comparator in a rule set, including those inside "any" branches"""
+    found = []
+
+    def walk(cond, rule, where):
+        for key, value in cond.items():
+            if key in AXES:
+                for op in value:
+                    found.append(Threshold(rule, where, key, op, value))
+            elif key == 'any':
+                for i, branch in enumerate(value):
+                    walk(branch, rule, f"{where}any[{i}].")
+
+    for i, rule in enumerate(rule_set['rules']):
+        walk(rule, i, '')
+    return found
+
+
+class ThresholdIndex:
+    """Normalized centroids of one model, sorted per axis, with prefix area sums
+
+    A comparator on axis ``a`` moving from ``old`` to ``new`` can only change
+    the result for triangles whose centroid lies between the two values on
+    that axis, so what-if queries reclassify just that slab. Slab counts and
+    areas come straight from the sorted order and prefix sums.
+    """
+
+    def __init__(self, pct, areas, rule_set, regions):
+        self.pct = np.ascontiguousarray(pct, dtype=np.float64)
+        self.areas = np.asarray(areas, dtype=np.float64)
+        self.rule_set = copy.deepcopy(rule_set)
+        self.regions = list(regions)
+        self.thresholds = find_thresholds(self.rule_set)
+
+        self.order = []
+        self.sorted_values = []
+        self.area_prefix = []
+        for axis in range(3):
+            order = np.argsort(self.pct[:, axis], kind='stable')
+            prefix = np.zeros(len(order) + 1)
+            np.cumsum(self.areas[order], out=prefix[1:])
+            self.order.append(order)
+            self.sorted_values.append(self.pct[order, axis])
+            self.area_prefix.append(prefix)
+
+        self.labels = classify_normalized(self.pct, compile_rule_set(self.rule_set, self.regions))
+        self.counts = np.bincount(self.labels, minlength=len(self.regions))
+        self.region_areas = np.bincount(self.labels, weights=self.areas, minlength=len(self.regions))
+
+    @classmethod
+    def from_mesh(cls, mesh, rule_set, regions, trim_percent=None):
+        """Build from a mesh_core.Mesh"""
+        bounds = compute_bounds(mesh.vertices, trim_percent)
+        return cls(bounds.normalize(mesh.centroids), mesh.areas, rule_set, regions)
+
+    def _range(self, axis, lo, hi):
+        values = self.sorted_values[axis]
+        return (int(np.searchsorted(values, lo, side='left')),
+                int(np.searchsorted(values, hi, side='right')))
+
+    def slab(self, axis, lo, hi):
+        """(triangle count, surface area) with lo <= centroid[axis] <= hi"""
+        start, stop = self._range(AXES[axis], lo, hi)
+        prefix = self.area_prefix[AXES[axis]]
+        return stop - start, prefix[stop] - prefix[start]
+
+    def preview(self, threshold, value):
+        """Labels the affected slab would get if ``threshold`` were ``value``
+
+        Returns (face ids, new labels); nothing is changed.
+        """
+        old = threshold.holder[threshold.op]
+        axis = AXES[threshold.axis]
+        start, stop = self._range(axis, min(old, value), max(old, value))
+        ids = self.order[axis][start:stop]
+
+        threshold.holder[threshold.op] = value
+        try:
+            compiled = compile_rule_set(self.rule_set, self.regions)
+        finally:
+            threshold.holder[threshold.op] = old
+        return ids, classify_normalized(self.pct[ids], compiled)
+
+    def delta(self, ids, new_labels):
+        """Summary of a preview: moved count/area and per-region count/area changes"""
+        old_labels = self.labels[ids]
+        moved = old_labels != new_labels
+        areas = self.areas[ids][moved]
+        size = len(self.regions)
+        count_delta = (np.bincount(new_labels[moved], minlength=size)
+                       - np.bincount(old_labels[moved], minlength=size))
+        area_delta = (np.bincount(new_labels[moved], weights=areas, minlength=size)
+                      - np.bincount(old_labels[moved], weights=areas, minlength=size))
+        return {
+            'slab_triangles': len(ids),
+            'moved_triangles': int(moved.sum()),
+            'moved_area': float(areas.sum()),
+            'count_delta': count_delta,
+            'area_delta': area_delta,
+        }
+
+    def apply(self, threshold, value):
+        """Change a threshold and update labels, counts and areas in place"""
+        ids, new_labels = self.preview(threshold, value)
+        delta = self.delta(ids, new_labels)
+        threshold.holder[threshold.op] = value
+        self.labels[ids] = new_labels
+        self.counts += delta['count_delta']
+        self.region_areas += delta['area_delta']
+        return delta
+
+
+class TunerShell(cmd.Cmd):
+    """REPL over a ThresholdIndex"""
+
+    intro = "Type 'help' for commands, 'list' to see tunable thresholds."
+    prompt = "tune> "
+
+    def __init__(self, index):
+        super().__init__()
+        self.index = index
+
+    def _threshold(self, text):
+        try:
+            return self.index.thresholds[int(text)]
+        except (ValueError, IndexError):
+            print(f"❌ No threshold #{text} (see 'list')")
+            return None
+
+    def _print_delta(self, delta, elapsed):
+        print(f"  Slab: {delta['slab_triangles']:,} triangles checked, "
+              f"{delta['moved_triangles']:,} move ({delta['moved_area']:.1f} mm²)  [{elapsed * 1000:.1f} ms]")
+        for region, dc, da in zip(self.index.regions, delta['count_delta'], delta['area_delta']):
+            if dc:
+                print(f"    {region:15s}: {dc:+9,} triangles  {da:+12.1f} mm²")
+
+    def do_counts(self, arg):
+        """counts: triangles and surface area per region"""
+        total = len(self.index.labels)
+        for region, count, area in zip(self.index.regions, self.index.counts, self.index.region_areas):
+            print(f"  {region:15s}: {count:9,} triangles ({count / total * 100:5.1f}%)  {area:12.1f} mm²")
+
+    def do_list(self, arg):
+        """list: numbered thresholds of the rule set"""
+        rules = self.index.rule_set['rules']
+        for i, t in enumerate(self.index.thresholds):
+            rule = rules[t.rule]
+            print(f"  [{i:2d}] rule {t.rule:2d} {rule['region']:15s} {t.where}{t.axis} {t.op} "
+                  f"{t.holder[t.op]:<6g} ({rule.get('use', '')})")
+
+    def do_slab(self, arg):
+        """slab AXIS LO HI: triangles and area with LO <= centroid <= HI (normalized)"""
+        try:
+            axis, lo, hi = arg.split()
+            start = time.perf_counter()
+            count, area = self.index.slab(axis.lower(), float(lo), float(hi))
+        except (ValueError, KeyError):
+            print("Usage: slab x|y|z LO HI")
+            return
+        print(f"  {count:,} triangles, {area:.1f} mm²  [{(time.perf_counter() - start) * 1000:.2f} ms]")
+
+    def do_what(self, arg):
+        """what N VALUE: preview moving threshold N to VALUE"""
+        try:
+            number, value = arg.split()
+            value = float(value)
+        except ValueError:
+            print("Usage: what N VALUE")
+            return
+        threshold = self._threshold(number)
+        if threshold:
+            start = time.perf_counter()
+            delta = self.index.delta(*self.index.preview(threshold, value))
+            self._print_delta(delta, time.perf_counter() - start)
+
+    def do_set(self, arg):
+        """set N VALUE: move threshold N to VALUE and update the counts"""
+        try:
+            number, value = arg.split()
+            value = float(value)
+        except ValueError:
+            print("Usage: set N VALUE")
+            return
+        threshold = self._threshold(number)
+        if threshold:
+            start = time.perf_counter()
+            delta = self.index.apply(threshold, value)
+            self._print_delta(delta, time.perf_counter() - start)
+
+    def do_show(self, arg):
+        """show: current rules, one per line, ready to paste into region_rules.txt"""
+        for rule in self.index.rule_set['rules']:
+            print(f"      {json.dumps(rule)},")
+
+    def do_quit(self, arg):
+        """quit: leave the tuner"""
+        return True
+
+    do_EOF = do_quit
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Interactively tune region rule thresholds on a model")
+    parser.add_argument("input_file", metavar="input.stl")
+    parser.add_argument("--rule-set", default="advanced",
+                        help="rule set in region_rules.txt (default: advanced)")
+    parser.add_argument("--config", metavar="FILE",
+                        help="color config whose sections give the region order (default: from the rules)")
+    parser.add_argument("--trim-percent", type=float, metavar="PCT",
+                        help="ignore this percent of outlying vertices per axis end when computing bounds")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.input_file):
+        print(f"Error: File not found: {args.input_file}")
+        sys.exit(1)
+
+    try:
+        rule_set = load_rule_set(args.rule_set)
+        if args.config:
+            import configparser
+            config = configparser.ConfigParser()
+            config.read(args.config)
+            regions = config.sections()
+        else:
+            regions = rule_set_regions(rule_set)
+
+        print(f"Loading: {args.input_file}")
+        mesh = load_mesh(args.input_file)
+        start = time.perf_counter()
+        index = ThresholdIndex.from_mesh(mesh, rule_set, regions, args.trim_percent)
+        print(f"✅ Indexed {len(index.labels):,} triangles in {time.perf_counter() - start:.2f}s "
+              f"(rule set '{args.rule_set}', {len(index.thresholds)} thresholds)\n")
+
+        shell = TunerShell(index)
+        shell.do_counts('')
+        shell.cmdloop()
+    except KeyboardInterrupt:
+        print()
+    except Exception as e:
+        print(f"\n❌ Error: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,31 @@
+#!/usr/bin/env python3
+"""
+Slice Watchdog Flags
+Default limits and the shared --timeout/--max-rss/--retries/--backoff options, kept apart from
+slice_watchdog so a CLI can build its parser without importing subprocess
+"""
+
+DEFAULT_TIMEOUT = 1800
+DEFAULT_RETRIES = 2
+DEFAULT_BACKOFF = 5.0
+
+
+def add_watchdog_arguments(parser):
+    """Timeout, RSS and retry flags shared by slicer.py, slice_upload.py and ``pipeline.py slice``/``print``"""
+    parser.add_argument("--timeout", type=float, default=DEFAULT_TIMEOUT, metavar="SECONDS",
+                        help=f"kill a run after this long, 0 = never (default: {DEFAULT_TIMEOUT})")
+    parser.add_argument("--max-rss", metavar="SIZE", help="kill a run whose resident memory passes this, e.g. 6G")
+    parser.add_argument("--retries", type=int, default=DEFAULT_RETRIES, metavar="N",
+                        help=f"retries after a segfault or timeout (default: {DEFAULT_RETRIES})")
+    parser.add_argument("--backoff", type=float, default=DEFAULT_BACKOFF, metavar="SECONDS",
+                        help=f"wait before the first retry, doubling after (default: {DEFAULT_BACKOFF:g})")
+
+
+def watchdog_options(args):
+    """slice_many keyword arguments for the flags from add_watchdog_arguments"""
+    rss_limit = None
+    if args.max_rss:
+        from memory_size import parse_memory_size
+        rss_limit = parse_memory_size(args.max_rss)
+    return {'timeout': args.timeout or None, 'rss_limit': rss_limit,
+            'retries': args.retries, 'backoff': args.backoff}
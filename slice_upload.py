@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+Slice/Upload Pipeline
+Slices the next models while finished G-code uploads, so a batch takes about as long as its slower
+stage instead of the sum of both
+"""
+
+import os
+import sys
+import time
+import asyncio
+import argparse
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+import printer_upload
+import slicer
+
+# Sliced files allowed to wait for an upload slot before slicing pauses
+DEFAULT_QUEUE_SIZE = 2
+
+
+async def _slice_stage(jobs, pending, ready, pool, results):
+    """Slice models off ``pending`` and hand the G-code to the upload stage"""
+    loop = asyncio.get_running_loop()
+    for index, input_file in pending:
+        result = await loop.run_in_executor(pool, jobs.run, input_file)
+        slicer.print_result(result)
+        results[index].update(gcode=result.gcode, slice_seconds=result.seconds, error=result.error)
+        if result.ok:
+            await ready.put(index)  # waits here while uploads are behind
+
+
+async def _upload_stage(upload, ready, pool, results):
+    """Upload G-code as it is sliced until a None arrives"""
+    loop = asyncio.get_running_loop()
+    while (index := await ready.get()) is not None:
+        entry = results[index]
+        start = time.perf_counter()
+        try:
+            result = await loop.run_in_executor(pool, upload, entry['gcode'])
+            entry['uploaded'] = True
+            summary = printer_upload.format_result(result) if isinstance(result, printer_upload.UploadResult) \
+                else os.path.basename(entry['gcode'])
+            print(f"✓ Uploaded successfully: {summary}")
+        except Exception as e:
+            entry['error'] = str(e)
+            print(f"✗ {e}")
+        entry['upload_seconds'] = time.perf_counter() - start
+
+
+async def run_batch(inputs, jobs, upload, slice_workers=1, upload_workers=1, queue_size=DEFAULT_QUEUE_SIZE):
+    """Slice ``inputs`` with ``jobs`` (a slicer.SliceJobs) and ``upload`` each G-code, overlapped
+
+    ``slice_workers`` and ``upload_workers`` bound each stage separately;
+    at most ``queue_size`` sliced files wait for an upload before the
+    slice stage stops taking new models. ``upload(gcode_file)`` is called
+    on a worker thread and raises on failure. Returns one dict per input,
+    in order, with gcode, uploaded, slice_seconds, upload_seconds and error.
+    """
+    for name, value in (('slice_workers', slice_workers), ('upload_workers', upload_workers),
+                        ('queue_size', queue_size)):
+        if value < 1:
+            raise ValueError(f"{name} must be at least 1, got {value}")
+    results = [{'input_file': path, 'gcode': None, 'uploaded': False,
+                'slice_seconds': 0.0, 'upload_seconds': 0.0, 'error': None} for path in inputs]
+    pending = iter(enumerate(inputs))  # shared by the slice workers; the event loop serializes next()
+    ready = asyncio.Queue(maxsize=queue_size)
+
+    # Twice as many slice coroutines (and threads) as slicer slots: jobs.run
+    # gives its slot back while it sits out a retry backoff, and the spare
+    # coroutines keep that slot busy meanwhile. jobs itself never runs more
+    # than slice_workers slicers at once.
+    slicers = 2 * slice_workers
+    with ThreadPoolExecutor(max_workers=slicers + upload_workers) as pool:
+        uploaders = [asyncio.create_task(_upload_stage(upload, ready, pool, results))
+                     for _ in range(upload_workers)]
+        try:
+            await asyncio.gather(*[_slice_stage(jobs, pending, ready, pool, results)
+                                   for _ in range(slicers)])
+        finally:
+            for _ in uploaders:
+                await ready.put(None)
+            await asyncio.gather(*uploaders)
+    return results
+
+
+def slice_and_upload(inputs, output_dir=slicer.OUTPUT_DIR, slice_workers=1, upload_workers=1,
+                     queue_size=DEFAULT_QUEUE_SIZE, printer_ip=printer_upload.PRINTER_IP,
+                     access_code=printer_upload.PRINTER_ACCESS_CODE, upload=None, **slice_options):
+    """Slice and upload a batch; returns run_batch's results
+
+    ``slice_options`` go to slicer.SliceJobs (slicer, profiles_dir,
+    log_dir, timeout, ...). ``upload`` defaults to sending the file to
+    the configured printer.
+    """
+    slicer.check_names(inputs)
+    if upload is None:
+        if not printer_ip or not access_code:
+            raise RuntimeError("Printer not configured (set PRINTER_IP and PRINTER_ACCESS_CODE)")
+        upload = functools.partial(printer_upload.upload_file, printer_ip=printer_ip, access_code=access_code)
+    jobs = slicer.SliceJobs(output_dir, slice_workers, **slice_options)
+    return asyncio.run(run_batch(inputs, jobs, upload, slice_workers, upload_workers, queue_size))
+
+
+def print_summary(results, elapsed):
+    sliced = sum(r['gcode'] is not None for r in results)
+    uploaded = sum(r['uploaded'] for r in results)
+    slicing = sum(r['slice_seconds'] for r in results)
+    uploading = sum(r['upload_seconds'] for r in results)
+    print(f"\n{'='*60}")
+    print(f"{sliced}/{len(results)} sliced, {uploaded}/{len(results)} uploaded in {elapsed:.1f}s")
+    print(f"Slicing {slicing:.1f}s + uploading {uploading:.1f}s would be {slicing + uploading:.1f}s back to back")
+    print(f"{'='*60}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Slice STL files and upload the G-code, overlapped")
+    parser.add_argument("inputs", nargs="+", metavar="input.stl")
+    parser.add_argument("-o", "--output-dir", default=slicer.OUTPUT_DIR, help=f"default: {slicer.OUTPUT_DIR}")
+    parser.add_argument("-j", "--slice-workers", type=int, default=1, metavar="N",
+                        help="slicer processes at once (0 = one per core, default: 1)")
+    parser.add_argument("--upload-workers", type=int, default=1, metavar="N",
+                        help="uploads at once (default: 1)")
+    parser.add_argument("--queue-size", type=int, default=DEFAULT_QUEUE_SIZE, metavar="N",
+                        help=f"sliced files waiting to upload before slicing pauses (default: {DEFAULT_QUEUE_SIZE})")
+    parser.add_argument("--printer-ip", default=printer_upload.PRINTER_IP, help="default: $PRINTER_IP")
+    parser.add_argument("--access-code", default=printer_upload.PRINTER_ACCESS_CODE,
+                        help="default: $PRINTER_ACCESS_CODE")
+    parser.add_argument("--log-dir", default=slicer.LOG_DIR, help=f"per-job logs (default: {slicer.LOG_DIR})")
+    parser.add_argument("--slicer", default=slicer.SLICER_BIN, help="slicer binary (default: $SLICER_BIN)")
+    parser.add_argument("--profiles", default=slicer.PROFILES_DIR,
+                        help="profile directory (default: $SLICER_PROFILES)")
+    slicer.add_watchdog_arguments(parser)
+    args = parser.parse_args()
+
+    try:
+        start = time.perf_counter()
+        slice_workers = args.slice_workers if args.slice_workers != 0 else (os.cpu_count() or 1)
+        results = slice_and_upload(args.inputs, args.output_dir, slice_workers, args.upload_workers,
+                                   args.queue_size, args.printer_ip, args.access_code, slicer=args.slicer,
+                                   profiles_dir=args.profiles, log_dir=args.log_dir,
+                                   **slicer.watchdog_options(args))
+    except Exception as e:
+        print(f"❌ Error: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
+
+    print_summary(results, time.perf_counter() - start)
+    sys.exit(0 if all(r['uploaded'] for r in results) else 1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+Slicer Watchdog
+Runs a slicer subprocess under wall-clock and memory limits, kills its whole process group when it
+overruns, and classifies what went wrong so only transient failures get retried
+"""
+
+import os
+import re
+import time
+import signal
+import subprocess
+
+from slice_flags import DEFAULT_BACKOFF, DEFAULT_RETRIES, DEFAULT_TIMEOUT
+
+# Failure classes
+SEGFAULT = 'segfault'
+OOM = 'oom'
+TIMEOUT = 'timeout'
+CPU_LIMIT = 'cpu-limit'
+VALIDATION = 'validation'
+ERROR = 'error'
+
+# Crashes and hangs during headless init are usually one-offs; a model that
+# doesn't validate or runs out of its budget will fail the same way again
+RETRYABLE = {SEGFAULT, TIMEOUT}
+
+POLL_INTERVAL = 0.5
+KILL_GRACE = 2.0
+LOG_TAIL_BYTES = 65536
+
+PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+OOM_PATTERN = re.compile(r"bad_alloc|out of memory|cannot allocate memory|memory exhausted", re.I)
+# Phrases the slicer CLI uses when it refuses a model or its settings; kept
+# specific so ordinary log chatter doesn't turn a crash into "validation"
+VALIDATION_PATTERN = re.compile(
+    r"nothing to be sliced|"
+    r"(outside|not fully inside|partly inside) (of )?the print volume|"
+    r"empty layers? between|"
+    r"(failed|unable) to (load|read|open) (the )?(input|model|file|3mf|stl)|"
+    r"invalid (params|parameters|config|configuration)|"
+    r"validat(e|ion) (failed|error)", re.I)
+
+
+class SliceFailure(RuntimeError):
+    """A failed slicer run and its failure class"""
+
+    def __init__(self, message, kind=ERROR, returncode=None):
+        super().__init__(message)
+        self.kind = kind
+        self.returncode = returncode
+
+    @property
+    def retryable(self):
+        return self.kind in RETRYABLE
+
+
+def group_rss(pgid):
+    """Resident bytes of every process in process group ``pgid`` (None without /proc)"""
+    try:
+        pids = [pid for pid in os.listdir('/proc') if pid.isdigit()]
+    except OSError:
+        return None
+    total = 0
+    for pid in pids:
+        try:
+            with open(f'/proc/{pid}/stat', 'rb') as f:
+                fields = f.read().rsplit(b')', 1)[1].split()
+        except (OSError, IndexError):
+            continue  # exited meanwhile
+        if int(fields[2]) == pgid:
+            total += int(fields[21]) * PAGE_SIZE
+    return total
+
+
+def kill_group(process, grace=KILL_GRACE):
+    """SIGTERM the process group, SIGKILL whatever is left after ``grace`` seconds, reap the leader"""
+    try:
+        os.killpg(process.pid, signal.SIGTERM)
+        process.wait(timeout=grace)
+    except (ProcessLookupError, subprocess.TimeoutExpired):
+        pass
+    try:
+        os.killpg(process.pid, signal.SIGKILL)  # also sweeps up helpers the slicer left behind
+    except ProcessLookupError:
+        pass
+    process.wait()
+
+
+def supervise(command, log=None, timeout=DEFAULT_TIMEOUT, rss_limit=None, on_start=None,
+              poll_interval=POLL_INTERVAL):
+    """Run ``command`` in a process group of its own; returns (returncode, killed_for)
+
+    The group is killed once ``timeout`` seconds have passed or, when
+    ``rss_limit`` is set, once its combined resident memory goes over
+    that many bytes; killed_for is then TIMEOUT or OOM, otherwise None.
+    ``log`` is an open file that gets stdout and stderr; ``on_start(pid)``
+    is called once the process is running. Anything still
+    running in the group when this returns is killed, so a worker slot
+    is free again as soon as it does.
+    """
+    output = {} if log is None else {'stdout': log, 'stderr': subprocess.STDOUT}
+    process = subprocess.Popen(command, start_new_session=True, **output)
+    deadline = time.monotonic() + timeout if timeout else None
+    killed_for = None
+    try:
+        if on_start:
+            on_start(process.pid)
+        while True:
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                killed_for = TIMEOUT
+                break
+            wait = min(poll_interval, remaining or poll_interval) if rss_limit else remaining
+            try:
+                process.wait(timeout=wait)
+                break
+            except subprocess.TimeoutExpired:
+                pass
+            if rss_limit and (group_rss(process.pid) or 0) > rss_limit:
+                killed_for = OOM
+                break
+    finally:
+        kill_group(process)
+    return process.returncode, killed_for
+
+
+def read_log_tail(log_file, size=LOG_TAIL_BYTES):
+    """Last ``size`` bytes of a log as text ('' if there is none)"""
+    try:
+        with open(log_file, 'rb') as f:
+            f.seek(max(0, os.path.getsize(log_file) - size))
+            return f.read().decode('utf-8', 'replace')
+    except (OSError, TypeError):
+        return ''
+
+
+def _signalled(returncode, *signals):
+    """True if the process died of one of ``signals`` (directly or as a shell's 128 + n)"""
+    return any(returncode in (-sig, 128 + sig) for sig in signals)
+
+
+def classify(returncode, killed_for=None, log_text=''):
+    """Failure class of a finished run, or None if it succeeded"""
+    if killed_for:
+        return killed_for
+    if returncode == 0:
+        return None
+    if _signalled(returncode, signal.SIGSEGV, signal.SIGBUS):
+        return SEGFAULT
+    if _signalled(returncode, signal.SIGXCPU):  # RLIMIT_CPU
+        return CPU_LIMIT
+    if _signalled(returncode, signal.SIGKILL) or OOM_PATTERN.search(log_text):  # OOM killer, RLIMIT_AS
+        return OOM
+    if VALIDATION_PATTERN.search(log_text):
+        return VALIDATION
+    return ERROR
+
+
+def backoff_delay(attempt, backoff=DEFAULT_BACKOFF):
+    """Seconds to wait before retry number ``attempt`` (1, 2, ...)"""
+    return backoff * 2 ** (attempt - 1)
@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+"""
+Slicer Runner
+Slices STL files with the OrcaSlicer / Bambu Studio CLI (same flags as slice_pipeline.sh),
+several at once if asked, each with its own output directory, log and CPU/memory budget, under a
+watchdog that kills hung or runaway runs and retries the ones that crashed
+"""
+
+import os
+import sys
+import time
+import queue
+import shutil
+import argparse
+import tempfile
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import resource
+except ImportError:  # not on Windows; budgets are then not enforced
+    resource = None
+
+from slice_flags import add_watchdog_arguments, watchdog_options
+from slice_watchdog import (DEFAULT_BACKOFF, DEFAULT_RETRIES, DEFAULT_TIMEOUT, ERROR, VALIDATION,
+                            SliceFailure, backoff_delay, classify, read_log_tail, supervise)
+
+SLICER_BIN = os.environ.get('SLICER_BIN') or os.path.expanduser(
+    '~/Documents/OrcaSlicer/build/arm64/src/OrcaSlicer.app/Contents/MacOS/OrcaSlicer')
+PROFILES_DIR = os.environ.get('SLICER_PROFILES') or os.path.expanduser(
+    '~/Documents/OrcaSlicer/resources/profiles/BBL')
+OUTPUT_DIR = os.path.expanduser('~/AI_PIPELINE/SLICED_OUTPUT')
+LOG_DIR = os.path.expanduser('~/AI_PIPELINE/logs')
+
+MACHINE_PROFILE = 'machine/Bambu Lab P1P 0.4 nozzle.json'
+PROCESS_PROFILE = 'process/0.20mm Standard @BBL P1P.json'
+FILAMENT_PROFILE = 'filament/Bambu PLA Dynamic @BBL P1P.json'
+
+# The slicer always names its output after the plate
+PLATE_GCODE = 'plate_1.gcode'
+
+SliceResult = namedtuple('SliceResult', ['input_file', 'ok', 'gcode', 'seconds', 'error', 'log_file',
+                                         'failure', 'attempts'])
+
+
+def slicer_command(input_file, output_dir, slicer=SLICER_BIN, profiles_dir=PROFILES_DIR):
+    """Argument list for one slicer run"""
+    settings = ";".join(os.path.join(profiles_dir, p) for p in (MACHINE_PROFILE, PROCESS_PROFILE))
+    return [
+        slicer,
+        '--load-settings', settings,
+        '--load-filaments', os.path.join(profiles_dir, FILAMENT_PROFILE),
+        '--slice', '0',
+        '--outputdir', output_dir,
+        input_file,
+    ]
+
+
+def job_limits(memory_limit=None, cpu_time=None, cpus=None):
+    """Function that puts a budget on a started slicer process, given its pid; None for no budget
+
+    memory_limit: address space in bytes (RLIMIT_AS)
+    cpu_time:     CPU seconds before the kernel kills the job (RLIMIT_CPU)
+    cpus:         set of core ids the job may run on
+
+    The parent applies it right after the process starts rather than in a
+    preexec_fn, which can deadlock the child while the scheduler's worker
+    threads are running. Needs Linux (prlimit, sched_setaffinity);
+    elsewhere the budget isn't enforced.
+    """
+    if not (memory_limit or cpu_time or cpus):
+        return None
+
+    def apply(pid):
+        try:
+            if memory_limit and hasattr(resource, 'prlimit'):
+                resource.prlimit(pid, resource.RLIMIT_AS, (memory_limit, memory_limit))
+            if cpu_time and hasattr(resource, 'prlimit'):
+                resource.prlimit(pid, resource.RLIMIT_CPU, (cpu_time, cpu_time))
+            if cpus and hasattr(os, 'sched_setaffinity'):
+                os.sched_setaffinity(pid, cpus)
+        except ProcessLookupError:
+            pass  # already finished
+    return apply
+
+
+def slice_file(input_file, output_dir=OUTPUT_DIR, slicer=SLICER_BIN, profiles_dir=PROFILES_DIR,
+               log_file=None, memory_limit=None, cpu_time=None, cpus=None, timeout=DEFAULT_TIMEOUT,
+               rss_limit=None, append_log=False):
+    """Slice one model; returns the path of <model>.gcode in output_dir
+
+    The slicer writes into a private directory inside output_dir, so
+    several models can be sliced into the same output_dir at once without
+    fighting over plate_1.gcode; the finished G-code is moved into place
+    atomically. See job_limits for the budget arguments; the run is
+    killed after ``timeout`` seconds or past ``rss_limit`` resident bytes.
+    Raises SliceFailure (a RuntimeError) saying what kind of failure it
+    was if the slicer fails or leaves no G-code behind.
+    """
+    if not os.path.exists(slicer):
+        raise RuntimeError(f"Slicer not found: {slicer} (set SLICER_BIN)")
+    os.makedirs(output_dir, exist_ok=True)
+
+    name = os.path.splitext(os.path.basename(input_file))[0]
+    output_gcode = os.path.join(output_dir, f"{name}.gcode")
+    work_dir = tempfile.mkdtemp(prefix=f".slice-{name}-", dir=output_dir)
+    command = slicer_command(input_file, work_dir, slicer, profiles_dir)
+
+    limits = job_limits(memory_limit, cpu_time, cpus)
+
+    try:
+        if log_file:
+            with open(log_file, 'a' if append_log else 'w') as log:
+                returncode, killed_for = supervise(command, log, timeout, rss_limit, limits)
+        else:
+            returncode, killed_for = supervise(command, None, timeout, rss_limit, limits)
+        kind = classify(returncode, killed_for, read_log_tail(log_file))
+        if kind:
+            raise SliceFailure(f"Slicing command failed for {name}: {kind} (exit code {returncode})",
+                               kind, returncode)
+
+        plate = os.path.join(work_dir, PLATE_GCODE)
+        if not os.path.exists(plate):
+            raise SliceFailure(f"G-code file not found after slicing: {PLATE_GCODE}", VALIDATION, returncode)
+        os.replace(plate, output_gcode)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return output_gcode
+
+
+def _core_sets(workers, cpus_per_job):
+    """Disjoint (where possible) core sets, one per worker slot"""
+    if not cpus_per_job:
+        return [None] * workers
+    cores = sorted(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') \
+        else list(range(os.cpu_count() or 1))
+    return [{cores[(slot * cpus_per_job + k) % len(cores)] for k in range(cpus_per_job)}
+            for slot in range(workers)]
+
+
+def check_names(inputs):
+    """Raise ValueError if two inputs would write the same <name>.gcode"""
+    names = [os.path.splitext(os.path.basename(path))[0] for path in inputs]
+    clashes = sorted({name for name in names if names.count(name) > 1})
+    if clashes:
+        raise ValueError(f"Several inputs would write the same G-code: {', '.join(clashes)}")
+
+
+class SliceJobs:
+    """Slices models one call at a time, at most ``workers`` slicer processes at once
+
+    ``run`` is thread-safe and blocks until its model is done, so any
+    number of threads can feed it. Every job gets its own temp output
+    directory, its own log (<log_dir>/<model>_slice.log) and the same
+    budget; with ``cpus_per_job`` each worker slot is pinned to its own
+    cores so jobs don't compete for them. Segfaults and timeouts are
+    retried up to ``retries`` times with exponential ``backoff``; a job
+    gives its slot back while it waits.
+    """
+
+    def __init__(self, output_dir=OUTPUT_DIR, workers=1, slicer=SLICER_BIN, profiles_dir=PROFILES_DIR,
+                 log_dir=LOG_DIR, memory_limit=None, cpu_time=None, cpus_per_job=None,
+                 timeout=DEFAULT_TIMEOUT, rss_limit=None, retries=DEFAULT_RETRIES, backoff=DEFAULT_BACKOFF):
+        self.output_dir = output_dir
+        self.workers = workers
+        self.slicer = slicer
+        self.profiles_dir = profiles_dir
+        self.log_dir = log_dir
+        self.memory_limit = memory_limit
+        self.cpu_time = cpu_time
+        self.timeout = timeout
+        self.rss_limit = rss_limit
+        self.retries = retries
+        self.backoff = backoff
+        self.core_sets = _core_sets(workers, cpus_per_job)
+        self.slots = queue.Queue()
+        for slot in range(workers):
+            self.slots.put(slot)
+        if log_dir:
+            os.makedirs(log_dir, exist_ok=True)
+
+    def run(self, input_file):
+        """Slice one model; returns its SliceResult (never raises for a failed slice)"""
+        name = os.path.splitext(os.path.basename(input_file))[0]
+        log_file = os.path.join(self.log_dir, f"{name}_slice.log") if self.log_dir else None
+        start = None
+        for attempt in range(1, self.retries + 2):
+            slot = self.slots.get()
+            start = start or time.perf_counter()
+            retryable = False
+            try:
+                gcode = slice_file(input_file, self.output_dir, self.slicer, self.profiles_dir, log_file,
+                                   self.memory_limit, self.cpu_time, self.core_sets[slot], self.timeout,
+                                   self.rss_limit, append_log=attempt > 1)
+                result = SliceResult(input_file, True, gcode, time.perf_counter() - start, None, log_file,
+                                     None, attempt)
+            except (RuntimeError, OSError) as e:
+                kind = e.kind if isinstance(e, SliceFailure) else ERROR
+                retryable = isinstance(e, SliceFailure) and e.retryable
+                result = SliceResult(input_file, False, None, time.perf_counter() - start, str(e), log_file,
+                                     kind, attempt)
+            finally:
+                self.slots.put(slot)
+            if not retryable or attempt > self.retries:
+                return result
+            delay = backoff_delay(attempt, self.backoff)
+            print(f"↻ {name}: {result.failure}, retrying in {delay:g}s "
+                  f"(attempt {attempt + 1}/{self.retries + 1})")
+            time.sleep(delay)
+
+
+def slice_many(inputs, output_dir=OUTPUT_DIR, workers=1, slicer=SLICER_BIN, profiles_dir=PROFILES_DIR,
+               log_dir=LOG_DIR, memory_limit=None, cpu_time=None, cpus_per_job=None, on_result=None,
+               timeout=DEFAULT_TIMEOUT, rss_limit=None, retries=DEFAULT_RETRIES, backoff=DEFAULT_BACKOFF):
+    """Slice several models, ``workers`` slicer processes at a time (see SliceJobs)
+
+    Returns a SliceResult per input, in order; ``on_result`` is called
+    with each as it finishes.
+    """
+    check_names(inputs)
+    jobs = SliceJobs(output_dir, workers, slicer, profiles_dir, log_dir, memory_limit, cpu_time,
+                     cpus_per_job, timeout, rss_limit, retries, backoff)
+    on_result = on_result or (lambda result: None)
+
+    def run(input_file):
+        result = jobs.run(input_file)
+        on_result(result)
+        return result
+
+    # More threads than slots, so jobs waiting out a backoff don't hold up the queue
+    with ThreadPoolExecutor(max_workers=max(1, min(len(inputs), 2 * workers))) as pool:
+        return list(pool.map(run, inputs))
+
+
+def print_result(result):
+    tries = f", {result.attempts} attempts" if result.attempts > 1 else ""
+    if result.ok:
+        print(f"✓ Sliced successfully: {result.gcode} ({result.seconds:.1f}s{tries})")
+    else:
+        print(f"✗ {result.error}" + (f" (log: {result.log_file}{tries})" if result.log_file else ""))
+
+
+def print_failures(results):
+    """One line counting failures by class"""
+    kinds = [r.failure for r in results if not r.ok]
+    if kinds:
+        print("Failures: " + ", ".join(f"{kind} {kinds.count(kind)}" for kind in sorted(set(kinds))))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Slice STL files with the slicer CLI")
+    parser.add_argument("inputs", nargs="+", metavar="input.stl")
+    parser.add_argument("-o", "--output-dir", default=OUTPUT_DIR, help=f"default: {OUTPUT_DIR}")
+    parser.add_argument("-j", "--workers", type=int, default=1, metavar="N",
+                        help="slicer processes at once (0 = one per core)")
+    parser.add_argument("--memory", metavar="SIZE", help="address-space limit per job, e.g. 4G")
+    parser.add_argument("--cpu-time", type=int, metavar="SECONDS", help="CPU-time limit per job")
+    parser.add_argument("--cpus-per-job", type=int, metavar="N", help="pin each job to N cores of its own")
+    parser.add_argument("--log-dir", default=LOG_DIR, help=f"per-job logs (default: {LOG_DIR})")
+    parser.add_argument("--slicer", default=SLICER_BIN, help="slicer binary (default: $SLICER_BIN)")
+    parser.add_argument("--profiles", default=PROFILES_DIR, help="profile directory (default: $SLICER_PROFILES)")
+    add_watchdog_arguments(parser)
+    args = parser.parse_args()
+
+    workers = args.workers if args.workers > 0 else (os.cpu_count() or 1)
+    memory_limit = None
+    if args.memory:
+        from memory_size import parse_memory_size
+        memory_limit = parse_memory_size(args.memory)
+
+    try:
+        start = time.perf_counter()
+        results = slice_many(args.inputs, args.output_dir, workers, args.slicer, args.profiles, args.log_dir,
+                             memory_limit, args.cpu_time, args.cpus_per_job, print_result,
+                             **watchdog_options(args))
+    except Exception as e:
+        print(f"✗ {e}")
+        sys.exit(1)
+
+    failed = sum(not r.ok for r in results)
+    if len(results) > 1:
+        elapsed = time.perf_counter() - start
+        print(f"\n{len(results) - failed}/{len(results)} sliced in {elapsed:.1f}s "
+              f"({len(results) / elapsed * 60:.1f} models/min, {workers} worker{'s' if workers != 1 else ''})")
+    print_failures(results)
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
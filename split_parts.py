@@ -1,33 +1,54 @@
-import trimesh, os, itertools, configparser
+import os, itertools, configparser
+from mesh_weld import to_trimesh
+from mesh_cache import load_mesh
+from stl_io import write_stl
+from mesh_partition import extract_submesh
+from mesh_components import label_components, component_faces
 
 INPUT  = os.path.expanduser('~/AI_PIPELINE/LOCKED_REPAIR_STAGE/lets try this!_repaired_preserve.stl')
 CFG    = os.path.expanduser('~/AI_PIPELINE/CONFIG/color_map.cfg')
 OUTPUT = os.path.expanduser('~/AI_PIPELINE/SPLIT_PARTS')
-os.makedirs(OUTPUT, exist_ok=True)
-
-# ---- Load color map ----
-cfg = configparser.ConfigParser()
-cfg.read(CFG)
-palette = [s for s in cfg.sections()] or ["part"]
-
-print(f"Loaded {len(palette)} color labels from config.")
-
-# ---- Load the repaired STL ----
-mesh = trimesh.load_mesh(INPUT)
-print("Loaded mesh:", INPUT)
-print("Watertight:", mesh.is_watertight)
-
-# ---- Split by connected components ----
-print("Splitting mesh into connected parts...")
-parts = mesh.split(only_watertight=False)
-print(f"Found {len(parts)} separate parts.")
-
-# ---- Export each part with color-map name ----
-for idx, part in enumerate(parts):
-    label = palette[idx % len(palette)]
-    out_name = f"{os.path.splitext(os.path.basename(INPUT))[0]}_{idx+1:02d}_{label}.stl"
-    out_path = os.path.join(OUTPUT, out_name)
-    part.export(out_path)
-    print("  Saved:", out_name)
-
-print("\nAll parts exported to:", OUTPUT)
+
+def load_palette(cfg_path):
+    """Color label names from the color map config (["part"] if empty)"""
+    cfg = configparser.ConfigParser()
+    cfg.read(cfg_path)
+    return [s for s in cfg.sections()] or ["part"]
+
+def part_names(stem, count, palette):
+    """Output names for ``count`` parts, cycling through the palette"""
+    return [f"{stem}_{idx+1:02d}_{palette[idx % len(palette)]}" for idx in range(count)]
+
+def save_parts(mesh, parts, names, output_dir):
+    """Write each face index array in ``parts`` as <name>.stl"""
+    os.makedirs(output_dir, exist_ok=True)
+    for part, name in zip(parts, names):
+        out_name = f"{name}.stl"
+        write_stl(os.path.join(output_dir, out_name), extract_submesh(mesh.vertices, mesh.faces, part))
+        print("  Saved:", out_name)
+
+if __name__ == "__main__":
+    os.makedirs(OUTPUT, exist_ok=True)
+
+    # ---- Load color map ----
+    palette = load_palette(CFG)
+
+    print(f"Loaded {len(palette)} color labels from config.")
+
+    # ---- Load the repaired STL ----
+    mesh = to_trimesh(load_mesh(INPUT))
+    print("Loaded mesh:", INPUT)
+    print("Watertight:", mesh.is_watertight)
+
+    # ---- Split by connected components ----
+    # Edge adjacency, as trimesh's split: parts touching at a single vertex stay separate
+    print("Splitting mesh into connected parts...")
+    count, labels = label_components(mesh.faces, adjacency='edge')
+    parts = component_faces(labels, count)
+    print(f"Found {len(parts)} separate parts.")
+
+    # ---- Export each part with color-map name ----
+    stem = os.path.splitext(os.path.basename(INPUT))[0]
+    save_parts(mesh, parts, part_names(stem, len(parts), palette), OUTPUT)
+
+    print("\nAll parts exported to:", OUTPUT)
@@ -3,43 +3,60 @@
 Direct STL Splitter - Copy triangle bytes directly
 """
 
+import os
 import sys
 import struct
+import numpy as np
+
+from stl_io import read_stl, write_stl
+from mesh_partition import partition_labels, label_faces
 
 def split_stl_by_indices(input_file, output_file, triangle_indices):
     """Copy specific triangles by index from input to output"""
     
-    # Sort indices for efficient reading
-    sorted_indices = sorted(triangle_indices)
+    # Sort indices so records keep their original order
+    sorted_indices = np.unique(np.fromiter(triangle_indices, dtype=np.int64))
     
-    with open(input_file, 'rb') as inf, open(output_file, 'wb') as outf:
-        # Read and skip input header
-        inf.read(80)
-        total_triangles = struct.unpack('<I', inf.read(4))[0]
-        
-        # Write output header
-        header = b'STL Direct Copy - Anatomical Split' + b' ' * 46
-        outf.write(header[:80])
-        outf.write(struct.pack('<I', len(sorted_indices)))
-        
-        # Read and copy selected triangles
-        current_idx = 0
-        next_target = 0
-        
-        for idx in range(total_triangles):
-            # Each triangle is 50 bytes (12+12+12+12+2)
-            triangle_data = inf.read(50)
-            
-            if next_target < len(sorted_indices) and idx == sorted_indices[next_target]:
-                # This triangle should be included
-                outf.write(triangle_data)
-                next_target += 1
-            
-            # Progress
-            if idx % 100000 == 0:
-                print(f"  Progress: {idx:,}/{total_triangles:,}")
-        
-        print(f"✅ Copied {len(sorted_indices):,} triangles")
+    # Memory-map the input; the header count is validated against the file size
+    tris = read_stl(input_file)
+    total_triangles = len(tris)
+    
+    if len(sorted_indices) and (sorted_indices[0] < 0 or sorted_indices[-1] >= total_triangles):
+        raise IndexError(f"Triangle index out of range for {total_triangles:,} triangles")
+    
+    # Gather the selected 50-byte records in one fancy-indexing pass, bytes untouched
+    write_stl(output_file, tris[sorted_indices],
+              header=b'STL Direct Copy - Anatomical Split', fix_normals=False)
+    
+    print(f"✅ Copied {len(sorted_indices):,} triangles")
+
+def split_stl_by_labels(input_file, labels, output_files, headers=None):
+    """Copy every triangle into the output file for its label, in one pass
+    
+    ``labels`` holds one integer label per input triangle and ``output_files``
+    maps label -> output path; labels without a path are dropped. ``headers``
+    optionally maps label -> 80-byte header text. The input
+    is memory-mapped once and each 50-byte record is gathered exactly once,
+    so the cost does not grow with the number of outputs. Record bytes are
+    copied unchanged. Returns {label: triangle_count}.
+    """
+    tris = read_stl(input_file)
+    labels = np.asarray(labels)
+    if len(labels) != len(tris):
+        raise ValueError(f"Got {len(labels):,} labels for {len(tris):,} triangles")
+    
+    label_count = max(output_files, default=-1) + 1
+    if len(labels):
+        label_count = max(label_count, int(labels.max()) + 1)
+    order, offsets = partition_labels(labels, label_count)
+    
+    headers = headers or {}
+    counts = {}
+    for label, output_file in output_files.items():
+        indices = label_faces(order, offsets, label)
+        header = headers.get(label, f'STL Direct Copy: {os.path.basename(output_file)}')
+        counts[label] = write_stl(output_file, tris[indices], header=header, fix_normals=False)
+    return counts
 
 # Quick test
 if __name__ == "__main__":
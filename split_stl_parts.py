@@ -7,121 +7,77 @@ Splits a single STL file into separate parts based on disconnected components
 import sys
 import os
 import json
+import argparse
 import numpy as np
-from collections import defaultdict
 from pathlib import Path
 
-def load_stl_binary(filepath):
-    """Load binary STL file"""
-    with open(filepath, 'rb') as f:
-        # Skip header (80 bytes)
-        f.read(80)
-        
-        # Read number of triangles
-        num_triangles = np.frombuffer(f.read(4), dtype=np.uint32)[0]
-        
-        # Read triangles
-        triangles = []
-        for _ in range(num_triangles):
-            # Normal (3 floats)
-            normal = np.frombuffer(f.read(12), dtype=np.float32)
-            
-            # 3 vertices (9 floats)
-            v1 = np.frombuffer(f.read(12), dtype=np.float32)
-            v2 = np.frombuffer(f.read(12), dtype=np.float32)
-            v3 = np.frombuffer(f.read(12), dtype=np.float32)
-            
-            # Attribute byte count (2 bytes, ignored)
-            f.read(2)
-            
-            triangles.append({
-                'normal': normal,
-                'vertices': [v1, v2, v3]
-            })
-    
-    return triangles
+from stl_io import read_stl, write_stl, triangle_vertices
+from mesh_weld import weld_triangles
+from mesh_cache import load_mesh
+from mesh_components import label_components, component_faces
+from mesh_instances import find_instances
 
-def vertex_to_key(vertex, precision=4):
-    """Convert vertex to hashable key with rounding"""
-    return tuple(np.round(vertex, precision))
+def load_stl_binary(filepath):
+    """Load binary STL file (memory-mapped structured array)"""
+    return read_stl(filepath)
 
-def find_connected_components(triangles):
-    """Find connected components using vertex connectivity (iterative)"""
+def find_connected_components(triangles, welded=None):
+    """Find connected components using vertex connectivity (vectorized)"""
     print(f"Analyzing {len(triangles)} triangles...")
     
-    # Build vertex adjacency
-    vertex_triangles = defaultdict(set)
-    
-    for tri_idx, tri in enumerate(triangles):
-        for vertex in tri['vertices']:
-            key = vertex_to_key(vertex)
-            vertex_triangles[key].add(tri_idx)
-    
-    print(f"Found {len(vertex_triangles)} unique vertices")
+    # Weld vertices into integer ids once (or reuse a cached weld)
+    if welded is None:
+        welded = weld_triangles(triangle_vertices(triangles))
+    vertex_count = len(welded.vertices)
     
-    # Find connected components using iterative BFS
-    visited = set()
-    components = []
+    print(f"Found {vertex_count} unique vertices")
     
+    # Label every face with its component
     print("Finding connected components...")
-    for start_idx in range(len(triangles)):
-        if start_idx in visited:
-            continue
-        
-        # BFS from this triangle
-        component = set()
-        queue = [start_idx]
-        visited.add(start_idx)
-        component.add(start_idx)
-        
-        while queue:
-            tri_idx = queue.pop(0)
-            tri = triangles[tri_idx]
-            
-            # Find all triangles sharing vertices
-            for vertex in tri['vertices']:
-                key = vertex_to_key(vertex)
-                for neighbor_idx in vertex_triangles[key]:
-                    if neighbor_idx not in visited:
-                        visited.add(neighbor_idx)
-                        component.add(neighbor_idx)
-                        queue.append(neighbor_idx)
-        
-        components.append(component)
-        print(f"  Component {len(components)}: {len(component)} triangles")
-        
-        # Progress update for large models
-        if len(visited) % 100000 == 0:
-            print(f"    Progress: {len(visited):,}/{len(triangles):,} triangles processed")
+    component_count, labels = label_components(welded.faces, vertex_count)
+    components = component_faces(labels, component_count)
+    
+    for idx, component in enumerate(components, 1):
+        print(f"  Component {idx}: {len(component)} triangles")
     
     return components
 
 def save_stl_binary(filepath, triangles, tri_indices):
     """Save triangles to binary STL file"""
-    with open(filepath, 'wb') as f:
-        # Write header (80 bytes)
-        header = b'STL Part - Generated by split_stl_parts.py' + b' ' * 38
-        f.write(header)
-        
-        # Write number of triangles
-        f.write(np.uint32(len(tri_indices)).tobytes())
-        
-        # Write triangles
-        for tri_idx in sorted(tri_indices):
-            tri = triangles[tri_idx]
-            
-            # Write normal
-            f.write(tri['normal'].tobytes())
-            
-            # Write vertices
-            for vertex in tri['vertices']:
-                f.write(vertex.tobytes())
-            
-            # Write attribute byte count (0)
-            f.write(np.uint16(0).tobytes())
+    indices = np.sort(np.asarray(tri_indices, dtype=np.int64))
+    write_stl(filepath, triangles[indices],
+              header=b'STL Part - Generated by split_stl_parts.py')
+
+def instance_groups(instance_of):
+    """{original: [every component that is a copy of it, original first]}"""
+    groups = {}
+    for idx, original in enumerate(instance_of):
+        groups.setdefault(int(original), []).append(idx)
+    return {original: members for original, members in groups.items() if len(members) > 1}
+
+def save_instances_3mf(filepath, mesh, components, instance_of, transforms, filenames):
+    """One mesh resource per unique part, one build item (with transform) per part"""
+    from threemf_writer import write_3mf
 
-def split_stl(input_file, output_dir):
-    """Main splitting function"""
+    object_ids = {}
+    objects = []
+    for idx, original in enumerate(instance_of):
+        if original == idx:
+            part = mesh.submesh(components[idx])
+            objects.append((filenames[idx], part.vertices, part.faces))
+            object_ids[idx] = len(objects)
+    items = [(object_ids[original], f"part_{idx + 1:02d}", None if original == idx else transforms[idx])
+             for idx, original in enumerate(instance_of)]
+    write_3mf(filepath, objects, items=items)
+
+def split_stl(input_file, output_dir, dedup=False):
+    """Main splitting function
+
+    With ``dedup``, parts that are rigid copies of an earlier part (same
+    shape under rotation + translation) are not written again: the
+    metadata records which part they copy and its transform, and
+    <name>_parts.3mf holds each unique mesh once with a build item per part.
+    """
     print(f"\n{'='*60}")
     print(f"STL PART SPLITTER")
     print(f"{'='*60}\n")
@@ -132,12 +88,19 @@ def split_stl(input_file, output_dir):
     print(f"Loaded {len(triangles)} triangles\n")
     
     # Find components
-    components = find_connected_components(triangles)
+    mesh = load_mesh(input_file)
+    components = find_connected_components(triangles, mesh)
     
     print(f"\n{'='*60}")
     print(f"Found {len(components)} separate parts!")
     print(f"{'='*60}\n")
     
+    instance_of = np.arange(len(components))
+    if dedup:
+        instance_of, transforms = find_instances(mesh.vertices, mesh.faces, components)
+        unique = int((instance_of == np.arange(len(components))).sum())
+        print(f"Unique shapes: {unique} ({len(components) - unique} parts are copies)\n")
+    
     # Create output directory
     os.makedirs(output_dir, exist_ok=True)
     
@@ -153,10 +116,26 @@ def split_stl(input_file, output_dir):
     
     # Save each component
     output_files = []
+    filenames = []
     for idx, component in enumerate(components, 1):
         # Create filename
         output_file = os.path.join(output_dir, f"{base_name}_part_{idx:02d}.stl")
         
+        original = int(instance_of[idx - 1])
+        if original != idx - 1:
+            # Copy of an earlier part: reference its file instead of writing another
+            filenames.append(filenames[original])
+            print(f"Part {idx}: copy of part {original + 1} ({len(component)} triangles)")
+            metadata["parts"].append({
+                "part_number": idx,
+                "filename": filenames[original],
+                "triangle_count": len(component),
+                "instance_of": original + 1,
+                "transform": np.round(transforms[idx - 1], 9).tolist()
+            })
+            continue
+        filenames.append(os.path.basename(output_file))
+        
         # Save STL
         print(f"Saving part {idx}: {len(component)} triangles → {output_file}")
         save_stl_binary(output_file, triangles, component)
@@ -170,6 +149,22 @@ def split_stl(input_file, output_dir):
         
         output_files.append(output_file)
     
+    if dedup:
+        groups = instance_groups(instance_of)
+        metadata["unique_parts"] = len(output_files)
+        metadata["instances"] = [{
+            "part_number": original + 1,
+            "filename": filenames[original],
+            "count": len(members),
+            "parts": [idx + 1 for idx in members]
+        } for original, members in groups.items()]
+        metadata["transform_convention"] = "part = R @ original + t, transform = [R | t] rows"
+        
+        instances_file = os.path.join(output_dir, f"{base_name}_parts.3mf")
+        save_instances_3mf(instances_file, mesh, components, instance_of, transforms, filenames)
+        metadata["instances_3mf"] = os.path.basename(instances_file)
+        print(f"\nInstanced 3MF: {instances_file} ({len(output_files)} meshes, {len(components)} items)")
+    
     # Save metadata
     metadata_file = os.path.join(output_dir, f"{base_name}_parts_metadata.json")
     with open(metadata_file, 'w') as f:
@@ -182,25 +177,25 @@ def split_stl(input_file, output_dir):
     print(f"{'='*60}\n")
     print(f"Parts saved to: {output_dir}/")
     print(f"Total parts: {len(components)}")
+    if dedup:
+        print(f"Unique parts: {len(output_files)}")
     
     return output_files, metadata
 
 def main():
-    if len(sys.argv) < 2:
-        print("Usage: python split_stl_parts.py <input.stl> [output_dir]")
-        print("\nExample:")
-        print("  python split_stl_parts.py model.stl parts/")
-        sys.exit(1)
-    
-    input_file = sys.argv[1]
-    output_dir = sys.argv[2] if len(sys.argv) > 2 else "split_parts"
-    
-    if not os.path.exists(input_file):
-        print(f"Error: File not found: {input_file}")
+    parser = argparse.ArgumentParser(description="Split an STL into its disconnected parts")
+    parser.add_argument("input_file", metavar="input.stl")
+    parser.add_argument("output_dir", nargs="?", default="split_parts")
+    parser.add_argument("--dedup", action="store_true",
+                        help="write identical parts once and record the copies as instances")
+    args = parser.parse_args()
+    
+    if not os.path.exists(args.input_file):
+        print(f"Error: File not found: {args.input_file}")
         sys.exit(1)
     
     try:
-        split_stl(input_file, output_dir)
+        split_stl(args.input_file, args.output_dir, args.dedup)
     except Exception as e:
         print(f"\n❌ Error: {e}")
         import traceback
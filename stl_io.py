@@ -0,0 +1,269 @@
+#!/usr/bin/env python3
+"""
+Binary STL I/O
+Zero-copy memory-mapped reader shared by every splitter (ASCII STL is parsed into memory)
+"""
+
+import os
+import re
+import numpy as np
+
+HEADER_SIZE = 80
+COUNT_SIZE = 4
+RECORD_SIZE = 50
+
+# One 50-byte binary STL record: normal, three vertices, attribute byte count
+STL_DTYPE = np.dtype([
+    ('normal', '<f4', (3,)),
+    ('v0', '<f4', (3,)),
+    ('v1', '<f4', (3,)),
+    ('v2', '<f4', (3,)),
+    ('attr', '<u2'),
+])
+
+# Same records with the three vertices as a single (3, 3) field
+STL_VERTS_DTYPE = np.dtype([
+    ('normal', '<f4', (3,)),
+    ('vertices', '<f4', (3, 3)),
+    ('attr', '<u2'),
+])
+
+assert STL_DTYPE.itemsize == RECORD_SIZE
+assert STL_VERTS_DTYPE.itemsize == RECORD_SIZE
+
+
+def read_stl_header(filepath):
+    """Return (header_bytes, triangle_count) after validating the file size"""
+    file_size = os.path.getsize(filepath)
+    if file_size < HEADER_SIZE + COUNT_SIZE:
+        raise ValueError(f"{filepath}: too small to be a binary STL ({file_size} bytes)")
+
+    with open(filepath, 'rb') as f:
+        header = f.read(HEADER_SIZE)
+        count = int(np.frombuffer(f.read(COUNT_SIZE), dtype='<u4')[0])
+
+    expected = HEADER_SIZE + COUNT_SIZE + count * RECORD_SIZE
+    if file_size != expected and header.lstrip().startswith(b'solid'):
+        raise ValueError(f"{filepath}: looks like an ASCII STL, only binary STL is supported")
+    if file_size < expected:
+        raise ValueError(
+            f"{filepath}: header declares {count:,} triangles "
+            f"({expected:,} bytes) but file is {file_size:,} bytes"
+        )
+
+    return header, count
+
+
+ASCII_VERTEX = re.compile(rb"vertex\s+(\S+)\s+(\S+)\s+(\S+)")
+ASCII_NORMAL = re.compile(rb"facet\s+normal\s+(\S+)\s+(\S+)\s+(\S+)")
+
+
+def is_ascii_stl(filepath):
+    """True for a text STL; binary files whose header happens to start with 'solid' are not"""
+    file_size = os.path.getsize(filepath)
+    with open(filepath, 'rb') as f:
+        head = f.read(HEADER_SIZE + COUNT_SIZE)
+    if not head.lstrip().startswith(b'solid'):
+        return False
+    if len(head) < HEADER_SIZE + COUNT_SIZE:
+        return True
+    count = int(np.frombuffer(head[HEADER_SIZE:], dtype='<u4')[0])
+    return file_size != HEADER_SIZE + COUNT_SIZE + count * RECORD_SIZE
+
+
+def read_ascii_stl(filepath, text=None):
+    """Parse an ASCII STL into a STL_DTYPE array (held in memory, unlike read_stl)
+
+    ``text`` is the file's content if the caller has already read it.
+    """
+    if text is None:
+        with open(filepath, 'rb') as f:
+            text = f.read()
+    try:
+        corners = np.array(ASCII_VERTEX.findall(text), dtype=np.float32).reshape(-1, 3, 3)
+        normals = np.array(ASCII_NORMAL.findall(text), dtype=np.float32).reshape(-1, 3)
+    except ValueError as e:
+        raise ValueError(f"{filepath}: malformed ASCII STL ({e})") from None
+
+    records = np.zeros(len(corners), dtype=STL_VERTS_DTYPE)
+    records['vertices'] = corners
+    records['normal'] = normals if len(normals) == len(corners) else compute_normals(corners)
+    return records.view(STL_DTYPE)
+
+
+def read_stl(filepath):
+    """Memory-map a binary STL as a read-only structured array (STL_DTYPE)
+
+    No triangle data is copied: fields such as ``tris['v0']`` are strided
+    views straight onto the page cache. ASCII STLs are parsed instead.
+    """
+    if is_ascii_stl(filepath):
+        return read_ascii_stl(filepath)
+    _, count = read_stl_header(filepath)
+    if count == 0:
+        return np.zeros(0, dtype=STL_DTYPE)
+    return np.memmap(filepath, dtype=STL_DTYPE, mode='r',
+                     offset=HEADER_SIZE + COUNT_SIZE, shape=(count,))
+
+
+def read_stl_mapped(filepath):
+    """Return (file_bytes, tris) for an STL from a single mapping of the file
+
+    ``file_bytes`` is the whole file as a read-only uint8 array and ``tris``
+    the read_stl() records viewed from those same pages, so a caller that
+    needs both (e.g. to hash the file, then weld it) reads it only once.
+    """
+    if is_ascii_stl(filepath):
+        with open(filepath, 'rb') as f:
+            text = f.read()
+        return np.frombuffer(text, dtype=np.uint8), read_ascii_stl(filepath, text)
+    _, count = read_stl_header(filepath)
+    data = np.memmap(filepath, dtype=np.uint8, mode='r')
+    start = HEADER_SIZE + COUNT_SIZE
+    return data, data[start:start + count * RECORD_SIZE].view(STL_DTYPE)
+
+
+def triangle_vertices(tris):
+    """(N, 3, 3) float32 view of the vertices of a STL_DTYPE array"""
+    return tris.view(STL_VERTS_DTYPE)['vertices']
+
+
+def triangle_centers(tris):
+    """(N, 3) float64 triangle centroids"""
+    verts = triangle_vertices(tris)
+    return verts.mean(axis=1, dtype=np.float64)
+
+
+def record_bytes(tris):
+    """(N,) view of each triangle as its raw 50-byte record"""
+    return tris.view(np.dtype((np.void, RECORD_SIZE)))
+
+
+# Largest block of records assembled in memory before it is written out
+WRITE_CHUNK_TRIANGLES = 1 << 20
+
+
+def compute_normals(tri_vertices):
+    """Unit face normals for an (N, 3, 3) corner array (zero for degenerate faces)"""
+    tri_vertices = np.asarray(tri_vertices, dtype=np.float64)
+    normals = np.cross(tri_vertices[:, 1] - tri_vertices[:, 0],
+                       tri_vertices[:, 2] - tri_vertices[:, 0])
+    length = np.linalg.norm(normals, axis=1, keepdims=True)
+    np.divide(normals, length, out=normals, where=length > 0)
+    normals[length[:, 0] == 0] = 0.0
+    return normals.astype(np.float32)
+
+
+def _mesh_records(vertices, faces, start, stop):
+    """STL_DTYPE records for faces[start:stop] of an indexed mesh"""
+    corners = np.asarray(vertices, dtype=np.float32)[faces[start:stop]]
+    records = np.zeros(len(corners), dtype=STL_VERTS_DTYPE)
+    records['vertices'] = corners
+    records['normal'] = compute_normals(corners)
+    return records.view(STL_DTYPE)
+
+
+def _fixed_records(tris, start, stop):
+    """Copy of tris[start:stop] with all-zero normals recomputed from the vertices"""
+    records = np.array(tris[start:stop], dtype=STL_DTYPE)
+    zero = ~records['normal'].any(axis=1)
+    if zero.any():
+        records['normal'][zero] = compute_normals(triangle_vertices(records[zero]))
+    return records
+
+
+def _record_chunks(data, fix_normals):
+    """Return (count, generator of STL_DTYPE chunks) for write_stl"""
+    if isinstance(data, np.ndarray) and data.dtype.names:
+        count = len(data)
+        if fix_normals:
+            make = lambda start, stop: _fixed_records(data, start, stop)
+        else:
+            make = lambda start, stop: data[start:stop]
+    else:
+        vertices, faces = (data.vertices, data.faces) if hasattr(data, 'faces') else data
+        faces = np.asarray(faces)
+        count = len(faces)
+        make = lambda start, stop: _mesh_records(vertices, faces, start, stop)
+
+    def chunks():
+        for start in range(0, count, WRITE_CHUNK_TRIANGLES):
+            yield make(start, min(start + WRITE_CHUNK_TRIANGLES, count))
+
+    return count, chunks()
+
+
+def write_stl(filepath, data, header=b'', fix_normals=True):
+    """Write a binary STL with one buffer write per chunk of records
+
+    ``data`` is either a STL_DTYPE record array, or an indexed mesh given as
+    a (vertices, faces) pair or any object with ``vertices``/``faces``.
+    Record arrays are written byte-for-byte unless ``fix_normals`` is set
+    and some normals are zero; indexed meshes always get fresh normals.
+    """
+    count, chunks = _record_chunks(data, fix_normals)
+
+    if isinstance(header, str):
+        header = header.encode('ascii', 'replace')
+
+    with open(filepath, 'wb') as f:
+        f.write(header[:HEADER_SIZE].ljust(HEADER_SIZE, b' '))
+        f.write(np.uint32(count).tobytes())
+        for records in chunks:
+            f.write(np.ascontiguousarray(records).tobytes())
+
+    return count
+
+
+def iter_stl_chunks(filepath, chunk_triangles):
+    """Yield (start_index, records) for consecutive chunks of a binary STL
+
+    Each chunk gets its own short-lived memory map, so only one chunk of the
+    file is mapped at a time no matter how large the file is.
+    """
+    _, count = read_stl_header(filepath)
+    chunk_triangles = max(1, int(chunk_triangles))
+
+    for start in range(0, count, chunk_triangles):
+        stop = min(start + chunk_triangles, count)
+        tris = np.memmap(filepath, dtype=STL_DTYPE, mode='r',
+                         offset=HEADER_SIZE + COUNT_SIZE + start * RECORD_SIZE,
+                         shape=(stop - start,))
+        yield start, tris
+        del tris
+
+
+class StlAppender:
+    """Binary STL written incrementally; the triangle count is patched on close"""
+
+    def __init__(self, filepath, header=b'', fix_normals=True):
+        if isinstance(header, str):
+            header = header.encode('ascii', 'replace')
+        self.filepath = filepath
+        self.fix_normals = fix_normals
+        self.count = 0
+        self._file = open(filepath, 'wb')
+        self._file.write(header[:HEADER_SIZE].ljust(HEADER_SIZE, b' '))
+        self._file.write(np.uint32(0).tobytes())
+
+    def append(self, tris):
+        """Append a STL_DTYPE record array"""
+        if len(tris) == 0:
+            return
+        if self.fix_normals:
+            tris = _fixed_records(tris, 0, len(tris))
+        self._file.write(np.ascontiguousarray(tris).tobytes())
+        self.count += len(tris)
+
+    def close(self):
+        if self._file.closed:
+            return
+        self._file.seek(HEADER_SIZE)
+        self._file.write(np.uint32(self.count).tobytes())
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
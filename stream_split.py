@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Out-of-Core Region Splitter
+Classifies and splits binary STL files larger than RAM in fixed-size chunks
+"""
+
+import os
+import numpy as np
+
+from stl_io import read_stl_header, iter_stl_chunks, triangle_centers, StlAppender
+from region_rules import compile_rule_set, classify_normalized
+from mesh_bounds import stream_bounds
+from mesh_partition import partition_labels, label_faces
+
+# Rough working set per triangle while a chunk is in flight: the mapped
+# record, float64 centers and normalized copies, rule masks and the
+# gathered output records
+BYTES_PER_TRIANGLE = 256
+
+DEFAULT_MAX_MEMORY = 512 * 1024 ** 2
+
+
+def chunk_triangles_for(max_memory):
+    """Number of triangles processed per chunk under a memory budget in bytes"""
+    return max(1024, int(max_memory) // BYTES_PER_TRIANGLE)
+
+
+def stream_split(input_file, output_files, rule_set, regions,
+                 max_memory=DEFAULT_MAX_MEMORY, headers=None, fix_normals=False,
+                 trim_percent=None):
+    """Classify and split an STL chunk by chunk with bounded memory
+
+    ``output_files`` maps region label -> output path. A first cheap pass
+    computes global bounds (robust if ``trim_percent`` is set, see
+    mesh_bounds.stream_bounds), a second classifies each chunk and appends its
+    records to the region outputs; header counts are patched at the end and
+    outputs that received no triangles are removed.
+
+    Returns (bounds, counts) where counts is an int64 array indexed by label.
+    """
+    _, total = read_stl_header(input_file)
+    chunk_triangles = chunk_triangles_for(max_memory)
+    headers = headers or {}
+
+    bounds = stream_bounds(input_file, chunk_triangles, trim_percent)
+    compiled = compile_rule_set(rule_set, regions)
+    counts = np.zeros(len(regions), dtype=np.int64)
+
+    writers = {}
+    try:
+        for label, path in output_files.items():
+            writers[label] = StlAppender(path, headers.get(label, ''), fix_normals=fix_normals)
+
+        for start, tris in iter_stl_chunks(input_file, chunk_triangles):
+            pct = bounds.normalize(triangle_centers(tris))
+            labels = classify_normalized(pct, compiled)
+            order, offsets = partition_labels(labels, len(regions))
+            counts += np.diff(offsets)
+
+            for label, writer in writers.items():
+                writer.append(tris[label_faces(order, offsets, label)])
+
+            print(f"  Progress: {min(start + len(tris), total):,}/{total:,}")
+    finally:
+        for writer in writers.values():
+            writer.close()
+
+    for label, path in output_files.items():
+        if counts[label] == 0:
+            os.remove(path)
+
+    return bounds, counts
@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""
+Pipeline CLI Tests
+Holds config-only commands to their -X importtime budget: no NumPy, trimesh or process pools
+"""
+
+import re
+import sys
+import subprocess
+
+import pytest
+
+import pipeline
+
+# Config-only commands should start in under 100 ms
+IMPORT_BUDGET_US = 100_000
+HEAVY_MODULES = ('numpy', 'trimesh', 'concurrent.futures')
+
+IMPORT_LINE = re.compile(r"import time:\s+\d+ \|\s+(\d+) \|( +)(\S+)")
+
+
+def import_times(*args):
+    """{module: cumulative microseconds} and the top-level total for ``python -X importtime pipeline.py args``"""
+    run = subprocess.run([sys.executable, '-X', 'importtime', 'pipeline.py', *args],
+                         cwd=pipeline.REPO_DIR, capture_output=True, text=True, check=True)
+    modules, total = {}, 0
+    for line in run.stderr.splitlines():
+        match = IMPORT_LINE.match(line)
+        if not match:
+            continue
+        cumulative, indent, name = int(match.group(1)), match.group(2), match.group(3)
+        modules[name] = cumulative
+        if len(indent) == 1:  # top level; nested imports are already in its cumulative time
+            total += cumulative
+    return modules, total
+
+
+@pytest.mark.parametrize('args', [('colors',), ('--help',)], ids=['colors', 'help'])
+def test_config_only_commands_stay_light(args):
+    modules, total = import_times(*args)
+
+    loaded = [name for name in modules
+              if any(name == heavy or name.startswith(heavy + '.') for heavy in HEAVY_MODULES)]
+    assert not loaded, f"{' '.join(args)} imported {', '.join(loaded)}"
+    assert total < IMPORT_BUDGET_US, f"{' '.join(args)} spent {total / 1000:.0f} ms importing"
+
+
+def test_watch_tools_match_batch():
+    import batch
+    assert set(pipeline.WATCH_TOOLS) == set(batch.TOOLS)
@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""
+Printer Upload Tests
+Runs UploadManager against a local implicit-TLS FTP stand-in that can drop the connection mid-STOR
+"""
+
+import os
+import ssl
+import shutil
+import socket
+import threading
+import subprocess
+import socketserver
+
+import pytest
+
+import printer_upload
+
+ACCESS_CODE = 'stand-in-code'
+
+
+@pytest.fixture(scope='module')
+def certificate(tmp_path_factory):
+    """Throwaway self-signed certificate for the stand-in"""
+    if not shutil.which('openssl'):
+        pytest.skip("openssl not available to make a test certificate")
+    directory = tmp_path_factory.mktemp('cert')
+    cert, key = str(directory / 'cert.pem'), str(directory / 'key.pem')
+    subprocess.run(['openssl', 'req', '-x509', '-newkey', 'rsa:2048', '-nodes', '-keyout', key, '-out', cert,
+                    '-days', '1', '-subj', '/CN=printer'], check=True, capture_output=True)
+    return cert, key
+
+
+class StandIn(socketserver.ThreadingTCPServer):
+    """Just enough of the printer's FTPS server: login, PASV, REST, STOR, RETR, SIZE
+
+    ``drop_after`` bytes into the first STOR both connections are cut.
+    ``received`` counts the data bytes that arrived in STORs.
+    """
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, root, certificate, drop_after=0):
+        super().__init__(('127.0.0.1', 0), StandInHandler)
+        self.root = root
+        self.context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        self.context.load_cert_chain(*certificate)
+        self.drop_after = drop_after
+        self.received = 0
+        self.logins = 0
+        self.lock = threading.Lock()
+
+
+class StandInHandler(socketserver.BaseRequestHandler):
+
+    def handle(self):
+        server = self.server
+        control = server.context.wrap_socket(self.request, server_side=True)
+        lines = control.makefile('rb')
+        reply = lambda text: control.sendall(f"{text}\r\n".encode())
+        reply('220 stand-in')
+        rest, passive = 0, None
+        for line in lines:
+            command, _, arg = line.decode().strip().partition(' ')
+            path = os.path.join(server.root, arg)
+            command = command.upper()
+            if command == 'USER':
+                reply('331 password please')
+            elif command == 'PASS':
+                with server.lock:
+                    server.logins += 1
+                reply('230 logged in' if arg == ACCESS_CODE else '530 Login incorrect')
+            elif command in ('PBSZ', 'PROT', 'TYPE', 'NOOP'):
+                reply('200 ok')
+            elif command == 'SIZE':
+                reply(f'213 {os.path.getsize(path)}' if os.path.exists(path) else '550 no such file')
+            elif command == 'REST':
+                rest = int(arg)
+                reply(f'350 restarting at {rest}')
+            elif command == 'PASV':
+                passive = socket.create_server(('127.0.0.1', 0))
+                port = passive.getsockname()[1]
+                reply(f'227 Entering Passive Mode (127,0,0,1,{port >> 8},{port & 255})')
+            elif command in ('STOR', 'RETR'):
+                reply('150 opening data connection')
+                data, _ = passive.accept()
+                passive.close()
+                data = server.context.wrap_socket(data, server_side=True)
+                if command == 'STOR':
+                    if not self.store(data, path, rest):
+                        control.close()
+                        return
+                else:
+                    with open(path, 'rb') as f:
+                        f.seek(rest)
+                        data.sendall(f.read())
+                    data.unwrap()
+                data.close()
+                rest = 0
+                reply('226 transfer complete')
+            elif command == 'QUIT':
+                reply('221 bye')
+                return
+            else:
+                reply('502 not implemented')
+
+    def store(self, data, path, rest):
+        """Receive one STOR; False if the connection was cut on purpose"""
+        server = self.server
+        with open(path, 'r+b' if rest else 'wb') as out:
+            out.seek(rest)
+            while chunk := data.recv(65536):
+                out.write(chunk)
+                with server.lock:
+                    server.received += len(chunk)
+                    drop = server.drop_after and server.received >= server.drop_after
+                    if drop:
+                        server.drop_after = 0
+                if drop:
+                    data.close()
+                    return False
+        data.unwrap()
+        return True
+
+
+@pytest.fixture
+def stand_in(tmp_path, certificate, monkeypatch):
+    monkeypatch.setattr(printer_upload, 'RETRY_DELAY', 0)
+    servers = []
+
+    def start(drop_after=0):
+        root = tmp_path / 'sdcard'
+        root.mkdir(exist_ok=True)
+        server = StandIn(str(root), certificate, drop_after)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return server, printer_upload.UploadManager(port=server.server_address[1], retries=2)
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def gcode(tmp_path, name, size, seed=0):
+    path = tmp_path / name
+    path.write_bytes(os.urandom(size) if seed is None else bytes((i * 7 + seed) % 251 for i in range(size)))
+    return str(path)
+
+
+def test_interrupted_upload_resends_only_missing_bytes(tmp_path, stand_in):
+    server, manager = stand_in(drop_after=3 * 2 ** 20)
+    local = gcode(tmp_path, 'big.gcode', 8 * 2 ** 20, seed=None)
+
+    result = manager.upload(local, '127.0.0.1', ACCESS_CODE)
+    manager.close()
+
+    assert result.attempts == 2 and result.resumed_from >= 3 * 2 ** 20
+    assert server.received == result.size  # nothing arrived twice
+    with open(local, 'rb') as a, open(os.path.join(server.root, 'big.gcode'), 'rb') as b:
+        assert a.read() == b.read()
+
+
+def test_connection_is_reused_across_files(tmp_path, stand_in):
+    server, manager = stand_in()
+    for i in range(3):
+        manager.upload(gcode(tmp_path, f"part{i}.gcode", 100_000, seed=i), '127.0.0.1', ACCESS_CODE)
+    manager.close()
+
+    assert manager.connections == 1 and server.logins == 1
+
+
+def test_resume_continues_a_matching_partial(tmp_path, stand_in):
+    server, manager = stand_in()
+    local = gcode(tmp_path, 'part.gcode', 500_000)
+    with open(local, 'rb') as f, open(os.path.join(server.root, 'part.gcode'), 'wb') as partial:
+        partial.write(f.read(200_000))
+
+    result = manager.upload(local, '127.0.0.1', ACCESS_CODE, resume=True)
+    manager.close()
+
+    assert result.resumed_from == 200_000
+    assert server.received == 300_000
+
+
+def test_resume_rewrites_a_stale_file_with_the_same_name(tmp_path, stand_in):
+    server, manager = stand_in()
+    local = gcode(tmp_path, 'part.gcode', 500_000, seed=1)
+    with open(os.path.join(server.root, 'part.gcode'), 'wb') as stale:
+        stale.write(os.urandom(200_000))
+
+    result = manager.upload(local, '127.0.0.1', ACCESS_CODE, resume=True)
+    manager.close()
+
+    assert result.resumed_from == 0
+    with open(local, 'rb') as a, open(os.path.join(server.root, 'part.gcode'), 'rb') as b:
+        assert a.read() == b.read()
+
+
+def test_wrong_access_code_fails_without_retrying(tmp_path, stand_in):
+    server, _ = stand_in()
+    manager = printer_upload.UploadManager(port=server.server_address[1], retries=3)
+
+    with pytest.raises(RuntimeError, match="530"):
+        manager.upload(gcode(tmp_path, 'part.gcode', 1000), '127.0.0.1', 'wrong')
+    assert server.logins == 1
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Slice/Upload Pipeline Tests
+Runs run_batch with the stub slicer from test_slicer.py and a fake upload that sleeps
+"""
+
+import os
+import sys
+import time
+import asyncio
+import threading
+
+import pytest
+
+import slicer
+import slice_upload
+from test_slicer import make_stub, make_inputs
+
+pytestmark = pytest.mark.skipif(sys.platform == 'win32', reason="stub slicer is a shell script")
+
+
+class Gauge:
+    """Thread-safe count of things in progress and the most seen at once"""
+
+    def __init__(self):
+        self.now = 0
+        self.peak = 0
+        self.lock = threading.Lock()
+
+    def __enter__(self):
+        with self.lock:
+            self.now += 1
+            self.peak = max(self.peak, self.now)
+
+    def __exit__(self, *exc):
+        with self.lock:
+            self.now -= 1
+
+
+@pytest.fixture
+def slicers(monkeypatch):
+    """Gauge of slicer processes running at once"""
+    gauge = Gauge()
+    supervise = slicer.supervise
+
+    def counted(*args, **kwargs):
+        with gauge:
+            return supervise(*args, **kwargs)
+
+    monkeypatch.setattr(slicer, 'supervise', counted)
+    return gauge
+
+
+@pytest.fixture
+def waiting(monkeypatch):
+    """Most sliced files seen waiting in the upload queue at once"""
+    peak = []
+
+    class Recorded(asyncio.Queue):
+        def put_nowait(self, item):
+            super().put_nowait(item)
+            if item is not None:
+                peak.append(self.qsize())
+
+    monkeypatch.setattr(slice_upload.asyncio, 'Queue', Recorded)
+    return lambda: max(peak, default=0)
+
+
+def sleepy_upload(seconds, fail=()):
+    def upload(gcode):
+        time.sleep(seconds)
+        if os.path.basename(gcode) in fail:
+            raise RuntimeError(f"Upload failed for {os.path.basename(gcode)}: 550 no space")
+    return upload
+
+
+def batch(tmp_path, inputs, upload, slice_workers=1, upload_workers=1, queue_size=2, delay=0.3, **options):
+    jobs = slicer.SliceJobs(str(tmp_path / 'out'), slice_workers, make_stub(tmp_path, delay), str(tmp_path),
+                            str(tmp_path / 'logs'), **options)
+    return asyncio.run(slice_upload.run_batch(inputs, jobs, upload, slice_workers, upload_workers, queue_size))
+
+
+def test_uploads_overlap_with_slicing(tmp_path, slicers):
+    inputs = make_inputs(tmp_path, [f"m{i}" for i in range(6)])
+    start = time.perf_counter()
+    results = batch(tmp_path, inputs, sleepy_upload(0.3))
+    elapsed = time.perf_counter() - start
+
+    assert all(r['uploaded'] and r['error'] is None for r in results)
+    back_to_back = sum(r['slice_seconds'] + r['upload_seconds'] for r in results)
+    assert elapsed < 0.75 * back_to_back
+    assert slicers.peak == 1
+
+
+def test_slow_uploads_pause_slicing(tmp_path, waiting):
+    inputs = make_inputs(tmp_path, [f"m{i}" for i in range(8)])
+    results = batch(tmp_path, inputs, sleepy_upload(0.4), slice_workers=2, queue_size=2, delay=0.05)
+
+    assert all(r['uploaded'] for r in results)
+    assert waiting() == 2  # the queue filled up, and never past queue_size
+
+
+def test_retry_backoff_keeps_to_the_slicer_slots(tmp_path, slicers):
+    inputs = make_inputs(tmp_path, ['flaky0', 'flaky1'] + [f"m{i}" for i in range(6)])
+    start = time.perf_counter()
+    results = batch(tmp_path, inputs, sleepy_upload(0), slice_workers=2, backoff=0.9, retries=1)
+    elapsed = time.perf_counter() - start
+
+    assert all(r['uploaded'] for r in results)
+    assert [r['slice_seconds'] >= 0.9 for r in results[:2]] == [True, True]  # both waited out a backoff
+    assert slicers.peak == 2
+    # The six others fill both slots during the backoff (about 1.2s in all); with
+    # the slicer threads sitting idle through it, it takes 0.9 + 8 * 0.3 / 2 = 2.1s
+    assert elapsed < 1.7
+
+
+def test_failed_upload_doesnt_stop_the_batch(tmp_path):
+    inputs = make_inputs(tmp_path, ['m0', 'm1', 'm2'])
+    results = batch(tmp_path, inputs, sleepy_upload(0, fail={'m1.gcode'}), delay=0)
+
+    assert [r['uploaded'] for r in results] == [True, False, True]
+    assert results[1]['gcode'] and '550 no space' in results[1]['error']
+    assert results[0]['error'] is None and results[2]['error'] is None
+
+
+@pytest.mark.parametrize('option', ['slice_workers', 'upload_workers', 'queue_size'])
+def test_workers_and_queue_must_be_positive(tmp_path, option):
+    with pytest.raises(ValueError):
+        batch(tmp_path, [], sleepy_upload(0), **{option: 0})
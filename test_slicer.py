@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+Slicer Scheduler Tests
+Runs slice_many against a stub slicer script that sleeps, then writes plate_1.gcode, unless the
+model's name tells it to hang, crash, crash once or eat memory
+"""
+
+import os
+import sys
+import time
+import stat
+import signal
+
+import pytest
+
+import slicer
+
+STUB = '''#!/bin/sh
+out=""
+for arg in "$@"; do
+    [ "$prev" = "--outputdir" ] && out="$arg"
+    prev="$arg"
+    model="$arg"
+done
+case "${{model##*/}}" in
+    *hang*) sleep 60 & echo "$$ $!" > "$model.pids"; sleep 60;;
+    *crash*) kill -SEGV $$;;
+    *flaky*) [ -e "$model.tried" ] || {{ touch "$model.tried"; kill -SEGV $$; }};;
+    *hog*) exec "{python}" -c "import time; x = bytearray(256 << 20); time.sleep(60)";;
+esac
+sleep {delay}
+echo "address space: $(ulimit -v)"
+case "${{model##*/}}" in *broken*) echo "Objects are partly inside the print volume"; exit 1;; esac
+echo "G1 ; $model" > "$out/plate_1.gcode"
+'''
+
+pytestmark = pytest.mark.skipif(sys.platform == 'win32', reason="stub slicer is a shell script")
+
+
+def make_stub(tmp_path, delay=0.3):
+    path = tmp_path / 'stub-slicer'
+    path.write_text(STUB.format(delay=delay, python=sys.executable))
+    path.chmod(path.stat().st_mode | stat.S_IXUSR)
+    return str(path)
+
+
+def make_inputs(tmp_path, names):
+    models = tmp_path / 'models'
+    models.mkdir(exist_ok=True)
+    paths = []
+    for name in names:
+        path = models / f"{name}.stl"
+        path.write_bytes(b'')
+        paths.append(str(path))
+    return paths
+
+
+def run(tmp_path, inputs, **options):
+    return slicer.slice_many(inputs, str(tmp_path / 'out'), slicer=make_stub(tmp_path, options.pop('delay', 0.3)),
+                             profiles_dir=str(tmp_path), log_dir=str(tmp_path / 'logs'), **options)
+
+
+def test_every_model_gets_its_gcode_and_log(tmp_path):
+    inputs = make_inputs(tmp_path, [f"m{i}" for i in range(4)])
+    results = run(tmp_path, inputs, workers=2)
+
+    assert [r.input_file for r in results] == inputs
+    assert all(r.ok for r in results)
+    for path, result in zip(inputs, results):
+        name = os.path.splitext(os.path.basename(path))[0]
+        assert result.gcode == str(tmp_path / 'out' / f"{name}.gcode")
+        assert open(result.gcode).read().strip() == f"G1 ; {path}"
+        assert os.path.exists(tmp_path / 'logs' / f"{name}_slice.log")
+    # Private work directories are gone once the G-code has been moved out
+    assert sorted(os.listdir(tmp_path / 'out')) == [f"m{i}.gcode" for i in range(4)]
+
+
+def test_workers_run_in_parallel(tmp_path):
+    inputs = make_inputs(tmp_path, [f"m{i}" for i in range(4)])
+    start = time.perf_counter()
+    results = run(tmp_path, inputs, workers=4, delay=1)
+    elapsed = time.perf_counter() - start
+
+    assert all(r.ok for r in results)
+    assert elapsed < 3  # one at a time would take at least 4s
+
+
+def test_memory_budget_reaches_the_slicer(tmp_path):
+    if not hasattr(slicer.resource, 'prlimit'):
+        pytest.skip("resource.prlimit not available")
+    inputs = make_inputs(tmp_path, ['m0'])
+    result, = run(tmp_path, inputs, memory_limit=512 * 2 ** 20)
+
+    assert result.ok
+    assert "address space: 524288" in open(result.log_file).read()
+
+
+def test_failed_model_doesnt_stop_the_batch(tmp_path):
+    inputs = make_inputs(tmp_path, ['good', 'broken'])
+    good, broken = run(tmp_path, inputs, workers=2)
+
+    assert good.ok
+    assert not broken.ok and broken.gcode is None
+    assert broken.failure == 'validation' and broken.attempts == 1
+    assert not os.path.exists(tmp_path / 'out' / 'broken.gcode')
+
+
+def test_inputs_writing_the_same_gcode_are_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        slicer.slice_many(['a/part.stl', 'b/part.stl'], str(tmp_path))
+
+
+def alive(pid):
+    """True while ``pid`` exists and isn't a zombie waiting to be reaped"""
+    try:
+        with open(f'/proc/{pid}/stat') as f:
+            return f.read().rsplit(')', 1)[1].split()[0] != 'Z'
+    except OSError:
+        return False
+
+
+def test_timeout_kills_the_whole_process_group(tmp_path):
+    inputs = make_inputs(tmp_path, ['hang'])
+    start = time.perf_counter()
+    result, = run(tmp_path, inputs, timeout=1, retries=0)
+    elapsed = time.perf_counter() - start
+
+    assert not result.ok and result.failure == 'timeout'
+    assert elapsed < 10  # the stub would sleep for 60s
+    slicer_pid, child_pid = map(int, open(inputs[0] + '.pids').read().split())
+    time.sleep(0.2)  # let init reap the orphaned child
+    assert not alive(slicer_pid) and not alive(child_pid)
+
+
+def test_segfault_is_retried_then_reported(tmp_path):
+    inputs = make_inputs(tmp_path, ['crash'])
+    result, = run(tmp_path, inputs, retries=2, backoff=0.1)
+
+    assert not result.ok and result.failure == 'segfault'
+    assert result.attempts == 3
+
+
+def test_transient_crash_succeeds_on_retry(tmp_path):
+    inputs = make_inputs(tmp_path, ['flaky'])
+    start = time.perf_counter()
+    result, = run(tmp_path, inputs, retries=2, backoff=0.5, delay=0)
+    elapsed = time.perf_counter() - start
+
+    assert result.ok and result.attempts == 2
+    assert elapsed >= 0.5  # waited out the backoff before retrying
+    assert open(result.gcode).read().strip() == f"G1 ; {inputs[0]}"
+
+
+def test_rss_limit_kills_without_retrying(tmp_path):
+    if not os.path.exists('/proc/self/stat'):
+        pytest.skip("RSS is read from /proc")
+    inputs = make_inputs(tmp_path, ['hog'])
+    start = time.perf_counter()
+    result, = run(tmp_path, inputs, rss_limit=64 * 2 ** 20, retries=2, backoff=0.1)
+
+    assert not result.ok and result.failure == 'oom'
+    assert result.attempts == 1  # out of budget fails the same way every time
+    assert time.perf_counter() - start < 10
+
+
+def test_backoff_doubles_per_attempt():
+    assert [slicer.backoff_delay(n, 2.0) for n in (1, 2, 3)] == [2.0, 4.0, 8.0]
@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""
+Streaming 3MF Writer
+Formats vertex/triangle XML in vectorized chunks and streams it straight into the zip
+"""
+
+import json
+import zipfile
+from xml.sax.saxutils import escape
+
+import numpy as np
+
+# Records formatted per chunk; bounds memory to a few MB of text at a time
+CHUNK_RECORDS = 65536
+
+DEFAULT_COMPRESSLEVEL = 6
+
+CORE_NAMESPACE = "http://schemas.microsoft.com/3dmanufacturing/core/2015/02"
+
+VERTEX_TEMPLATE = '<vertex x="%.6f" y="%.6f" z="%.6f"/>\n'
+TRIANGLE_TEMPLATE = '<triangle v1="%d" v2="%d" v3="%d"/>\n'
+PAINTED_TRIANGLE_TEMPLATE = '<triangle v1="%d" v2="%d" v3="%d"%s'
+
+# Rough XML bytes per record, used to decide whether an entry needs ZIP64
+VERTEX_BYTES = 64
+TRIANGLE_BYTES = 48
+PAINTED_TRIANGLE_BYTES = 80
+
+CONTENT_TYPES = '''<?xml version="1.0" encoding="UTF-8"?>
+<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">
+  <Default Extension="rels"  ContentType="application/vnd.openxmlformats-package.relationships+xml"/>
+  <Default Extension="model" ContentType="application/vnd.ms-package.3dmanufacturing-3dmodel+xml"/>
+  <Default Extension="json"  ContentType="application/json"/>
+</Types>
+'''
+
+RELS = '''<?xml version="1.0" encoding="UTF-8"?>
+<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">
+  <Relationship Id="rel0"
+    Type="http://schemas.microsoft.com/3dmanufacturing/2013/01/3dmodel"
+    Target="/3D/3dmodel.model"/>
+</Relationships>
+'''
+
+
+def attr(value):
+    """Escape text for a double-quoted XML attribute"""
+    return escape(str(value), {'"': '&quot;'})
+
+
+def format_records(template, array, dtype):
+    """Yield text for every row of ``array``, CHUNK_RECORDS rows per string
+
+    One ``%`` call per chunk against a repeated template keeps the loop in C.
+    """
+    for start in range(0, len(array), CHUNK_RECORDS):
+        chunk = np.asarray(array[start:start + CHUNK_RECORDS], dtype=dtype)
+        yield (template * len(chunk)) % tuple(chunk.ravel().tolist())
+
+
+def paint_code(extruder):
+    """Bambu Studio / OrcaSlicer ``paint_color`` value for a 1-based extruder"""
+    if extruder == 1:
+        return "4"
+    if extruder == 2:
+        return "8"
+    return f"{extruder - 3:X}C"
+
+
+def triangle_suffixes(count, paint=True):
+    """Attribute tail of a triangle for each material index (extruder = index + 1)"""
+    return np.array([f' p1="{i}"' + (f' paint_color="{paint_code(i + 1)}"' if paint else '') + '/>\n'
+                     for i in range(count)], dtype=object)
+
+
+def painted_triangle_xml(faces, labels, suffixes):
+    """Like triangle_xml, with each face's material attributes looked up by label"""
+    for start in range(0, len(faces), CHUNK_RECORDS):
+        chunk = np.asarray(faces[start:start + CHUNK_RECORDS], dtype=np.int64)
+        fields = np.empty((len(chunk), 4), dtype=object)
+        fields[:, :3] = chunk
+        fields[:, 3] = suffixes[labels[start:start + CHUNK_RECORDS]]
+        yield (PAINTED_TRIANGLE_TEMPLATE * len(chunk)) % tuple(fields.ravel().tolist())
+
+
+def vertex_xml(vertices):
+    return format_records(VERTEX_TEMPLATE, vertices, np.float64)
+
+
+def triangle_xml(faces):
+    return format_records(TRIANGLE_TEMPLATE, faces, np.int64)
+
+
+def materials_xml(materials_id, materials):
+    lines = [f'    <basematerials id="{materials_id}">\n']
+    lines += [f'      <base name="{attr(name)}" displaycolor="{attr(color)}"/>\n' for name, color in materials]
+    lines.append('    </basematerials>\n')
+    return ''.join(lines)
+
+
+def transform_attr(matrix):
+    """3MF transform for a 3x4 [R | t] matrix (x' = R x + t)
+
+    3MF multiplies row vectors, so the twelve values are R transposed
+    followed by t.
+    """
+    matrix = np.asarray(matrix, dtype=np.float64)
+    return ' '.join('%.9g' % value for value in np.vstack([matrix[:, :3].T, matrix[:, 3]]).ravel())
+
+
+def model_chunks(objects, materials=None, paint=True, items=None):
+    """Yield the 3D model document for a list of (name, vertices, faces)
+
+    ``items`` lists the build as (object id, name, 3x4 matrix or None);
+    by default every object is placed once, untransformed.
+
+    With ``materials`` (a list of (name, "#RRGGBB")) each object is
+    (name, vertices, faces, labels): the colors become one basematerials
+    group and every triangle gets ``p1`` = its label, plus the slicer
+    ``paint_color`` attribute unless ``paint`` is False.
+    """
+    yield f'''<?xml version="1.0" encoding="UTF-8"?>
+<model unit="millimeter" xml:lang="en-US"
+  xmlns="{CORE_NAMESPACE}">
+  <resources>
+'''
+    if materials:
+        materials_id = len(objects) + 1
+        suffixes = triangle_suffixes(len(materials), paint)
+        yield materials_xml(materials_id, materials)
+    for object_id, (_, vertices, faces, *labels) in enumerate(objects, 1):
+        properties = f' pid="{materials_id}" pindex="0"' if materials else ''
+        yield f'''    <object id="{object_id}" type="model"{properties}>
+      <mesh>
+        <vertices>
+'''
+        yield from vertex_xml(vertices) if len(vertices) else ['\n']
+        yield '''        </vertices>
+        <triangles>
+'''
+        if not len(faces):
+            yield '\n'
+        elif materials:
+            yield from painted_triangle_xml(faces, np.asarray(labels[0]), suffixes)
+        else:
+            yield from triangle_xml(faces)
+        yield '''        </triangles>
+      </mesh>
+    </object>
+'''
+    yield '''  </resources>
+  <build>
+'''
+    for object_id, name, matrix in items or [(i, o[0], None) for i, o in enumerate(objects, 1)]:
+        placement = '' if matrix is None else f' transform="{transform_attr(matrix)}"'
+        yield f'    <item objectid="{object_id}" name="{attr(name)}"{placement}/>\n'
+    yield '''  </build>
+</model>
+'''
+
+
+def zip_options(compresslevel):
+    """ZipFile keyword arguments for a compression level (0 = store)"""
+    if compresslevel == 0:
+        return {'compression': zipfile.ZIP_STORED}
+    return {'compression': zipfile.ZIP_DEFLATED, 'compresslevel': compresslevel}
+
+
+def write_entry(z, arcname, chunks, size_hint=0):
+    """Stream text chunks into one zip entry without building it in memory"""
+    with z.open(arcname, 'w', force_zip64=size_hint > 2 ** 31 - 1) as entry:
+        for chunk in chunks:
+            entry.write(chunk.encode('utf-8'))
+
+
+def write_3mf(outfile, objects, assign=None, compresslevel=DEFAULT_COMPRESSLEVEL, files=None,
+              materials=None, paint=True, metadata=None, items=None):
+    """Write a 3MF package with one object per (name, vertices, faces)
+
+    ``assign`` (a color assignment dict) is embedded as
+    metadata/color_assignment.json, ``metadata`` maps further archive
+    names to JSON-able objects, and ``files`` maps archive names to files
+    on disk that are copied in as-is. ``materials``, ``paint`` and
+    ``items`` are passed to model_chunks. Memory use is independent of
+    mesh size apart from the mesh arrays themselves.
+    """
+    objects = list(objects)
+    if materials:
+        for name, _, faces, labels in objects:
+            if len(labels) != len(faces):
+                raise ValueError(f"{name}: {len(labels):,} labels for {len(faces):,} triangles")
+            if len(labels) and int(np.max(labels)) >= len(materials):
+                raise ValueError(f"{name}: label {int(np.max(labels))} but only {len(materials)} materials")
+    triangle_bytes = PAINTED_TRIANGLE_BYTES if materials else TRIANGLE_BYTES
+    size_hint = sum(len(o[1]) * VERTEX_BYTES + len(o[2]) * triangle_bytes for o in objects)
+
+    with zipfile.ZipFile(outfile, 'w', **zip_options(compresslevel)) as z:
+        z.writestr('[Content_Types].xml', CONTENT_TYPES)
+        z.writestr('_rels/.rels', RELS)
+        write_entry(z, '3D/3dmodel.model', model_chunks(objects, materials, paint, items), size_hint)
+        if assign:
+            z.writestr('metadata/color_assignment.json', json.dumps(assign, indent=2))
+        for arcname, content in (metadata or {}).items():
+            z.writestr(arcname, json.dumps(content, indent=2))
+        for arcname, path in (files or {}).items():
+            z.write(path, arcname)  # copied in blocks, never read whole
+    return outfile
@@ -6,11 +6,18 @@ Splits SINGLE model by analyzing WHERE each triangle is located anatomically
 
 import sys
 import os
+import argparse
 import json
-import trimesh
 import numpy as np
 from pathlib import Path
 
+from region_rules import load_rule_set
+from stl_io import write_stl
+from mesh_cache import load_mesh, cached_labels, store_labels
+from mesh_bounds import compute_bounds
+from mesh_partition import partition_labels, label_faces
+from parallel_classify import classify_faces
+
 def load_color_config(config_path):
     """Load the 8-region color configuration"""
     import configparser
@@ -27,8 +34,14 @@ def load_color_config(config_path):
     
     return color_map
 
-def analyze_triangle_anatomy(mesh, color_map):
-    """Analyze each triangle and assign to anatomical region based on 3D position"""
+def analyze_triangle_anatomy(mesh, color_map, workers=1, input_file=None):
+    """Analyze each triangle and assign to anatomical region based on 3D position
+    
+    If ``input_file`` is given, labels are reused from / saved to the mesh
+    cache, keyed by the file content and the rule set. A region the color
+    config doesn't define goes to its fallback index from region_rules.txt,
+    as with the original per-triangle rules.
+    """
     
     print(f"\n{'='*60}")
     print("🧠 TRIANGLE-BASED ANATOMICAL ANALYSIS")
@@ -37,106 +50,111 @@ def analyze_triangle_anatomy(mesh, color_map):
     regions = list(color_map.keys())
     print(f"📊 Analyzing {len(mesh.faces):,} triangles for anatomical regions...")
     
-    # Calculate triangle centers
-    triangle_centers = []
-    for i, face in enumerate(mesh.faces):
-        vertices = mesh.vertices[face]
-        center = vertices.mean(axis=0)
-        triangle_centers.append(center)
-        
-        if (i + 1) % 100000 == 0:
-            print(f"   Progress: {i+1:,}/{len(mesh.faces):,}")
-    
-    triangle_centers = np.array(triangle_centers)
-    
     # Get model bounds
-    bounds = mesh.bounds
-    x_range = bounds[1][0] - bounds[0][0]
-    y_range = bounds[1][1] - bounds[0][1]
-    z_range = bounds[1][2] - bounds[0][2]
+    bounds = compute_bounds(mesh.vertices)
+    x_range, y_range, z_range = bounds.span
     
     print(f"\n📐 Model bounds:")
-    print(f"   X: {bounds[0][0]:.1f} to {bounds[1][0]:.1f} (range: {x_range:.1f})")
-    print(f"   Y: {bounds[0][1]:.1f} to {bounds[1][1]:.1f} (range: {y_range:.1f})")
-    print(f"   Z: {bounds[0][2]:.1f} to {bounds[1][2]:.1f} (range: {z_range:.1f})")
-    
-    # Calculate relative positions (0-1)
-    rel_x = (triangle_centers[:, 0] - bounds[0][0]) / x_range
-    rel_y = (triangle_centers[:, 1] - bounds[0][1]) / y_range
-    rel_z = (triangle_centers[:, 2] - bounds[0][2]) / z_range
+    print(f"   X: {bounds.lo[0]:.1f} to {bounds.hi[0]:.1f} (range: {x_range:.1f})")
+    print(f"   Y: {bounds.lo[1]:.1f} to {bounds.hi[1]:.1f} (range: {y_range:.1f})")
+    print(f"   Z: {bounds.lo[2]:.1f} to {bounds.hi[2]:.1f} (range: {z_range:.1f})")
     
     print(f"\n🎯 Assigning triangles to anatomical regions...")
     
-    # Initialize assignments
-    triangle_assignments = np.full(len(triangle_centers), -1, dtype=int)
+    # ANATOMICAL ASSIGNMENT RULES (region_rules.txt, "triangle" rule set)
+    rule_set = load_rule_set('triangle')
+    triangle_assignments = cached_labels(input_file, rule_set, regions) if input_file else None
+    if triangle_assignments is not None:
+        print("   Using cached triangle labels (rules unchanged)")
+    else:
+        # Triangle centers are computed inside classify_faces, split across workers
+        triangle_assignments = classify_faces(mesh.vertices, mesh.faces, bounds,
+                                              rule_set, regions, workers)
+        if input_file:
+            store_labels(input_file, rule_set, regions, triangle_assignments)
     
-    # ANATOMICAL ASSIGNMENT RULES
-    for i in range(len(triangle_centers)):
-        x_pct, y_pct, z_pct = rel_x[i], rel_y[i], rel_z[i]
-        
-        # HEAD/HELMET: Top 20% of model
-        if z_pct > 0.80:
-            if y_pct > 0.6:  # Front face area
-                triangle_assignments[i] = regions.index('optics') if 'optics' in regions else 0
-            else:  # Helmet/back of head
-                triangle_assignments[i] = regions.index('armor_primary') if 'armor_primary' in regions else 0
-        
-        # UPPER TORSO/CHEST: Upper center (60-80% height)
-        elif 0.60 < z_pct <= 0.80 and 0.25 < x_pct < 0.75:
-            triangle_assignments[i] = regions.index('armor_primary') if 'armor_primary' in regions else 0
-        
-        # ARMS/SHOULDERS: Upper sides (50-80% height, outer edges)
-        elif 0.50 < z_pct <= 0.80 and (x_pct <= 0.25 or x_pct >= 0.75):
-            triangle_assignments[i] = regions.index('armor_highlight') if 'armor_highlight' in regions else 1
-        
-        # MID TORSO/FRAME: Middle section (40-60% height)
-        elif 0.40 < z_pct <= 0.60:
-            if 0.2 < x_pct < 0.8:  # Central area
-                triangle_assignments[i] = regions.index('frame') if 'frame' in regions else 2
-            else:  # Side areas
-                triangle_assignments[i] = regions.index('armor_highlight') if 'armor_highlight' in regions else 1
-        
-        # JOINTS/WAIST: Transition area (25-40% height)
-        elif 0.25 < z_pct <= 0.40:
-            triangle_assignments[i] = regions.index('joint_shadow') if 'joint_shadow' in regions else 3
-        
-        # UPPER LEGS: Lower body (15-25% height)
-        elif 0.15 < z_pct <= 0.25:
-            triangle_assignments[i] = regions.index('armor_highlight') if 'armor_highlight' in regions else 1
-        
-        # LOWER LEGS/FEET: Bottom section (0-15% height)
-        elif z_pct <= 0.15:
-            if z_pct < 0.05:  # Very bottom - feet
-                triangle_assignments[i] = regions.index('accent') if 'accent' in regions else 7
-            else:  # Lower legs
-                triangle_assignments[i] = regions.index('armor_primary') if 'armor_primary' in regions else 0
-        
-        # EDGE DETAILS: Very edges of model
-        elif x_pct < 0.05 or x_pct > 0.95 or y_pct < 0.05 or y_pct > 0.95:
-            triangle_assignments[i] = regions.index('metal_light') if 'metal_light' in regions else 5
-        
-        # DEFAULT: Small details
-        else:
-            triangle_assignments[i] = regions.index('accent') if 'accent' in regions else 7
+    print_assignment_results(triangle_assignments, color_map)
+    
+    return triangle_assignments
+
+def print_assignment_results(triangle_assignments, color_map):
+    """Print per-region triangle counts"""
+    regions = list(color_map.keys())
+    total = len(triangle_assignments)
     
     # Count assignments
-    assignment_counts = {}
-    for region_idx in triangle_assignments:
-        if region_idx >= 0:
-            region_name = regions[region_idx]
-            assignment_counts[region_name] = assignment_counts.get(region_name, 0) + 1
+    counts = np.bincount(triangle_assignments, minlength=len(regions))
+    assignment_counts = {region: int(counts[idx]) for idx, region in enumerate(regions)}
     
     print(f"\n📊 Anatomical assignment results:")
     total_assigned = sum(assignment_counts.values())
     for region in regions:
         count = assignment_counts.get(region, 0)
-        pct = (count / len(triangle_centers)) * 100
+        pct = (count / total) * 100
         color_info = color_map[region]
         print(f"   • {region:15s}: {count:8,} triangles ({pct:5.1f}%) → {color_info['label']} {color_info['hex']}")
     
-    print(f"\nTotal assigned: {total_assigned:,} / {len(triangle_centers):,} triangles")
+    print(f"\nTotal assigned: {total_assigned:,} / {total:,} triangles")
     
-    return triangle_assignments
+    return assignment_counts
+
+def region_metadata(input_file, triangle_assignments, color_map):
+    """Metadata JSON content: one entry per non-empty region, in config order"""
+    base_name = Path(input_file).stem
+    regions = list(color_map.keys())
+    counts = np.bincount(triangle_assignments, minlength=len(regions))
+    
+    metadata = {
+        "original_file": input_file,
+        "total_triangles": len(triangle_assignments),
+        "assignment_method": "triangle_anatomical_analysis",
+        "regions": []
+    }
+    for region_idx, region in enumerate(regions):
+        if counts[region_idx] == 0:
+            continue
+        color_info = color_map[region]
+        metadata["regions"].append({
+            "region": region,
+            "filename": f"{base_name}_{region}.stl",
+            "triangle_count": int(counts[region_idx]),
+            "hex": color_info['hex'],
+            "label": color_info['label'],
+            "use": color_info['use']
+        })
+    return metadata
+
+def save_metadata(metadata, input_file, output_dir):
+    """Write the region metadata JSON next to the region STLs"""
+    metadata_file = os.path.join(output_dir, f"{Path(input_file).stem}_anatomical_map.json")
+    with open(metadata_file, 'w') as f:
+        json.dump(metadata, f, indent=2)
+    
+    print(f"\nMetadata: {metadata_file}")
+    return metadata_file
+
+def recolor_regions(input_file, output_dir, color_map):
+    """Palette-only update: rewrite the metadata from cached labels
+    
+    Returns the metadata, or None if there are no cached labels for this
+    model and rule set or the region STLs aren't in output_dir yet.
+    """
+    labels = cached_labels(input_file, load_rule_set('triangle'), list(color_map.keys()))
+    if labels is None:
+        print("⚠️  No cached labels for this model and rule set, running a full split")
+        return None
+    
+    metadata = region_metadata(input_file, labels, color_map)
+    missing = [entry["filename"] for entry in metadata["regions"]
+               if not os.path.exists(os.path.join(output_dir, entry["filename"]))]
+    if missing:
+        print(f"⚠️  Region files missing in {output_dir}, running a full split")
+        return None
+    
+    print(f"\n🎨 Recoloring {len(metadata['regions'])} existing regions (geometry unchanged)")
+    print_assignment_results(labels, color_map)
+    save_metadata(metadata, input_file, output_dir)
+    return metadata
 
 def save_anatomical_regions(mesh, triangle_assignments, color_map, input_file, output_dir):
     """Save each anatomical region as separate STL"""
@@ -150,60 +168,37 @@ def save_anatomical_regions(mesh, triangle_assignments, color_map, input_file, o
     print(f"{'='*60}\n")
     
     output_files = []
-    metadata = {
-        "original_file": input_file,
-        "total_triangles": len(mesh.faces),
-        "assignment_method": "triangle_anatomical_analysis",
-        "regions": []
-    }
+    metadata = region_metadata(input_file, triangle_assignments, color_map)
+    
+    # Partition all faces by region in one pass
+    order, offsets = partition_labels(triangle_assignments, len(regions))
     
     # Save each region
     for region_idx, region in enumerate(regions):
         # Find triangles assigned to this region
-        region_mask = triangle_assignments == region_idx
-        region_triangle_count = np.sum(region_mask)
+        region_index = label_faces(order, offsets, region_idx)
+        region_triangle_count = len(region_index)
         
         if region_triangle_count == 0:
             print(f"⚠️  {region:15s}: No triangles assigned, skipping")
             continue
         
-        # Extract faces for this region
-        region_faces = mesh.faces[region_mask]
-        
-        # Create new mesh with only these faces
-        used_vertices = np.unique(region_faces.flatten())
-        vertex_map = {old_idx: new_idx for new_idx, old_idx in enumerate(used_vertices)}
-        
-        new_vertices = mesh.vertices[used_vertices]
-        new_faces = np.array([[vertex_map[v] for v in face] for face in region_faces])
-        
-        region_mesh = trimesh.Trimesh(vertices=new_vertices, faces=new_faces)
+        # Extract only this region's faces and vertices
+        region_mesh = mesh.submesh(region_index)
         
         # Save STL
         color_info = color_map[region]
         output_file = os.path.join(output_dir, f"{base_name}_{region}.stl")
-        region_mesh.export(output_file)
+        write_stl(output_file, region_mesh, header=f'Anatomical Region: {region}')
         
         print(f"✅ {region:15s}: {output_file}")
         print(f"    └─ Color: {color_info['label']} {color_info['hex']} - {color_info['use']}")
         print(f"    └─ Triangles: {region_triangle_count:,}")
         
         output_files.append(output_file)
-        metadata["regions"].append({
-            "region": region,
-            "filename": f"{base_name}_{region}.stl",
-            "triangle_count": int(region_triangle_count),
-            "hex": color_info['hex'],
-            "label": color_info['label'],
-            "use": color_info['use']
-        })
     
     # Save metadata
-    metadata_file = os.path.join(output_dir, f"{base_name}_anatomical_map.json")
-    with open(metadata_file, 'w') as f:
-        json.dump(metadata, f, indent=2)
-    
-    print(f"\nMetadata: {metadata_file}")
+    save_metadata(metadata, input_file, output_dir)
     
     print(f"\n{'='*60}")
     print(f"✅ ANATOMICAL SPLITTING COMPLETE!")
@@ -212,14 +207,20 @@ def save_anatomical_regions(mesh, triangle_assignments, color_map, input_file, o
     return output_files, metadata
 
 def main():
-    if len(sys.argv) < 2:
-        print("Usage: python triangle_anatomical_splitter.py <input.stl> [output_dir] [config_file]")
-        print("\nSplits a SINGLE model into anatomical regions by triangle position analysis.")
-        sys.exit(1)
+    parser = argparse.ArgumentParser(
+        description="Splits a SINGLE model into anatomical regions by triangle position analysis.")
+    parser.add_argument("input_file", metavar="input.stl")
+    parser.add_argument("output_dir", nargs="?", default="ANATOMICAL_REGIONS")
+    parser.add_argument("config_file", nargs="?", default="color_map_config.txt")
+    parser.add_argument("--workers", type=int, default=1, metavar="N",
+                        help="classify on N processes (0 = all available cores)")
+    parser.add_argument("--recolor", action="store_true",
+                        help="palette-only change: rewrite the metadata from cached labels, keep the region STLs")
+    args = parser.parse_args()
     
-    input_file = sys.argv[1]
-    output_dir = sys.argv[2] if len(sys.argv) > 2 else "ANATOMICAL_REGIONS"
-    config_file = sys.argv[3] if len(sys.argv) > 3 else "color_map_config.txt"
+    input_file = args.input_file
+    output_dir = args.output_dir
+    config_file = args.config_file
     
     if not os.path.exists(input_file):
         print(f"Error: File not found: {input_file}")
@@ -230,16 +231,19 @@ def main():
         sys.exit(1)
     
     try:
-        # Load mesh and color config
-        print(f"Loading: {input_file}")
-        mesh = trimesh.load_mesh(input_file)
         color_map = load_color_config(config_file)
+        if args.recolor and recolor_regions(input_file, output_dir, color_map) is not None:
+            return
+        
+        # Load mesh
+        print(f"Loading: {input_file}")
+        mesh = load_mesh(input_file)
         
         print(f"✅ Loaded SINGLE mesh with {len(mesh.faces):,} triangles")
         print(f"✅ Will split into {len(color_map)} anatomical regions")
         
         # Anatomical triangle analysis
-        triangle_assignments = analyze_triangle_anatomy(mesh, color_map)
+        triangle_assignments = analyze_triangle_anatomy(mesh, color_map, args.workers, input_file)
         
         # Save anatomical regions
         save_anatomical_regions(mesh, triangle_assignments, color_map, input_file, output_dir)